@@ -0,0 +1,8 @@
+"""
+Benchmarks for the DepositsMatcher matching engine.
+"""
+
+from .generators import GENERATORS, Scenario, generate
+from .runner import run_case
+
+__all__ = ["GENERATORS", "Scenario", "generate", "run_case"]
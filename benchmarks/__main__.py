@@ -0,0 +1,8 @@
+import sys
+
+from .runner import main
+
+
+# Allows `python -m benchmarks --sizes 10,20,40 --json results.json`
+
+sys.exit(main())
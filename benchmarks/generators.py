@@ -0,0 +1,166 @@
+import random
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from reconcile.amounts import CENTS_PER_UNIT
+
+
+# Seeded generators of synthetic reconciliations. Each scenario is built from
+# a planted matching: related sets are drawn first and the two lists are made
+# from them (plus any noise), so a benchmark can tell how much of the known
+# answer the engine recovered. The same name, size and seed always produce the
+# same lists.
+
+# Range of a generated List A deposit, in cents
+LOW_CENTS = 500
+HIGH_CENTS = 500_000
+
+# Prices repeated by the duplicates scenario, in cents
+SUBSCRIPTION_PRICES = (999, 1499, 1999, 2999, 4999, 9999)
+
+
+@dataclass
+class Scenario:
+    """
+    A generated reconciliation and the related sets it was built from.
+
+    deposits_a and deposits_b hold integer cents; planted lists the
+    (positions_a, positions_b) of every related set built into the lists,
+    and settings the Reconciler keyword arguments the scenario is meant to
+    be solved with, e.g. a tolerance for fee noise.
+    """
+    name: str
+    size: int
+    seed: int
+    deposits_a: list
+    deposits_b: list
+    planted: list
+    settings: dict = field(default_factory=dict)
+
+    @property
+    def amounts_a(self):
+        """
+        List A as exact Decimals, ready to pass to a Reconciler.
+        """
+        return [Decimal(cents) / CENTS_PER_UNIT for cents in self.deposits_a]
+
+    @property
+    def amounts_b(self):
+        return [Decimal(cents) / CENTS_PER_UNIT for cents in self.deposits_b]
+
+    @property
+    def planted_cents(self):
+        """
+        Value of the planted matching: the smaller total of each planted set.
+        """
+        return sum(min(sum(self.deposits_a[i] for i in positions_a), sum(self.deposits_b[j] for j in positions_b))
+                   for positions_a, positions_b in self.planted)
+
+    def planted_ids(self):
+        """
+        Return the planted related sets as ((A deposit IDs), (B deposit IDs)) tuples.
+        """
+        return {(tuple(f"A{i + 1}" for i in sorted(positions_a)), tuple(f"B{j + 1}" for j in sorted(positions_b)))
+                for positions_a, positions_b in self.planted}
+
+
+def generate(name, size, seed=0):
+    """
+    Build the named scenario with about size List A deposits.
+    """
+    if name not in GENERATORS:
+        raise ValueError(f"Unknown scenario {name!r}; expected one of {', '.join(GENERATORS)}.")
+    if not size > 0:
+        raise ValueError(f"size must be a positive number of deposits, got {size!r}.")
+    generator, settings = GENERATORS[name]
+    rng = random.Random(f"{name}:{size}:{seed}")
+    groups, extra_a, extra_b = generator(rng, size)
+    return build_scenario(rng, name, size, seed, groups, extra_a, extra_b, settings)
+
+
+def build_scenario(rng, name, size, seed, groups, extra_a, extra_b, settings):
+    """
+    Shuffle planted (amounts_a, amounts_b) groups and unmatched extras into
+    two lists and record where each group's deposits ended up.
+    """
+    entries_a = [(cents, index) for index, (group_a, _) in enumerate(groups) for cents in group_a]
+    entries_b = [(cents, index) for index, (_, group_b) in enumerate(groups) for cents in group_b]
+    entries_a += [(cents, None) for cents in extra_a]
+    entries_b += [(cents, None) for cents in extra_b]
+    rng.shuffle(entries_a)
+    rng.shuffle(entries_b)
+
+    planted = [([], []) for _ in groups]
+    for i, (_, index) in enumerate(entries_a):
+        if index is not None:
+            planted[index][0].append(i)
+    for j, (_, index) in enumerate(entries_b):
+        if index is not None:
+            planted[index][1].append(j)
+    return Scenario(name, size, seed, [cents for cents, _ in entries_a], [cents for cents, _ in entries_b],
+                    planted, dict(settings))
+
+
+def random_cents(rng):
+    """
+    Draw a deposit amount, log-uniform between LOW_CENTS and HIGH_CENTS so
+    small and large deposits are both common.
+    """
+    return int(LOW_CENTS * (HIGH_CENTS / LOW_CENTS) ** rng.random())
+
+
+def batches(rng, amounts, largest):
+    """
+    Split amounts into consecutive batches of 1 to largest deposits.
+    """
+    groups = []
+    start = 0
+    while start < len(amounts):
+        count = rng.randint(1, largest)
+        groups.append(amounts[start:start + count])
+        start += count
+    return groups
+
+
+def one_to_one(rng, size):
+    # Every List A deposit has one List B deposit with the same amount
+    return [([cents], [cents]) for cents in (random_cents(rng) for _ in range(size))], [], []
+
+
+def many_to_one(rng, size):
+    # Ledger items paid in as bank deposits of up to five items
+    amounts = [random_cents(rng) for _ in range(size)]
+    return [(batch, [sum(batch)]) for batch in batches(rng, amounts, 5)], [], []
+
+
+def duplicates(rng, size):
+    # Subscription payments at a handful of prices, banked one to three at a time
+    amounts = [rng.choice(SUBSCRIPTION_PRICES) for _ in range(size)]
+    return [(batch, [sum(batch)]) for batch in batches(rng, amounts, 3)], [], []
+
+
+def fees(rng, size):
+    # Card batches of up to four sales, banked less a processing fee of up to 0.5%
+    amounts = [random_cents(rng) for _ in range(size)]
+    groups = [(batch, [sum(batch) - sum(batch) * rng.randint(0, 50) // 10_000]) for batch in batches(rng, amounts, 4)]
+    return groups, [], []
+
+
+def noise(rng, size):
+    # Mostly 1:1 with some batching, plus about 20% unmatched deposits on each side
+    matched = size - size // 5
+    amounts = [random_cents(rng) for _ in range(matched)]
+    groups = [(batch, [sum(batch)]) for batch in batches(rng, amounts, 2)]
+    extra_a = [random_cents(rng) for _ in range(size - matched)]
+    extra_b = [random_cents(rng) for _ in range(len(groups) // 5)]
+    return groups, extra_a, extra_b
+
+
+# Scenario name -> (generator, Reconciler settings it is solved with)
+GENERATORS = {
+    "one_to_one": (one_to_one, {}),
+    "many_to_one": (many_to_one, {"max_group_size_a": 5, "max_group_size_b": 1}),
+    "duplicates": (duplicates, {"max_group_size_a": 3, "max_group_size_b": 1}),
+    "fees": (fees, {"tolerance_percent": "0.5", "max_group_size_a": 4, "max_group_size_b": 1}),
+    "noise": (noise, {"max_group_size_a": 2, "max_group_size_b": 1}),
+}
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import numpy as np
+except ImportError:  # Reported in the environment; the engine works without it
+    np = None
+
+from reconcile import Reconciler
+from reconcile.diagnostics import STAGES
+
+from .generators import GENERATORS, generate
+
+
+# Benchmark runner for the matching engine:
+#
+#   python -m benchmarks --sizes 10,20,40 --json results.json
+#   python -m benchmarks --json new.json --compare results.json
+#
+# Every scenario is solved end to end through Reconciler.solve, whose result is
+# scored against the planted matching, and the time of each stage is read from
+# the result's diagnostics. Peak memory is measured in separate passes under
+# tracemalloc, which would otherwise slow the timed runs down.
+
+# Diagnostics counter reported as the items of a stage, for its throughput
+STAGE_ITEMS = {"enumerate": "pairs", "reduce": "irreducible_pairs", "search": "nodes"}
+
+# Version of the JSON output; bump it when records change shape
+BENCHMARK_FORMAT = 2
+
+# Changes smaller than this many seconds are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def main(argv=None):
+    """
+    Run the benchmarks and return the exit status: 0 on success, 1 when
+    --compare found a regression.
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Time the matching engine on generated reconciliations.")
+    parser.add_argument("--scenarios", default=",".join(GENERATORS),
+                        help=f"comma-separated scenarios (default: all of {', '.join(GENERATORS)})")
+    parser.add_argument("--sizes", default="10,20,40", help="comma-separated List A sizes (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="generator seed (default: 0)")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per case; the fastest counts")
+    parser.add_argument("--time-limit", type=float, default=10, help="seconds per solve (default: 10)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory pass")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="earlier --json output to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio counted as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+    try:
+        names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+        unknown = [name for name in names if name not in GENERATORS]
+        if unknown:
+            raise ValueError(f"Unknown scenario {', '.join(unknown)}; expected {', '.join(GENERATORS)}.")
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+        if not sizes or min(sizes) < 1 or args.repeat < 1 or not args.time_limit > 0:
+            raise ValueError("Sizes, --repeat and --time-limit must be positive.")
+    except ValueError as e:
+        parser.error(str(e))
+
+    print_header()
+    records = []
+    for name in names:
+        for size in sizes:
+            record = run_case(name, size, args.seed, args.repeat, args.time_limit, memory=not args.no_memory)
+            print_record(record)
+            records.append(record)
+
+    report = {"format": BENCHMARK_FORMAT, "environment": environment(), "results": records}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(report, json_file, indent=2)
+        print(f"Results saved as {args.json}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as json_file:
+            baseline = json.load(json_file)
+        regressions = compare(baseline, report, args.threshold)
+        for line in regressions:
+            print(line)
+        print(f"{len(regressions)} regressions against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+
+def run_case(name, size, seed, repeat=1, time_limit=10, memory=True):
+    """
+    Benchmark one scenario at one size and return its record: the end-to-end
+    solve with its quality against the planted matching, and the seconds,
+    item counts and throughput of each stage of the fastest solve.
+    """
+    scenario = generate(name, size, seed)
+    solve = min((run_solve(scenario, time_limit) for _ in range(repeat)), key=lambda entry: entry["seconds"])
+    stages = solve.pop("stages")
+    if memory:
+        solve["peak_bytes"] = run_solve(scenario, time_limit, memory=True)["peak_bytes"]
+        for stage, peak in run_solve(scenario, time_limit, profile_memory=True)["stage_peak_bytes"].items():
+            if stage in stages:
+                stages[stage]["peak_bytes"] = peak
+    for entry in stages.values():
+        entry["per_second"] = (round(entry["items"] / entry["seconds"])
+                               if entry["items"] is not None and entry["seconds"] > 0 else None)
+    return {"scenario": name, "size": size, "seed": seed, "deposits_a": len(scenario.deposits_a),
+            "deposits_b": len(scenario.deposits_b), "settings": scenario.settings, "stages": stages,
+            "solve": solve}
+
+
+@contextmanager
+def measure(stages, stage, memory=False):
+    """
+    Time the enclosed stage and record it in stages. With memory, the peak
+    traced allocation above what was held when the stage started is recorded
+    as well.
+    """
+    entry = {"seconds": 0.0}
+    if memory:
+        tracemalloc.start()
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        entry["seconds"] = time.perf_counter() - start
+        if memory:
+            entry["peak_bytes"] = tracemalloc.get_traced_memory()[1] - held
+            tracemalloc.stop()
+        stages[stage] = entry
+
+
+def run_solve(scenario, time_limit, memory=False, profile_memory=False):
+    """
+    Solve a scenario end to end with Reconciler and score the result against
+    its planted matching: quality is the matched total over the planted one
+    (it may exceed 1 when the lists allow more), recovered the share of
+    planted related sets found exactly. stages holds each stage's seconds
+    and item count from the result's diagnostics; with profile_memory, the
+    peak memory of each stage is returned as stage_peak_bytes.
+    """
+    solve = {}
+    with measure(solve, "solve", memory):
+        result = Reconciler(scenario.amounts_a, scenario.amounts_b, time_limit=time_limit,
+                            profile_memory=profile_memory, **scenario.settings).solve()
+    entry = solve["solve"]
+    diagnostics = result.diagnostics
+    matched_cents = sum(related_set.cents - max(related_set.difference_cents, 0) for related_set in result.related_sets)
+    found = {(tuple(related_set.a_deposits), tuple(related_set.b_deposits)) for related_set in result.related_sets}
+    planted = scenario.planted_ids()
+    entry.update(matched_cents=matched_cents, planted_cents=scenario.planted_cents,
+                 quality=round(matched_cents / scenario.planted_cents, 6) if scenario.planted_cents else None,
+                 recovered=round(len(found & planted) / len(planted), 6) if planted else None,
+                 related_sets=len(result.related_sets), optimal=result.optimal, stop_reason=result.stop_reason,
+                 counts=dict(diagnostics.counts))
+    entry["stages"] = {stage: {"seconds": diagnostics.seconds[stage],
+                               "items": diagnostics.counts[STAGE_ITEMS[stage]] if stage in STAGE_ITEMS else None}
+                       for stage in STAGES}
+    if profile_memory:
+        entry["stage_peak_bytes"] = dict(diagnostics.peak_bytes)
+    return entry
+
+
+def compare(baseline, report, threshold):
+    """
+    Return a line for each case that got slower than threshold times its
+    baseline, end to end or in a stage, or that matched less. Stages are only
+    compared against a baseline in the same format, as they were timed
+    differently before.
+    """
+    same_stages = baseline.get("format") == BENCHMARK_FORMAT
+    previous = {(record["scenario"], record["size"], record["seed"]): record for record in baseline["results"]}
+    regressions = []
+    for record in report["results"]:
+        old = previous.get((record["scenario"], record["size"], record["seed"]))
+        if old is None:
+            continue
+        case = f"{record['scenario']} size {record['size']}"
+        timings = [("solve", old["solve"]["seconds"], record["solve"]["seconds"])]
+        timings += [(stage, old["stages"][stage]["seconds"], entry["seconds"])
+                    for stage, entry in record["stages"].items() if same_stages and stage in old["stages"]]
+        for label, old_seconds, seconds in timings:
+            if seconds > old_seconds * threshold and seconds - old_seconds > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{case}: {label} {old_seconds:.4f}s -> {seconds:.4f}s "
+                                   f"({seconds / max(old_seconds, 1e-9):.2f}x)")
+        if record["solve"]["matched_cents"] < old["solve"]["matched_cents"]:
+            regressions.append(f"{case}: matched {old['solve']['matched_cents']} -> "
+                               f"{record['solve']['matched_cents']} cents")
+    return regressions
+
+
+def environment():
+    """
+    Describe where the benchmarks ran, so results from different versions
+    and machines can be told apart.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "numpy": np.__version__ if np is not None else None,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def print_header():
+    print(f"{'scenario':<12} {'size':>5} {'A/B':>9} {'solve s':>8} {'peak MB':>8} {'quality':>8} {'found':>6}  "
+          + " ".join(f"{stage[:7]:>7}" for stage in STAGES) + "  (stage ms)")
+
+
+def print_record(record):
+    solve = record["solve"]
+    peak = f"{solve['peak_bytes'] / 2 ** 20:.1f}" if "peak_bytes" in solve else "-"
+    quality = f"{solve['quality']:.3f}" if solve["quality"] is not None else "-"
+    recovered = f"{solve['recovered']:.0%}" if solve["recovered"] is not None else "-"
+    stages = " ".join(f"{record['stages'][stage]['seconds'] * 1000:>7.1f}" for stage in STAGES)
+    flag = "" if solve["optimal"] else f"  stopped: {solve['stop_reason']}"
+    print(f"{record['scenario']:<12} {record['size']:>5} {record['deposits_a']:>4}/{record['deposits_b']:<4} "
+          f"{solve['seconds']:>8.3f} {peak:>8} {quality:>8} {recovered:>6}  {stages}{flag}")
+    sys.stdout.flush()
@@ -1,13 +1,14 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 from tkinter import ttk
-from openpyxl import Workbook
-from openpyxl.styles import Font
-from itertools import combinations
 from PIL import Image, ImageTk
-from itertools import product
-import threading
 
+from reconcile import JobRunner, Reconciler, ResultCache, cli
+from reconcile.amounts import format_cents
+from reconcile.files import clean_name, guess_columns, preview_columns, read_deposits, write_result
+
+import multiprocessing
+import queue
 import sys
 import os
 
@@ -15,31 +16,180 @@ import os
 # Program: DepositsMatcher
 # Author: Given Borthwick
 
-class ScrollableFrame(tk.Frame):
+# Related sets spelled out in the results text; the grids show every deposit's set
+MAX_LISTED_SETS = 20
+
+
+class DepositGrid(tk.Frame):
     """
-    A scrollable frame that can be used to contain multiple widgets.
+    A list of deposits shown in a ttk.Treeview, which only draws the rows in
+    view, so tens of thousands of deposits stay quick to load and scroll.
+
+    The amount, date and reference of each deposit are kept as text in
+    amounts, dates and references; double-click a cell (or press Enter on a
+    row) to edit it in place. Rows are identified by their deposit ID, e.g. 'A1'.
     """
-    def __init__(self, parent, *args, **kwargs):
-        super().__init__(parent, *args, **kwargs)
-
-        # Create a canvas and a vertical scrollbar for scrolling it
-        canvas = tk.Canvas(self, borderwidth=0, background="#303030")  # Dark background
-        scrollbar = tk.Scrollbar(self, orient="vertical", command=canvas.yview)
-        self.scrollable_frame = tk.Frame(canvas, background="#303030")  # Dark background
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
+    COLUMNS = ("amount", "date", "reference", "status", "related_set")
+    EDITABLE_COLUMNS = ("amount", "date", "reference")
+
+    def __init__(self, parent, prefix, *args, **kwargs):
+        super().__init__(parent, *args, background="#303030", **kwargs)
+        self.prefix = prefix
+        self.amounts = []
+        self.dates = []
+        self.references = []
+        self.editor = None  # Entry placed over the cell being edited, with its row and column
+        self.view_top = None  # First visible fraction of the list, to notice scrolling
+
+        self.tree = ttk.Treeview(self, columns=self.COLUMNS, style="Deposits.Treeview", selectmode="browse")
+        self.tree.heading("#0", text="Deposit")
+        self.tree.column("#0", width=60, stretch=False)
+        for column, heading, width in zip(self.COLUMNS, ("Amount", "Date", "Reference", "Status", "Related Set"),
+                                          (90, 85, 100, 75, 75)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor="e" if column == "amount" else "w")
+        self.tree.tag_configure("matched", foreground="green")
+        self.tree.tag_configure("unmatched", foreground="red")
+        self.tree.tag_configure("highlight", background="#e7786b")  # Reddish-orange
+
+        scrollbar = tk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=lambda first, last: self._on_scroll(scrollbar, first, last))
+        scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
 
-        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        self.tree.bind("<Double-1>", self._edit_clicked)
+        self.tree.bind("<Return>", lambda event: self.edit_cell(self.tree.focus(), "amount"))
 
-        canvas.configure(yscrollcommand=scrollbar.set)
+    def __len__(self):
+        return len(self.amounts)
 
-        scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True)
+    def set_rows(self, amounts, dates=None, references=None):
+        """
+        Replace every row; dates and references default to blank.
+        """
+        self.clear()
+        self.amounts = list(amounts)
+        self.dates = list(dates) if dates is not None else [""] * len(self.amounts)
+        self.references = list(references) if references is not None else [""] * len(self.amounts)
+        for i, row in enumerate(zip(self.amounts, self.dates, self.references)):
+            self.tree.insert("", "end", iid=f"{self.prefix}{i+1}", text=f"{self.prefix}{i+1}", values=row)
+
+    def resize(self, count):
+        """
+        Add blank rows or drop rows from the end so the list has count deposits.
+        """
+        self.cancel_edit()
+        for i in range(len(self.amounts), count):
+            self.tree.insert("", "end", iid=f"{self.prefix}{i+1}", text=f"{self.prefix}{i+1}", values=("", "", ""))
+        if count < len(self.amounts):
+            self.tree.delete(*[f"{self.prefix}{i+1}" for i in range(count, len(self.amounts))])
+        for column in (self.amounts, self.dates, self.references):
+            del column[count:]
+            column.extend([""] * (count - len(column)))
+
+    def clear(self):
+        self.cancel_edit()
+        self.tree.delete(*self.tree.get_children())
+        self.amounts, self.dates, self.references = [], [], []
+
+    def set_cell(self, index, column, text):
+        {"amount": self.amounts, "date": self.dates, "reference": self.references}[column][index] = text
+        self.tree.set(f"{self.prefix}{index+1}", column, text)
+
+    def show_results(self, table):
+        """
+        Fill the Status and Related Set columns from a result table and colour each row.
+        """
+        for i, (deposit_id, deposit) in enumerate(table.items()):
+            if i >= len(self.amounts):
+                break  # Rows removed since the run started
+            status = deposit['status']
+            self.tree.item(deposit_id, values=(self.amounts[i], self.dates[i], self.references[i], status,
+                                               deposit['related_set'] or ""), tags=(status.lower(),))
+
+    def clear_results(self):
+        """
+        Blank the Status and Related Set columns and drop the row colours.
+        """
+        for i, row in enumerate(zip(self.amounts, self.dates, self.references)):
+            self.tree.item(f"{self.prefix}{i+1}", values=row, tags=())
+
+    def set_highlight(self, deposit_ids, on):
+        """
+        Add or remove the highlight on the given rows, keeping their status colour.
+        """
+        for deposit_id in deposit_ids:
+            tags = [tag for tag in self.tree.item(deposit_id, "tags") if tag != "highlight"]
+            if on:
+                tags.append("highlight")
+            self.tree.item(deposit_id, tags=tags)
+
+    def _edit_clicked(self, event):
+        if self.tree.identify_region(event.x, event.y) != "cell":
+            return
+        column = self.tree.column(self.tree.identify_column(event.x), "id")
+        self.edit_cell(self.tree.identify_row(event.y), column)
+
+    def edit_cell(self, deposit_id, column):
+        """
+        Open an entry over a cell. Enter saves and moves down, Tab saves and
+        moves right, Escape cancels.
+        """
+        self.commit_edit()
+        if not deposit_id or column not in self.EDITABLE_COLUMNS:
+            return
+        self.tree.see(deposit_id)
+        self.tree.update_idletasks()  # Let see() scroll before measuring the cell
+        bbox = self.tree.bbox(deposit_id, column)
+        if not bbox:
+            return
+        x, y, width, height = bbox
+        entry = tk.Entry(self.tree, bg="#1d1d1e", fg="white", insertbackground="white")
+        entry.insert(0, self.tree.set(deposit_id, column))
+        entry.select_range(0, tk.END)
+        entry.place(x=x, y=y, width=width, height=height)
+        entry.focus_set()
+        entry.bind("<Return>", lambda event: self._move_edit(1, 0))
+        entry.bind("<Tab>", lambda event: self._move_edit(0, 1))
+        entry.bind("<Escape>", lambda event: self.cancel_edit())
+        entry.bind("<FocusOut>", lambda event: self.commit_edit())
+        self.editor = (entry, deposit_id, column)
+
+    def _move_edit(self, rows, columns):
+        _, deposit_id, column = self.editor
+        index = int(deposit_id[len(self.prefix):]) - 1 + rows
+        column_index = self.EDITABLE_COLUMNS.index(column) + columns
+        if column_index == len(self.EDITABLE_COLUMNS):
+            index, column_index = index + 1, 0
+        self.commit_edit()
+        if index < len(self.amounts):
+            next_id = f"{self.prefix}{index+1}"
+            self.tree.focus(next_id)
+            self.tree.selection_set(next_id)
+            self.edit_cell(next_id, self.EDITABLE_COLUMNS[column_index])
+        else:
+            self.tree.focus_set()
+        return "break"  # Keep Tab from also moving the keyboard focus
+
+    def commit_edit(self):
+        if self.editor:
+            entry, deposit_id, column = self.editor
+            self.editor = None
+            self.set_cell(int(deposit_id[len(self.prefix):]) - 1, column, entry.get().strip())
+            entry.destroy()
+
+    def cancel_edit(self):
+        if self.editor:
+            entry = self.editor[0]
+            self.editor = None
+            entry.destroy()
+
+    def _on_scroll(self, scrollbar, first, last):
+        # An open editor would no longer sit over its cell
+        if first != self.view_top:
+            self.view_top = first
+            self.commit_edit()
+        scrollbar.set(first, last)
 
 class DepositsMatcherApp:
     def __init__(self, root):
@@ -95,40 +245,106 @@ class DepositsMatcherApp:
         self.num_deposits_b_entry = tk.Entry(input_frame, bg="#1d1d1e", fg="white")
         self.num_deposits_b_entry.grid(row=1, column=1, padx=10, pady=5, sticky="w")
 
+        # Option to lock identical amounts together before searching
+        self.fix_identical_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(input_frame, text="Lock identical amounts as 1:1 matches (faster)", variable=self.fix_identical_var,
+                       bg="#303030", fg="white", selectcolor="#1d1d1e", activebackground="#303030",
+                       activeforeground="white").grid(row=2, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+
+        # Time limit for the search; when it runs out the best matching found so far is shown
+        tk.Label(input_frame, text="Time Limit (seconds):", bg="#303030", fg="white").grid(row=3, column=0, padx=10, pady=5, sticky="e")
+        self.time_limit_entry = tk.Entry(input_frame, bg="#1d1d1e", fg="white")
+        self.time_limit_entry.insert(0, "30")
+        self.time_limit_entry.grid(row=3, column=1, padx=10, pady=5, sticky="w")
+
+        # Allowed difference between matched totals, as an amount (e.g. 0.05) or a percentage (e.g. 0.5%)
+        tk.Label(input_frame, text="Tolerance (amount or %):", bg="#303030", fg="white").grid(row=4, column=0, padx=10, pady=5, sticky="e")
+        self.tolerance_entry = tk.Entry(input_frame, bg="#1d1d1e", fg="white")
+        self.tolerance_entry.insert(0, "0")
+        self.tolerance_entry.grid(row=4, column=1, padx=10, pady=5, sticky="w")
+
+        # Only match deposits dated at most this many days apart; leave empty to ignore dates
+        tk.Label(input_frame, text="Date Window (days):", bg="#303030", fg="white").grid(row=5, column=0, padx=10, pady=5, sticky="e")
+        self.date_window_entry = tk.Entry(input_frame, bg="#1d1d1e", fg="white")
+        self.date_window_entry.grid(row=5, column=1, padx=10, pady=5, sticky="w")
+
+        # Most deposits from each list in one related set; leave empty for no limit
+        tk.Label(input_frame, text="Max Group Size (A / B):", bg="#303030", fg="white").grid(row=6, column=0, padx=10, pady=5, sticky="e")
+        group_size_frame = tk.Frame(input_frame, bg="#303030")
+        group_size_frame.grid(row=6, column=1, padx=10, pady=5, sticky="w")
+        self.max_group_size_a_entry = tk.Entry(group_size_frame, width=8, bg="#1d1d1e", fg="white")
+        self.max_group_size_a_entry.pack(side="left")
+        tk.Label(group_size_frame, text="/", bg="#303030", fg="white").pack(side="left", padx=5)
+        self.max_group_size_b_entry = tk.Entry(group_size_frame, width=8, bg="#1d1d1e", fg="white")
+        self.max_group_size_b_entry.pack(side="left")
+
         # Button to generate deposit fields or clear them
         self.generate_button = tk.Button(root, text="Generate Deposit Fields", command=self.toggle_fields)  # Default styling
         self.generate_button.pack(padx=10, pady=10)
 
+        # Buttons to import a list from a CSV or Excel file instead of typing it in
+        import_frame = tk.Frame(root, bg="#303030")
+        import_frame.pack(padx=10)
+        tk.Button(import_frame, text="Import List A...", command=lambda: self.import_list('A')).pack(side="left", padx=5)
+        tk.Button(import_frame, text="Import List B...", command=lambda: self.import_list('B')).pack(side="left", padx=5)
+
         # Frame for Lists A and B with Scrollbars
         lists_frame = tk.Frame(root, bg="#303030")
         lists_frame.pack(padx=10, pady=10, fill="both", expand=True)
 
-        # Scrollable Frame for List A
-        self.scrollable_frame_a = ScrollableFrame(lists_frame)
-        self.scrollable_frame_a.pack(side="left", fill="both", expand=True, padx=(0, 5))
-
-        # Scrollable Frame for List B
-        self.scrollable_frame_b = ScrollableFrame(lists_frame)
-        self.scrollable_frame_b.pack(side="right", fill="both", expand=True, padx=(5, 0))
-
-        # Labels for List A and List B
-        label_a_header = tk.Label(self.scrollable_frame_a.scrollable_frame, text="List A Deposits:", font=("Arial", 14, "bold"), bg="#303030", fg="white")
-        label_a_header.pack(anchor="w", pady=(0, 10))
-        self.section_labels_a = [label_a_header]
-
-        label_b_header = tk.Label(self.scrollable_frame_b.scrollable_frame, text="List B Deposits:", font=("Arial", 14, "bold"), bg="#303030", fg="white")
-        label_b_header.pack(anchor="w", pady=(0, 10))
-        self.section_labels_b = [label_b_header]
+        # Dark colours for the deposit grids
+        style = ttk.Style(root)
+        style.configure("Deposits.Treeview", background="#1d1d1e", fieldbackground="#1d1d1e", foreground="white")
+
+        # Grid for List A, with the paste button below it
+        list_a_frame = tk.Frame(lists_frame, bg="#303030")
+        list_a_frame.pack(side="left", fill="both", expand=True, padx=(0, 5))
+        tk.Label(list_a_frame, text="List A Deposits:", font=("Arial", 14, "bold"), bg="#303030", fg="white").pack(anchor="w", pady=(0, 10))
+        tk.Button(list_a_frame, text="Paste List A", command=self.paste_list_a).pack(side="bottom", anchor="w", pady=(5, 10))
+        self.grid_a = DepositGrid(list_a_frame, 'A')
+        self.grid_a.pack(fill="both", expand=True)
+
+        # Grid for List B, with the paste button below it
+        list_b_frame = tk.Frame(lists_frame, bg="#303030")
+        list_b_frame.pack(side="right", fill="both", expand=True, padx=(5, 0))
+        tk.Label(list_b_frame, text="List B Deposits:", font=("Arial", 14, "bold"), bg="#303030", fg="white").pack(anchor="w", pady=(0, 10))
+        tk.Button(list_b_frame, text="Paste List B", command=self.paste_list_b).pack(side="bottom", anchor="w", pady=(5, 10))
+        self.grid_b = DepositGrid(list_b_frame, 'B')
+        self.grid_b.pack(fill="both", expand=True)
+
+        # Bind events for highlighting
+        self.grid_a.tree.bind("<Motion>", lambda event: self.highlight_related(event, 'A'))
+        self.grid_a.tree.bind("<Leave>", lambda event: self.end_hover())
+        self.grid_b.tree.bind("<Motion>", lambda event: self.highlight_related(event, 'B'))
+        self.grid_b.tree.bind("<Leave>", lambda event: self.end_hover())
 
-        # Placeholders for deposit entries
-        self.list_a_entries = []
-        self.list_b_entries = []
         self.verify_button = None
+        self.results_frame = None  # Holds the results label and the Diagnostics panel next to it
         self.results_label = None
+        self.diagnostics_label = None
+        self.diagnostics_visible = False  # Whether the Diagnostics panel is expanded; kept between runs
+        self.progress_frame = None
+
+        # Reconciliations run on a background thread, one at a time in submission order
+        self.job_runner = JobRunner()
+        self.current_job = None
+        self.polling = False
+        self.run_count = 0
+        self.job_settings = {}  # Matching settings of each unfinished job, by job ID
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.highlight_enabled = False
+        self.hovered_deposit = None  # Deposit ID under the mouse pointer
+        self.highlighted_set = None  # Index of the related set currently highlighted
         self.selected_related_sets = []  # To store selected related sets with their indices
-        self.deposit_to_pair_a = {}  # Mapping from List A deposit index to subset pair index
-        self.deposit_to_pair_b = {}  # Mapping from List B deposit index to subset pair index
+        self.deposit_to_pair_a = {}  # Mapping from List A deposit ID to related set index
+        self.deposit_to_pair_b = {}  # Mapping from List B deposit ID to related set index
+
+        # Latest ReconcileResult, for exporting and for re-matching after edits
+        self.result = None
+        self.result_settings = None  # Matching settings the latest result was found with
+
+        # Solved matchings are kept on disk, so repeating a run is answered instantly
+        self.cache = ResultCache()
 
         # Internal tables for deposits
         self.table_a = {}  # e.g., {'A1': {'value': 3, 'status': 'Matched', 'related_set': 'R1'}}
@@ -142,11 +358,25 @@ class DepositsMatcherApp:
             "\n\nFeatures:\n"
             "- Input deposits for List A and List B.\n"
             "- Find matching subset totals between the two lists.\n"
-            "- Highlight discrepancies if there are unmatched amounts.\n\n"
+            "- Highlight discrepancies if there are unmatched amounts.\n"
+            "- Cap the search with a time limit or cancel it; the best matching found so far is shown.\n"
+            "- Matching runs in the background; pressing Find again queues another run.\n"
+            "- Set a tolerance (e.g. 0.05 or 0.5%) to match totals that differ by fees or rounding.\n"
+            "- Give each deposit an optional date and reference; with a date window set, only deposits "
+            "dated at most that many days apart are matched together.\n"
+            "- Limit how many deposits from each list a related set may hold (e.g. 5 / 1) to match long lists quickly.\n"
+            "- Expand Diagnostics next to the results to see where a slow search spent its time.\n\n"
             "This tool helps users compare deposit entries to ensure accuracy.\n\n"
+            "**Editing:**\n"
+            "Double-click a cell (or press Enter on a row) to edit it. Enter saves and moves down, "
+            "Tab moves to the next column and Escape cancels.\n\n"
             "**Bulk Pasting:**\n"
-            "After generating the deposit fields, you can paste multiple deposit values "
-            "directly from a spreadsheet into List A or List B by clicking the 'Paste List A' or 'Paste List B' buttons."
+            "You can paste multiple deposit values directly from a spreadsheet into List A or List B "
+            "by clicking the 'Paste List A' or 'Paste List B' buttons; rows are added as needed. "
+            "Copy the amount, date and reference columns together to fill all three.\n\n"
+            "**Importing Files:**\n"
+            "Use 'Import List A...' or 'Import List B...' to load a whole list from a CSV or Excel file "
+            "and choose its amount, date and reference columns. Large bank exports load in seconds."
         )
         messagebox.showinfo("Help - DepositsMatcher", help_text)
 
@@ -160,62 +390,22 @@ class DepositsMatcherApp:
             self.generate_button.config(text="Generate Deposit Fields")
 
     def generate_fields(self):
-        # Get the number of deposit fields to create for List A and List B
+        # Get the number of deposit rows for List A and List B; leave a count empty to keep an imported list
         try:
-            num_deposits_a = int(self.num_deposits_a_entry.get())
-            num_deposits_b = int(self.num_deposits_b_entry.get())
+            num_deposits_a = int(self.num_deposits_a_entry.get()) if self.num_deposits_a_entry.get().strip() else len(self.grid_a)
+            num_deposits_b = int(self.num_deposits_b_entry.get()) if self.num_deposits_b_entry.get().strip() else len(self.grid_b)
             if num_deposits_a <= 0 or num_deposits_b <= 0:
                 raise ValueError("Number of deposits must be positive.")
         except ValueError:
             messagebox.showerror("Input Error", "Please enter valid positive integers for the number of deposits.")
             return
 
-        # Create deposit fields for List A
-        for i in range(num_deposits_a):
-            frame = tk.Frame(self.scrollable_frame_a.scrollable_frame, bg="#303030")
-            frame.pack(anchor="w", pady=2, padx=5)
-
-            label = tk.Label(frame, text=f"A{i+1}:", width=5, bg="#303030", fg="white", anchor="w")
-            label.pack(side="left")
-
-            entry = tk.Entry(frame, width=20, bg="#1d1d1e", fg="white")
-            entry.pack(side="left", padx=(0, 10))
-            # Bind events for highlighting
-            entry.bind("<Enter>", lambda event, list_type="A": self.highlight_related(event, list_type))
-            entry.bind("<Leave>", lambda event, list_type="A": self.clear_highlight())
-
-            status_label = tk.Label(frame, text="", font=("Arial", 10, "bold"), bg="#303030", fg="white")
-            status_label.pack(side="left")
-            self.list_a_entries.append((entry, status_label))
-
-        # Add 'Paste List A' Button if it does not already exist
-        if not hasattr(self, "paste_a_button"):
-            self.paste_a_button = tk.Button(self.scrollable_frame_a.scrollable_frame, text="Paste List A", command=self.paste_list_a)
-            self.paste_a_button.pack(anchor="w", pady=(5, 10))
-
-        # Create deposit fields for List B
-        for i in range(num_deposits_b):
-            frame = tk.Frame(self.scrollable_frame_b.scrollable_frame, bg="#303030")
-            frame.pack(anchor="w", pady=2, padx=5)
-
-            label = tk.Label(frame, text=f"B{i+1}:", width=5, bg="#303030", fg="white", anchor="w")
-            label.pack(side="left")
-
-            entry = tk.Entry(frame, width=20, bg="#1d1d1e", fg="white")
-            entry.pack(side="left", padx=(0, 10))
-            # Bind events for highlighting
-            entry.bind("<Enter>", lambda event, list_type="B": self.highlight_related(event, list_type))
-            entry.bind("<Leave>", lambda event, list_type="B": self.clear_highlight())
-
-            status_label = tk.Label(frame, text="", font=("Arial", 10, "bold"), bg="#303030", fg="white")
-            status_label.pack(side="left")
-            self.list_b_entries.append((entry, status_label))
-
-        # Add 'Paste List B' Button if it does not already exist
-        if not hasattr(self, "paste_b_button"):
-            self.paste_b_button = tk.Button(self.scrollable_frame_b.scrollable_frame, text="Paste List B", command=self.paste_list_b)
-            self.paste_b_button.pack(anchor="w", pady=(5, 10))
+        # Blank rows are only added to the grids' data; the grids draw what is in view
+        self.grid_a.resize(num_deposits_a)
+        self.grid_b.resize(num_deposits_b)
+        self.add_action_buttons()
 
+    def add_action_buttons(self):
         # Create the button to verify the sums
         if not self.verify_button:
             self.verify_button = tk.Button(self.root, text="Find Maximum Matching Sum", command=self.find_max_matching_sum)
@@ -226,663 +416,446 @@ class DepositsMatcherApp:
             self.export_button = tk.Button(self.root, text="Export to Excel", command=self.export_to_excel)
             self.export_button.pack(padx=10, pady=10)
 
-
     def clear_fields(self):
-        # Clear all dynamically created fields and reset state
-        for entry, status_label in self.list_a_entries + self.list_b_entries:
-            entry.master.destroy()  # Destroy the parent frame
-        self.list_a_entries.clear()
-        self.list_b_entries.clear()
+        # Clear all deposit rows and reset state
+        self.grid_a.clear()
+        self.grid_b.clear()
 
         if self.verify_button:
             self.verify_button.destroy()
             self.verify_button = None
 
-        if self.results_label:
-            self.results_label.destroy()
+        # Clear any text in the entry fields for deposit counts
+        self.num_deposits_a_entry.delete(0, tk.END)
+        self.num_deposits_b_entry.delete(0, tk.END)
+
+        self.clear_results()
+
+    def clear_results(self):
+        # Drop the last result, its display and highlighting, e.g. once the lists it was found for are replaced
+        if self.results_frame:
+            self.results_frame.destroy()
+            self.results_frame = None
             self.results_label = None
+            self.diagnostics_label = None
+        self.grid_a.clear_results()
+        self.grid_b.clear_results()
 
         # Reset tracking variables
         self.highlight_enabled = False
+        self.hovered_deposit = None
+        self.highlighted_set = None
         self.selected_related_sets = []
         self.deposit_to_pair_a.clear()
         self.deposit_to_pair_b.clear()
 
-        # Clear any text in the entry fields for deposit counts
-        self.num_deposits_a_entry.delete(0, tk.END)
-        self.num_deposits_b_entry.delete(0, tk.END)
-
         # Clear internal tables
+        self.result = None
+        self.result_settings = None
         self.table_a.clear()
         self.table_b.clear()
-        
-
-    def paste_list_a(self):
-        """
-        Handle pasting multiple deposit values into List A.
-        """
-        try:
-            clipboard_data = self.root.clipboard_get()
-            # Split by newlines and possibly tabs
-            lines = [line.strip() for line in clipboard_data.replace('\r', '').split('\n') if line.strip()]
-            num_entries = len(self.list_a_entries)
-            if len(lines) > num_entries:
-                messagebox.showwarning("Paste Warning", f"Number of pasted values ({len(lines)}) exceeds the number of deposit entries ({num_entries}). Extra values will be ignored.")
-            for i, entry_tuple in enumerate(self.list_a_entries):
-                if i < len(lines):
-                    entry, _ = entry_tuple
-                    entry.delete(0, tk.END)
-                    entry.insert(0, lines[i])
-                else:
-                    # Optionally, clear remaining entries or leave them as is
-                    pass
-        except tk.TclError:
-            messagebox.showerror("Paste Error", "Clipboard does not contain valid text data.")
 
-    def paste_list_b(self):
+    def import_list(self, list_type):
         """
-        Handle pasting multiple deposit values into List B.
+        Import List A or List B from a CSV or Excel file into its grid,
+        replacing any rows typed in. The rows are streamed from the file.
         """
+        file_path = filedialog.askopenfilename(filetypes=[("Spreadsheets", "*.csv *.xlsx"), ("CSV files", "*.csv"),
+                                                          ("Excel files", "*.xlsx")])
+        if not file_path:
+            return
         try:
-            clipboard_data = self.root.clipboard_get()
-            # Split by newlines and possibly tabs
-            lines = [line.strip() for line in clipboard_data.replace('\r', '').split('\n') if line.strip()]
-            num_entries = len(self.list_b_entries)
-            if len(lines) > num_entries:
-                messagebox.showwarning("Paste Warning", f"Number of pasted values ({len(lines)}) exceeds the number of deposit entries ({num_entries}). Extra values will be ignored.")
-            for i, entry_tuple in enumerate(self.list_b_entries):
-                if i < len(lines):
-                    entry, _ = entry_tuple
-                    entry.delete(0, tk.END)
-                    entry.insert(0, lines[i])
-                else:
-                    # Optionally, clear remaining entries or leave them as is
-                    pass
-        except tk.TclError:
-            messagebox.showerror("Paste Error", "Clipboard does not contain valid text data.")
-
-    def find_max_matching_sum(self):
-        # Check number of deposits and warn if more than 20
-        num_deposits_a = len(self.list_a_entries)
-        num_deposits_b = len(self.list_b_entries)
-        if num_deposits_a > 20 or num_deposits_b > 20:
-            if not messagebox.askokcancel("Warning", "You have more than 20 deposits. Calculations may take a while. Continue?"):
-                return
-
-        # Create and place the progress bar widget if not already created
-        if not hasattr(self, 'progress_bar'):
-            self.progress_bar = ttk.Progressbar(self.root, orient="horizontal", length=300, mode="determinate")
-            self.progress_bar.pack(padx=10, pady=10)
-        self.progress_bar["value"] = 0  # Reset progress bar
-        self.progress_bar["maximum"] = 100  # Scale the progress bar from 0 to 100%
-        self.root.update_idletasks()  # Ensure the UI updates to show the progress bar
-
-        # Start the computation in a separate thread
-        computation_thread = threading.Thread(target=self._run_matching_computation)
-        computation_thread.start()
-
-    def _run_matching_computation(self):
-        try:
-            # Perform the matching computation
-            # Set up lists of deposit values
-            deposits_a = [float(entry.get()) for entry, _ in self.list_a_entries]
-            deposits_b = [float(entry.get()) for entry, _ in self.list_b_entries]
-
-            # Populate internal tables
-            self.table_a = {}
-            for i, value in enumerate(deposits_a):
-                self.table_a[f"A{i+1}"] = {'value': value, 'status': 'Unmatched', 'related_set': None}
-
-            self.table_b = {}
-            for i, value in enumerate(deposits_b):
-                self.table_b[f"B{i+1}"] = {'value': value, 'status': 'Unmatched', 'related_set': None}
-
-            # Generate all possible subsets for both lists with their deposit indices
-            subsets_a = self.get_all_subsets(deposits_a, prefix='A')
-            subsets_b = self.get_all_subsets(deposits_b, prefix='B')
-
-            # Update progress bar as we find matching subset pairs
-            self._update_progress(20)
-
-            # Find all matching subset pairs (same sum)
-            matching_subset_pairs = self.find_matching_subset_pairs(subsets_a, subsets_b)
-
-            # Update progress bar
-            self._update_progress(50)
-
-            # Find the optimal combination of subset pairs
-            optimal_matching = self.find_optimal_matching(matching_subset_pairs)
-
-            # Update progress bar
-            self._update_progress(80)
-
-            # Assign related set identifiers and update internal tables
-            related_set_id = 1
-            for pair in optimal_matching:
-                subset_a, subset_b, total = pair
-                related_set = f"R{related_set_id}"
-                related_set_id += 1
-
-                # Update table for List A
-                for deposit_id in subset_a['deposit_ids']:
-                    self.table_a[deposit_id]['status'] = 'Matched'
-                    self.table_a[deposit_id]['related_set'] = related_set
-
-                # Update table for List B
-                for deposit_id in subset_b['deposit_ids']:
-                    self.table_b[deposit_id]['status'] = 'Matched'
-                    self.table_b[deposit_id]['related_set'] = related_set
-
-                # Store related sets for highlighting
-                self.selected_related_sets.append({
-                    'related_set': related_set,
-                    'a_deposits': subset_a['deposit_ids'],
-                    'b_deposits': subset_b['deposit_ids']
-                })
-
-            # Finalize progress bar
-            self._update_progress(100)
-
-            # Display results (UI updates must happen on the main thread)
-            self.root.after(0, self._display_results)
-
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred during computation: {e}")
+            names, header = preview_columns(file_path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import Error", f"Could not read {file_path}.\n\n{e}")
+            return
+        if not names:
+            messagebox.showerror("Import Error", f"{file_path} is empty.")
+            return
+        columns = self.choose_columns(names, header, f"Import List {list_type}")
+        if columns is None:
+            return
 
-    def _update_progress(self, value):
-        """
-        Update the progress bar and ensure the UI refreshes.
-        """
-        self.progress_bar["value"] = value
+        self.root.config(cursor="watch")
         self.root.update_idletasks()
+        try:
+            deposits = read_deposits(file_path, *columns, header=header, guess_missing=False)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import Error", f"Could not import {file_path}.\n\n{e}")
+            return
+        finally:
+            self.root.config(cursor="")
+        if not len(deposits):
+            messagebox.showerror("Import Error", f"No amounts found in {file_path}.")
+            return
 
+        # The last result and its highlighting refer to the rows being replaced
+        self.clear_results()
+        grid = self.grid_a if list_type == 'A' else self.grid_b
+        grid.set_rows([format_cents(cents) for cents in deposits.cents],
+                      [date.isoformat() if date else "" for date in deposits.dates] if deposits.dates is not None else None,
+                      [reference or "" for reference in deposits.references] if deposits.references is not None else None)
+        self.add_action_buttons()
 
-    def _display_results(self):
+    def choose_columns(self, names, header, title):
         """
-        Display the results on the UI after computation is complete.
+        Ask which columns hold the amount, date and reference. Returns their
+        indices (None for no date or reference column), or None if cancelled.
         """
-        total_matched_a = sum([self.table_a[deposit_id]['value'] for deposit_id in self.table_a if self.table_a[deposit_id]['status'] == 'Matched'])
-        total_matched_b = sum([self.table_b[deposit_id]['value'] for deposit_id in self.table_b if self.table_b[deposit_id]['status'] == 'Matched'])
-
-        result_message = f"Total Matched: {total_matched_a}\n"
-        result_message += f"Total Unmatched - List A: {sum([self.table_a[deposit_id]['value'] for deposit_id in self.table_a if self.table_a[deposit_id]['status'] == 'Unmatched'])}\n"
-        result_message += f"Total Unmatched - List B: {sum([self.table_b[deposit_id]['value'] for deposit_id in self.table_b if self.table_b[deposit_id]['status'] == 'Unmatched'])}\n\nMatched Subsets:\n"
-        for idx, related_set in enumerate(self.selected_related_sets, 1):
-            subset_a_ids = related_set['a_deposits']
-            subset_b_ids = related_set['b_deposits']
-            subset_a_values = [self.table_a[dep_id]['value'] for dep_id in subset_a_ids]
-            subset_b_values = [self.table_b[dep_id]['value'] for dep_id in subset_b_ids]
-            subset_a_str = ', '.join(map(str, subset_a_values))
-            subset_b_str = ', '.join(map(str, subset_b_values))
-            subset_sum = round(sum(subset_a_values), 2)
-            result_message += f"Pair {idx}: List A [{subset_a_str}] <--> List B [{subset_b_str}] (Sum: {subset_sum})\n"
-
-        if self.results_label:
-            self.results_label.destroy()
-        self.results_label = tk.Label(self.root, text=result_message, font=("Arial", 12, "bold"), justify=tk.LEFT, anchor="w", bg="#303030", fg="white")
-        self.results_label.pack(padx=10, pady=10, fill="both", expand=True)
-
-        # Update status labels for List A
-        for i, (entry, status_label) in enumerate(self.list_a_entries):
-            deposit_id = f"A{i+1}"
-            status = self.table_a[deposit_id]['status']
-            if status == "Matched":
-                status_label.config(text="Matched", fg="green", bg="#303030")
+        dialog = tk.Toplevel(self.root, bg="#303030")
+        dialog.title(title)
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        # Preselect columns named like Amount, Date and Reference, or the first three
+        guessed = guess_columns([clean_name(name) for name in names]) if header else (0, 1, 2)
+        choices = []
+        for row, (label, column, optional) in enumerate(zip(("Amount:", "Date:", "Reference:"), guessed,
+                                                            (False, True, True))):
+            tk.Label(dialog, text=label, bg="#303030", fg="white").grid(row=row, column=0, padx=10, pady=5, sticky="e")
+            values = (["(none)"] if optional else []) + names
+            choice = ttk.Combobox(dialog, values=values, state="readonly")
+            if column is not None and column < len(names):
+                choice.set(names[column])
             else:
-                status_label.config(text="Unmatched", fg="red", bg="#303030")
-
-        # Update status labels for List B
-        for i, (entry, status_label) in enumerate(self.list_b_entries):
-            deposit_id = f"B{i+1}"
-            status = self.table_b[deposit_id]['status']
-            if status == "Matched":
-                status_label.config(text="Matched", fg="green", bg="#303030")
-            else:
-                status_label.config(text="Unmatched", fg="red", bg="#303030")
-
-        # Enable highlighting
-        self.highlight_enabled = True
-
-
-    
-
-    def get_all_subsets(self, deposits, prefix):
-        """
-        Generate all possible non-empty subsets for a list of deposits.
-        Each subset includes the sum and the deposit IDs.
-        """
-        subsets = []
-        for r in range(1, len(deposits) + 1):
-            for subset in combinations(enumerate(deposits), r):
-                deposit_indices = [f"{prefix}{i+1}" for i, _ in subset]
-                subset_sum = round(sum([val for _, val in subset]), 10)  # Avoid floating-point issues
-                subsets.append({
-                    'deposit_ids': deposit_indices,
-                    'sum': subset_sum
-                })
-        return subsets
-
-    def find_matching_subset_pairs(self, subsets_a, subsets_b):
-        """
-        Find all subset pairs from A and B that have the same sum.
-        """
-        sum_to_subsets_a = {}
-        for subset in subsets_a:
-            sum_val = subset['sum']
-            if sum_val not in sum_to_subsets_a:
-                sum_to_subsets_a[sum_val] = []
-            sum_to_subsets_a[sum_val].append(subset)
-
-        sum_to_subsets_b = {}
-        for subset in subsets_b:
-            sum_val = subset['sum']
-            if sum_val not in sum_to_subsets_b:
-                sum_to_subsets_b[sum_val] = []
-            sum_to_subsets_b[sum_val].append(subset)
-
-        # Find matching sums
-        matching_subset_pairs = []
-        for sum_val in sum_to_subsets_a:
-            if sum_val in sum_to_subsets_b:
-                for subset_a in sum_to_subsets_a[sum_val]:
-                    for subset_b in sum_to_subsets_b[sum_val]:
-                        matching_subset_pairs.append((subset_a, subset_b, sum_val))
-        return matching_subset_pairs
-
-    def find_optimal_matching(self, matching_subset_pairs):
-        """
-        Find the optimal combination of subset pairs that maximizes the total sum
-        without overlapping deposits. This version is iterative to avoid recursion limits.
-        """
-        best_matching = []
-        best_total = 0
-
-        # Convert matching_subset_pairs to include unique identifiers for each subset
-        indexed_pairs = [(index, subset_a, subset_b, sum_val)
-                         for index, (subset_a, subset_b, sum_val) in enumerate(matching_subset_pairs)]
-
-        # Generate combinations iteratively to find non-overlapping matches
-        for combination in product(*indexed_pairs):
-            used_a = set()
-            used_b = set()
-            current_matching = []
-            current_total = 0
-            valid_combination = True
-
-            for _, subset_a, subset_b, sum_val in combination:
-                # Check if the subsets overlap with already used elements
-                if any(dep_id in used_a for dep_id in subset_a['deposit_ids']) or \
-                   any(dep_id in used_b for dep_id in subset_b['deposit_ids']):
-                    valid_combination = False
-                    break
-
-                # Add to current matching if valid
-                current_matching.append((subset_a, subset_b, sum_val))
-                current_total += sum_val
-
-                # Mark elements as used
-                used_a.update(subset_a['deposit_ids'])
-                used_b.update(subset_b['deposit_ids'])
-
-            # Check if this combination has a higher total than the best found
-            if valid_combination and current_total > best_total:
-                best_total = current_total
-                best_matching = current_matching
-
-        return best_matching
+                choice.set(values[0])
+            choice.grid(row=row, column=1, padx=10, pady=5, sticky="w")
+            choices.append(choice)
+
+        columns = []
+        def accept():
+            # Position in the combobox list, less the '(none)' entry of the optional columns
+            for k, choice in enumerate(choices):
+                index = choice.current() - (k > 0)
+                columns.append(index if index >= 0 else None)
+            dialog.destroy()
+
+        button_frame = tk.Frame(dialog, bg="#303030")
+        button_frame.grid(row=3, column=0, columnspan=2, pady=10)
+        tk.Button(button_frame, text="Import", command=accept).pack(side="left", padx=5)
+        tk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side="left", padx=5)
+        self.root.wait_window(dialog)
+        return tuple(columns) if columns else None
 
     def paste_list_a(self):
         """
         Handle pasting multiple deposit values into List A.
         """
-        try:
-            clipboard_data = self.root.clipboard_get()
-            # Split by newlines and possibly tabs
-            lines = [line.strip() for line in clipboard_data.replace('\r', '').split('\n') if line.strip()]
-            num_entries = len(self.list_a_entries)
-            if len(lines) > num_entries:
-                messagebox.showwarning("Paste Warning", f"Number of pasted values ({len(lines)}) exceeds the number of deposit entries ({num_entries}). Extra values will be ignored.")
-            for i, entry_tuple in enumerate(self.list_a_entries):
-                if i < len(lines):
-                    entry, _ = entry_tuple
-                    entry.delete(0, tk.END)
-                    entry.insert(0, lines[i])
-                else:
-                    # Optionally, clear remaining entries or leave them as is
-                    pass
-        except tk.TclError:
-            messagebox.showerror("Paste Error", "Clipboard does not contain valid text data.")
+        self.paste_list(self.grid_a)
 
     def paste_list_b(self):
         """
         Handle pasting multiple deposit values into List B.
         """
+        self.paste_list(self.grid_b)
+
+    def paste_list(self, grid):
+        """
+        Fill a grid from the clipboard, one line per deposit from the first
+        row on, adding rows when there are more lines than deposits. Each
+        line holds the amount, then optionally the date and reference in the
+        following tab-separated columns.
+        """
         try:
             clipboard_data = self.root.clipboard_get()
-            # Split by newlines and possibly tabs
-            lines = [line.strip() for line in clipboard_data.replace('\r', '').split('\n') if line.strip()]
-            num_entries = len(self.list_b_entries)
-            if len(lines) > num_entries:
-                messagebox.showwarning("Paste Warning", f"Number of pasted values ({len(lines)}) exceeds the number of deposit entries ({num_entries}). Extra values will be ignored.")
-            for i, entry_tuple in enumerate(self.list_b_entries):
-                if i < len(lines):
-                    entry, _ = entry_tuple
-                    entry.delete(0, tk.END)
-                    entry.insert(0, lines[i])
-                else:
-                    # Optionally, clear remaining entries or leave them as is
-                    pass
         except tk.TclError:
             messagebox.showerror("Paste Error", "Clipboard does not contain valid text data.")
+            return
+        # Split by newlines and possibly tabs
+        lines = [line.strip() for line in clipboard_data.replace('\r', '').split('\n') if line.strip()]
+        if len(lines) > len(grid):
+            grid.resize(len(lines))
+        for i, line in enumerate(lines):
+            columns = [column.strip() for column in line.split('\t')]
+            for column_name, column in zip(grid.EDITABLE_COLUMNS, columns):
+                grid.set_cell(i, column_name, column)
+        self.add_action_buttons()
 
     def find_max_matching_sum(self):
         # Find matching subsets and related sets logic
+        deposits_a, dates_a, references_a = self.grid_a.amounts, self.grid_a.dates, self.grid_a.references
+        deposits_b, dates_b, references_b = self.grid_b.amounts, self.grid_b.dates, self.grid_b.references
+        try:
+            time_limit_text = self.time_limit_entry.get().strip()
+            time_limit = float(time_limit_text) if time_limit_text else None
+            if time_limit is not None and not time_limit > 0:
+                raise ValueError("Time limit must be positive.")
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter a positive time limit in seconds, or leave it empty for no limit.")
+            return
         try:
-            deposits_a = [float(entry.get()) for entry, _ in self.list_a_entries]
-            deposits_b = [float(entry.get()) for entry, _ in self.list_b_entries]
+            date_window_text = self.date_window_entry.get().strip()
+            date_window = int(date_window_text) if date_window_text else None
+            if date_window is not None and date_window < 0:
+                raise ValueError("Date window must not be negative.")
         except ValueError:
-            messagebox.showerror("Input Error", "Please enter valid numbers for all deposits.")
+            messagebox.showerror("Input Error", "Please enter a whole number of days for the date window, or leave it empty to ignore dates.")
+            return
+        try:
+            max_group_sizes = []
+            for size_entry in (self.max_group_size_a_entry, self.max_group_size_b_entry):
+                size_text = size_entry.get().strip()
+                max_group_sizes.append(int(size_text) if size_text else None)
+                if max_group_sizes[-1] is not None and max_group_sizes[-1] < 1:
+                    raise ValueError("Group size must be positive.")
+        except ValueError:
+            messagebox.showerror("Input Error", "Please enter a positive whole number for each max group size, or leave it empty for no limit.")
+            return
+        tolerance_text = self.tolerance_entry.get().strip() or "0"
+        if tolerance_text.endswith("%"):
+            tolerance, tolerance_percent = 0, tolerance_text[:-1].strip()
+        else:
+            tolerance, tolerance_percent = tolerance_text, 0
+        settings = dict(one_to_one="fixed" if self.fix_identical_var.get() else "revisit", tolerance=tolerance,
+                        tolerance_percent=tolerance_percent, date_window=date_window,
+                        max_group_size_a=max_group_sizes[0], max_group_size_b=max_group_sizes[1])
+        # After edits with unchanged settings, only the deposits around the changes are searched again
+        previous = None
+        if self.result is not None and self.result.optimal and settings == self.result_settings:
+            previous = self.result
+        try:
+            # Amounts are parsed into integer cents by the engine
+            reconciler = Reconciler(deposits_a, deposits_b, time_limit=time_limit,
+                                    dates_a=dates_a, dates_b=dates_b, references_a=references_a, references_b=references_b,
+                                    cache=self.cache, previous=previous, **settings)
+        except ValueError as e:
+            messagebox.showerror("Input Error", f"Please enter valid numbers for all deposits and the tolerance, and valid dates.\n\n{e}")
             return
 
-        # Populate internal tables
-        self.table_a = {}
-        for i, value in enumerate(deposits_a):
-            self.table_a[f"A{i+1}"] = {'value': value, 'status': 'Unmatched', 'related_set': None}
-
-        self.table_b = {}
-        for i, value in enumerate(deposits_b):
-            self.table_b[f"B{i+1}"] = {'value': value, 'status': 'Unmatched', 'related_set': None}
-
-        # Generate all possible subsets for both lists with their deposit indices
-        subsets_a = self.get_all_subsets(deposits_a, prefix='A')
-        subsets_b = self.get_all_subsets(deposits_b, prefix='B')
-
-        # Find all matching subset pairs (same sum)
-        matching_subset_pairs = self.find_matching_subset_pairs(subsets_a, subsets_b)
-
-        # Find the optimal combination of subset pairs
-        optimal_matching = self.find_optimal_matching(matching_subset_pairs)
-
-        # Assign related set identifiers and update internal tables
-        related_set_id = 1
-        for pair in optimal_matching:
-            subset_a, subset_b, total = pair
-            related_set = f"R{related_set_id}"
-            related_set_id += 1
-
-            # Update table for List A
-            for deposit_id in subset_a['deposit_ids']:
-                self.table_a[deposit_id]['status'] = 'Matched'
-                self.table_a[deposit_id]['related_set'] = related_set
-
-            # Update table for List B
-            for deposit_id in subset_b['deposit_ids']:
-                self.table_b[deposit_id]['status'] = 'Matched'
-                self.table_b[deposit_id]['related_set'] = related_set
-
-            # Store related sets for highlighting
-            self.selected_related_sets.append({
-                'related_set': related_set,
-                'a_deposits': subset_a['deposit_ids'],
-                'b_deposits': subset_b['deposit_ids']
-            })
-
-        # Calculate total matched sums
-        total_matched_a = sum([self.table_a[deposit_id]['value'] for deposit_id in self.table_a if self.table_a[deposit_id]['status'] == 'Matched'])
-        total_matched_b = sum([self.table_b[deposit_id]['value'] for deposit_id in self.table_b if self.table_b[deposit_id]['status'] == 'Matched'])
-
-        # Prepare result message
-        result_message = f"Total Matched: {total_matched_a}\n"
-        result_message += f"Total Unmatched - List A: {sum([self.table_a[deposit_id]['value'] for deposit_id in self.table_a if self.table_a[deposit_id]['status'] == 'Unmatched'])}\n"
-        result_message += f"Total Unmatched - List B: {sum([self.table_b[deposit_id]['value'] for deposit_id in self.table_b if self.table_b[deposit_id]['status'] == 'Unmatched'])}\n\nMatched Subsets:\n"
-        for idx, related_set in enumerate(self.selected_related_sets, 1):
-            subset_a_ids = related_set['a_deposits']
-            subset_b_ids = related_set['b_deposits']
-            subset_a_values = [self.table_a[dep_id]['value'] for dep_id in subset_a_ids]
-            subset_b_values = [self.table_b[dep_id]['value'] for dep_id in subset_b_ids]
+        # Queue the reconciliation on the background job runner; results come back through _poll_jobs
+        self.run_count += 1
+        job = self.job_runner.submit(reconciler, label=f"Run {self.run_count}")
+        self.job_settings[job.job_id] = settings
+        self._show_progress()
+        if self.current_job is None:
+            self.progress_label.config(text=f"{job.label} queued.")
+        if not self.polling:
+            self.polling = True
+            self._poll_jobs()
+
+    def _poll_jobs(self):
+        """
+        Handle events posted by the job runner, then check again shortly while jobs remain.
+        """
+        busy = bool(self.job_runner.active_jobs())  # Checked first so no final event is missed
+        while True:
+            try:
+                kind, job, payload = self.job_runner.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "started":
+                self.current_job = job
+                self.progress_bar["value"] = 0
+                self._update_progress_label(job, "Starting...")
+            elif kind == "progress" and job is self.current_job:
+                self._update_progress(job, payload)
+            elif kind == "done":
+                self.result = payload
+                self.result_settings = self.job_settings.pop(job.job_id, None)
+                self.table_a = payload.table_a
+                self.table_b = payload.table_b
+                self.selected_related_sets = payload.related_sets
+                self.deposit_to_pair_a, self.deposit_to_pair_b = payload.set_index_by_deposit()
+                self._display_results(payload)
+            elif kind == "failed":
+                self.job_settings.pop(job.job_id, None)
+                messagebox.showerror("Matching Error", f"{job.label} failed: {payload}")
+            elif kind == "cancelled":
+                self.job_settings.pop(job.job_id, None)
+
+        if busy:
+            self.root.after(100, self._poll_jobs)
+        else:
+            self.polling = False
+            self.current_job = None
+            self._hide_progress()
+
+    def _show_progress(self):
+        """
+        Show the progress bar and Cancel buttons while jobs are queued or running.
+        """
+        if self.progress_frame:
+            return
+        self.progress_frame = tk.Frame(self.root, bg="#303030")
+        self.progress_frame.pack(padx=10, pady=5, fill="x")
+        self.progress_bar = ttk.Progressbar(self.progress_frame, orient="horizontal", length=300, mode="determinate", maximum=100)
+        self.progress_bar.pack(side="left", padx=(0, 10))
+        tk.Button(self.progress_frame, text="Cancel", command=self.cancel_current_job).pack(side="left")
+        tk.Button(self.progress_frame, text="Cancel All", command=self.job_runner.cancel).pack(side="left", padx=(5, 0))
+        self.progress_label = tk.Label(self.progress_frame, text="", bg="#303030", fg="white", anchor="w")
+        self.progress_label.pack(side="left", padx=10, fill="x", expand=True)
+
+        # Keep the deposit fields in place until every queued job has finished
+        self.generate_button.config(state=tk.DISABLED)
+
+    def _update_progress(self, job, progress):
+        """
+        Show a progress snapshot of the running job.
+        """
+        stage_text = {"pairs": "Finding matching subsets", "search": "Searching for the best combination",
+                      "done": "Done"}[progress.stage]
+        self.progress_bar["value"] = progress.fraction * 100
+        self._update_progress_label(job, f"{stage_text}: matched {progress.matched} of at most {progress.bound} "
+                                         f"({progress.nodes} nodes, {progress.elapsed:.1f}s)")
+
+    def _update_progress_label(self, job, text):
+        queued = len(self.job_runner.active_jobs()) - 1
+        if queued > 0:
+            text += f" ({queued} more queued)"
+        self.progress_label.config(text=f"{job.label}: {text}")
+
+    def _hide_progress(self):
+        """
+        Remove the progress bar once every job has finished.
+        """
+        if self.progress_frame:
+            self.progress_frame.destroy()
+            self.progress_frame = None
+        self.generate_button.config(state=tk.NORMAL)
+
+    def cancel_current_job(self):
+        # Stop the running job; it still reports the best matching found so far
+        if self.current_job:
+            self.job_runner.cancel(self.current_job)
+
+    def on_close(self):
+        # Stop background work before closing the window
+        self.job_runner.shutdown()
+        self.root.destroy()
+
+    def _display_results(self, result):
+        """
+        Display the results on the UI after computation is complete.
+        """
+        result_message = ""
+        if not result.optimal:
+            reason = {"cancelled": "Search cancelled", "time": "Time limit reached", "nodes": "Search stopped early",
+                      None: "Not proven optimal"}[result.stop_reason]
+            result_message += f"{reason}: showing the best matching found; up to {result.gap} more may be matchable.\n\n"
+        result_message += f"Total Matched: {result.matched_total}\n"
+        result_message += f"Total Unmatched - List A: {result.unmatched_total_a}\n"
+        result_message += f"Total Unmatched - List B: {result.unmatched_total_b}\n"
+        if result.reused_sets:
+            result_message += f"Re-matched after edits: {result.reused_sets} related sets kept from the last run.\n"
+        if result.cache_hits and not result.cache_misses:
+            result_message += "Answered from the result cache.\n"
+        elif result.cache_hits:
+            result_message += f"Result cache: {result.cache_hits} of {result.cache_hits + result.cache_misses} groups reused.\n"
+        result_message += "\nMatched Subsets:\n"
+        # Only the first sets are spelled out; the grids show every deposit's related set
+        for idx, related_set in enumerate(self.selected_related_sets[:MAX_LISTED_SETS], 1):
+            subset_a_values = [self.table_a[dep_id]['value'] for dep_id in related_set.a_deposits]
+            subset_b_values = [self.table_b[dep_id]['value'] for dep_id in related_set.b_deposits]
             subset_a_str = ', '.join(map(str, subset_a_values))
             subset_b_str = ', '.join(map(str, subset_b_values))
-            subset_sum = round(sum(subset_a_values), 2)  # Assuming subset_a_sum == subset_b_sum
-            result_message += f"Pair {idx}: List A [{subset_a_str}] <--> List B [{subset_b_str}] (Sum: {subset_sum})\n"
-
-        if self.results_label:
-            self.results_label.destroy()
-        self.results_label = tk.Label(self.root, text=result_message, font=("Arial", 12, "bold"), justify=tk.LEFT, anchor="w", bg="#303030", fg="white")
-        self.results_label.pack(padx=10, pady=10, fill="both", expand=True)
-
-        # Update status labels for List A
-        for i, (entry, status_label) in enumerate(self.list_a_entries):
-            deposit_id = f"A{i+1}"
-            status = self.table_a[deposit_id]['status']
-            if status == "Matched":
-                status_label.config(text="Matched", fg="green", bg="#303030")
-            else:
-                status_label.config(text="Unmatched", fg="red", bg="#303030")
-
-        # Update status labels for List B
-        for i, (entry, status_label) in enumerate(self.list_b_entries):
-            deposit_id = f"B{i+1}"
-            status = self.table_b[deposit_id]['status']
-            if status == "Matched":
-                status_label.config(text="Matched", fg="green", bg="#303030")
-            else:
-                status_label.config(text="Unmatched", fg="red", bg="#303030")
-
-        # Enable highlighting
+            difference_str = f", Difference: {related_set.difference}" if related_set.difference_cents else ""
+            result_message += f"Pair {idx}: List A [{subset_a_str}] <--> List B [{subset_b_str}] (Sum: {related_set.total}{difference_str})\n"
+        if len(self.selected_related_sets) > MAX_LISTED_SETS:
+            result_message += f"... and {len(self.selected_related_sets) - MAX_LISTED_SETS:,} more (see the Related Set column)\n"
+
+        if self.results_frame:
+            self.results_frame.destroy()
+        self.results_frame = tk.Frame(self.root, bg="#303030")
+        self.results_frame.pack(padx=10, pady=10, fill="both", expand=True)
+        self.results_label = tk.Label(self.results_frame, text=result_message, font=("Arial", 12, "bold"), justify=tk.LEFT, anchor="nw", bg="#303030", fg="white")
+        self.results_label.pack(side="left", fill="both", expand=True)
+
+        # Collapsible Diagnostics panel: where the run spent its time, and how much work each stage did
+        diagnostics_frame = tk.Frame(self.results_frame, bg="#303030")
+        diagnostics_frame.pack(side="right", anchor="n", padx=(10, 0))
+        self.diagnostics_button = tk.Button(diagnostics_frame, command=self.toggle_diagnostics)
+        self.diagnostics_button.pack(anchor="e")
+        diagnostics_text = "\n".join(result.diagnostics.summary_lines()) if result.diagnostics else "No diagnostics."
+        self.diagnostics_label = tk.Label(diagnostics_frame, text=diagnostics_text, font=("Courier", 10), justify=tk.LEFT,
+                                          anchor="nw", bg="#1d1d1e", fg="white", padx=5, pady=5)
+        self._show_diagnostics()
+
+        # Fill in the Status and Related Set columns
+        self.grid_a.show_results(self.table_a)
+        self.grid_b.show_results(self.table_b)
+
+        # Enable highlighting; show_results has reset every row's tags
+        self.hovered_deposit = None
+        self.highlighted_set = None
         self.highlight_enabled = True
 
-    def get_all_subsets(self, deposits, prefix):
-        """
-        Generate all possible non-empty subsets for a list of deposits.
-        Each subset includes the sum and the deposit IDs.
-        """
-        subsets = []
-        for r in range(1, len(deposits) + 1):
-            for subset in combinations(enumerate(deposits), r):
-                deposit_indices = [f"{prefix}{i+1}" for i, _ in subset]
-                subset_sum = round(sum([val for _, val in subset]), 10)  # Avoid floating-point issues
-                subsets.append({
-                    'deposit_ids': deposit_indices,
-                    'sum': subset_sum
-                })
-        return subsets
-
-    def find_matching_subset_pairs(self, subsets_a, subsets_b):
-        """
-        Find all subset pairs from A and B that have the same sum.
-        """
-        sum_to_subsets_a = {}
-        for subset in subsets_a:
-            sum_val = subset['sum']
-            if sum_val not in sum_to_subsets_a:
-                sum_to_subsets_a[sum_val] = []
-            sum_to_subsets_a[sum_val].append(subset)
-
-        sum_to_subsets_b = {}
-        for subset in subsets_b:
-            sum_val = subset['sum']
-            if sum_val not in sum_to_subsets_b:
-                sum_to_subsets_b[sum_val] = []
-            sum_to_subsets_b[sum_val].append(subset)
-
-        # Find matching sums
-        matching_subset_pairs = []
-        for sum_val in sum_to_subsets_a:
-            if sum_val in sum_to_subsets_b:
-                for subset_a in sum_to_subsets_a[sum_val]:
-                    for subset_b in sum_to_subsets_b[sum_val]:
-                        matching_subset_pairs.append((subset_a, subset_b, sum_val))
-        return matching_subset_pairs
-
-    def find_optimal_matching(self, matching_subset_pairs):
-        """
-        Find the optimal combination of subset pairs that maximizes the total sum
-        without overlapping deposits. This version is iterative to avoid recursion limits.
-        """
-        best_matching = []
-        best_total = 0
-
-        # We will check each combination of matching subset pairs
-        # Since combinations can be large, use each pair individually in a loop to avoid deep recursion
-        for i in range(len(matching_subset_pairs)):
-            # Track used deposits to avoid overlaps
-            used_a = set()
-            used_b = set()
-            current_matching = []
-            current_total = 0
-
-            # Go through each subset pair starting from the i-th element
-            for subset_a, subset_b, sum_val in matching_subset_pairs[i:]:
-                # Check if this subset pair has any overlap with already used elements
-                if any(dep_id in used_a for dep_id in subset_a['deposit_ids']) or \
-                   any(dep_id in used_b for dep_id in subset_b['deposit_ids']):
-                    continue  # Skip this pair if there's an overlap
-
-                # Add this subset pair to the current matching
-                current_matching.append((subset_a, subset_b, sum_val))
-                current_total += sum_val
-
-                # Mark elements as used
-                used_a.update(subset_a['deposit_ids'])
-                used_b.update(subset_b['deposit_ids'])
-
-            # Check if this combination has a higher total than the best found
-            if current_total > best_total:
-                best_total = current_total
-                best_matching = current_matching
-
-        return best_matching
+    def toggle_diagnostics(self):
+        # Expand or collapse the Diagnostics panel next to the results
+        self.diagnostics_visible = not self.diagnostics_visible
+        self._show_diagnostics()
 
+    def _show_diagnostics(self):
+        if self.diagnostics_visible:
+            self.diagnostics_button.config(text="Diagnostics \u25be")
+            self.diagnostics_label.pack(anchor="ne", pady=(5, 0))
+        else:
+            self.diagnostics_button.config(text="Diagnostics \u25b8")
+            self.diagnostics_label.pack_forget()
 
     def highlight_related(self, event, list_type):
         if not self.highlight_enabled:
             return
 
-        widget = event.widget
-        try:
-            if list_type == "A":
-                # Find the deposit ID of the hovered entry in List A
-                deposit_id = self.get_deposit_id(self.list_a_entries, widget, 'A')
-                if not deposit_id:
-                    return
-                related_set = self.table_a[deposit_id]['related_set']
-                if not related_set:
-                    return  # Unmatched; no highlighting needed
-                # Retrieve the related set details
-                related_set_details = next((rs for rs in self.selected_related_sets if rs['related_set'] == related_set), None)
-                if not related_set_details:
-                    return
-                # Highlight the related deposits
-                self._highlight_subset(related_set_details['a_deposits'], related_set_details['b_deposits'])
-            else:
-                # Find the deposit ID of the hovered entry in List B
-                deposit_id = self.get_deposit_id(self.list_b_entries, widget, 'B')
-                if not deposit_id:
-                    return
-                related_set = self.table_b[deposit_id]['related_set']
-                if not related_set:
-                    return  # Unmatched; no highlighting needed
-                # Retrieve the related set details
-                related_set_details = next((rs for rs in self.selected_related_sets if rs['related_set'] == related_set), None)
-                if not related_set_details:
-                    return
-                # Highlight the related deposits
-                self._highlight_subset(related_set_details['a_deposits'], related_set_details['b_deposits'])
-        except Exception as e:
-            print("Error in highlight_related:", e)
-
-    def get_deposit_id(self, entries_list, widget, prefix):
-        """
-        Helper function to get the deposit ID (e.g., 'A1', 'B2') based on the widget.
-        """
-        for i, (entry, _) in enumerate(entries_list):
-            if entry == widget:
-                return f"{prefix}{i+1}"
-        return None
+        # Find the deposit ID of the hovered row; rows are identified by it
+        deposit_id = event.widget.identify_row(event.y)
+        if deposit_id == self.hovered_deposit:
+            return
+        self.hovered_deposit = deposit_id
+        deposit_to_pair = self.deposit_to_pair_a if list_type == "A" else self.deposit_to_pair_b
+        set_index = deposit_to_pair.get(deposit_id)  # None when unmatched
+        if set_index == self.highlighted_set:
+            return  # Still within the highlighted set
 
-    def _highlight_subset(self, indices_a, indices_b):
-        # First, reset all entries to their default colors
+        # Only the rows of the old and new related sets are touched
+        self.clear_highlight()
+        if set_index is not None:
+            related_set = self.selected_related_sets[set_index]
+            self.grid_a.set_highlight(related_set.a_deposits, True)
+            self.grid_b.set_highlight(related_set.b_deposits, True)
+            self.highlighted_set = set_index
+
+    def end_hover(self):
+        self.hovered_deposit = None
         self.clear_highlight()
-
-        # Define a highlight color
-        highlight_color = "#e7786b"  # Reddish-orange
-
-        # Highlight List A entries
-        for dep_id in indices_a:
-            index = self.get_index_from_deposit_id(dep_id, 'A')
-            if index is not None:
-                self.list_a_entries[index][0].config(bg=highlight_color)
-
-        # Highlight List B entries
-        for dep_id in indices_b:
-            index = self.get_index_from_deposit_id(dep_id, 'B')
-            if index is not None:
-                self.list_b_entries[index][0].config(bg=highlight_color)
-
-    def get_index_from_deposit_id(self, deposit_id, list_type):
-        """
-        Helper function to get the index of the deposit in the entries list based on deposit ID.
-        """
-        if list_type == 'A':
-            return int(deposit_id[1:]) - 1  # Convert 'A1' to 0
-        elif list_type == 'B':
-            return int(deposit_id[1:]) - 1  # Convert 'B1' to 0
-        return None
 
     def clear_highlight(self):
-        if not self.highlight_enabled:
+        if not self.highlight_enabled or self.highlighted_set is None:
             return
+        related_set = self.selected_related_sets[self.highlighted_set]
+        self.grid_a.set_highlight(related_set.a_deposits, False)
+        self.grid_b.set_highlight(related_set.b_deposits, False)
+        self.highlighted_set = None
 
-        # Reset background colors for List A entries
-        for i, (entry, status_label) in enumerate(self.list_a_entries):
-            deposit_id = f"A{i+1}"
-            entry.config(bg="#1d1d1e")  # Reset to default background
-
-        # Reset background colors for List B entries
-        for i, (entry, status_label) in enumerate(self.list_b_entries):
-            deposit_id = f"B{i+1}"
-            entry.config(bg="#1d1d1e")  # Reset to default background
-            
     def export_to_excel(self):
-        # Create a new workbook and select the active sheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Deposits Matching"
-
-        # Set headers
-        ws['A1'] = "List A"
-        ws['B1'] = "List B"
-
-        # Define color fonts using hexadecimal values for red and green
-        matched_font = Font(color="00FF00")  # Green text
-        unmatched_font = Font(color="FF0000")  # Red text
-
-        # Populate columns with data from List A and List B with conditional formatting
-        for i, (entry, status_label) in enumerate(self.list_a_entries, start=2):
-            deposit_id = f"A{i-1}"
-            value = self.table_a[deposit_id]['value']
-            status = self.table_a[deposit_id]['status']
-            font = matched_font if status == "Matched" else unmatched_font
-            cell = ws.cell(row=i, column=1, value=value)
-            cell.font = font
-
-        for i, (entry, status_label) in enumerate(self.list_b_entries, start=2):
-            deposit_id = f"B{i-1}"
-            value = self.table_b[deposit_id]['value']
-            status = self.table_b[deposit_id]['status']
-            font = matched_font if status == "Matched" else unmatched_font
-            cell = ws.cell(row=i, column=2, value=value)
-            cell.font = font
+        """
+        Save the latest result with every deposit's status and related set,
+        per-set totals and a summary, as Excel or CSV.
+        """
+        if self.result is None:
+            messagebox.showerror("Export Error", "Find the maximum matching sum before exporting.")
+            return
 
         # Open a dialog for saving the file
-        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx"),
+                                                                                      ("CSV files", "*.csv")])
         if file_path:
-            wb.save(file_path)
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            try:
+                write_result(self.result, file_path)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Export Error", f"Could not save {file_path}.\n\n{e}")
+                return
+            finally:
+                self.root.config(cursor="")
             messagebox.showinfo("Export Successful", f"Spreadsheet saved as {file_path}")
 
 
 # Main loop
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Needed for the solver's worker processes in the standalone build
+    if len(sys.argv) > 1:  # e.g. depositsmatcher match list_a.csv list_b.csv -o result.xlsx
+        sys.exit(cli.main())
     root = tk.Tk()
     app = DepositsMatcherApp(root)
     root.mainloop()
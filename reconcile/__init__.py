@@ -0,0 +1,11 @@
+"""
+Headless matching engine for DepositsMatcher.
+"""
+
+from .budget import CancelToken, Progress
+from .cache import ResultCache
+from .diagnostics import Diagnostics
+from .engine import Reconciler, ReconcileResult, RelatedSet
+from .jobs import Job, JobRunner
+
+__all__ = ["CancelToken", "Diagnostics", "Job", "JobRunner", "Progress", "Reconciler", "ReconcileResult", "RelatedSet", "ResultCache"]
@@ -0,0 +1,8 @@
+import sys
+
+from .cli import main
+
+
+# Allows `python -m reconcile match list_a.csv list_b.csv -o result.xlsx`
+
+sys.exit(main())
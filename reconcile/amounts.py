@@ -0,0 +1,40 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+
+# Fixed-point amount handling. The engine works in integer cents so subset
+# sums are exact and equal totals compare equal.
+
+CENTS_PER_UNIT = 100
+
+
+def to_cents(value):
+    """
+    Convert an amount (number or text such as '1,234.56') to integer cents,
+    rounding half up. Raises ValueError for anything that is not a number.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * CENTS_PER_UNIT
+    text = str(value).strip().replace(",", "")
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    return int((amount * CENTS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """
+    Convert integer cents back to a float amount for display.
+    """
+    return cents / CENTS_PER_UNIT
+
+
+def format_cents(cents):
+    """
+    Format integer cents as a plain decimal string, e.g. 123456 -> '1234.56'.
+    """
+    sign = "-" if cents < 0 else ""
+    units, remainder = divmod(abs(cents), CENTS_PER_UNIT)
+    return f"{sign}{units}.{remainder:02d}"
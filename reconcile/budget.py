@@ -0,0 +1,203 @@
+import threading
+import time
+from dataclasses import dataclass
+
+from .amounts import from_cents
+
+
+# Time/node budgets, cancellation and progress reporting for the matching
+# engine. A search that runs out of budget stops where it is and the engine
+# returns the best matching found so far together with an upper bound.
+
+# Minimum number of seconds between two progress callbacks
+REPORT_INTERVAL = 0.1
+
+# Consult the budget after this many pairs while enumerating
+PAIR_CHECK_INTERVAL = 256
+
+# Consult the budget after this many search nodes; a node can have thousands
+# of pairs to branch on, so the search checks it far more often than that
+NODE_CHECK_INTERVAL = 128
+
+# Share of the time limit pair enumeration may take; the rest is left for
+# building the search over the pairs found and running it
+PAIR_TIME_SHARE = 0.8
+
+# Consult the budget after this many subset sums while walking them; a walk
+# that finds few matching pairs still stops in time this way
+SUBSET_CHECK_INTERVAL = 4096
+
+
+class CancelToken:
+    """
+    Thread-safe flag used to ask a running reconciliation to stop early.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def cancelled(self):
+        return self._event.is_set()
+
+
+@dataclass
+class Progress:
+    """
+    Snapshot of a running reconciliation passed to progress callbacks.
+    """
+    stage: str  # 'pairs' while enumerating subset pairs, 'search' while choosing them, then 'done'
+    fraction: float  # Estimated share of the current stage completed, 0.0 to 1.0
+    nodes: int  # Search nodes explored so far
+    matched_cents: int  # Best matched total found so far
+    bound_cents: int  # Most the matched total can still reach
+    elapsed: float  # Seconds since the reconciliation started
+
+    @property
+    def matched(self):
+        return from_cents(self.matched_cents)
+
+    @property
+    def bound(self):
+        return from_cents(self.bound_cents)
+
+
+class SearchBudget:
+    """
+    Limits and progress reporting for one reconciliation.
+
+    time_limit is in seconds and node_limit counts search nodes across the
+    whole run; either may be None for no limit. cancel_token is an optional
+    CancelToken and progress an optional callable taking a Progress.
+
+    Pair enumeration stops once it has taken PAIR_TIME_SHARE of the time
+    limit (see pairs_exhausted), so a run cut short still searches the
+    pairs found before the limit.
+
+    The search reports figures for the part it is working on; base_cents,
+    pending_cents and the fraction span describe the rest of the run so
+    callbacks always see totals for the whole reconciliation.
+
+    diagnostics is an optional Diagnostics the engine records its stages
+    in; the budget itself counts subsets, pairs, nodes and prunes.
+    """
+    def __init__(self, time_limit=None, node_limit=None, cancel_token=None, progress=None, diagnostics=None):
+        self.started = time.monotonic()
+        self.deadline = self.started + time_limit if time_limit is not None else None
+        self.pairs_deadline = self.started + time_limit * PAIR_TIME_SHARE if time_limit is not None else None
+        self.node_limit = node_limit
+        self.cancel_token = cancel_token
+        self.progress = progress
+        self.diagnostics = diagnostics
+        self.nodes = 0
+        self.prunes = 0  # Search nodes cut off by the bound or an already visited state
+        self.subsets = 0  # Subset sums walked while enumerating pairs
+        self.pairs = 0  # Candidate pairs passed on by iter_within_budget
+        self.stop_reason = None  # 'cancelled', 'time' or 'nodes' once the budget ran out
+        self.truncated = False  # True when pair enumeration was cut short
+        self.pairs_stop_reason = None  # 'time' once pair enumeration used up its share of the time limit
+        self.last_report = None
+
+        # Context of the part being searched
+        self.base_cents = 0  # Matched by parts already decided
+        self.pending_cents = 0  # Upper bound of parts not searched yet
+        self.fraction_start = 0.0
+        self.fraction_span = 1.0
+
+    def exhausted(self):
+        """
+        Return True once the run has been cancelled or is out of time or nodes.
+        """
+        if self.stop_reason is None:
+            if self.cancel_token is not None and self.cancel_token.cancelled():
+                self.stop_reason = 'cancelled'
+            elif self.deadline is not None and time.monotonic() >= self.deadline:
+                self.stop_reason = 'time'
+            elif self.node_limit is not None and self.nodes >= self.node_limit:
+                self.stop_reason = 'nodes'
+        return self.stop_reason is not None
+
+    def pairs_exhausted(self):
+        """
+        Return True, marking the enumeration truncated, once pair enumeration
+        should stop: the budget has run out or enumerating has taken its
+        share of the time limit.
+        """
+        if not self.exhausted() and (self.pairs_deadline is None or time.monotonic() < self.pairs_deadline):
+            return False
+        if self.stop_reason is None:
+            self.pairs_stop_reason = 'time'
+        self.truncated = True
+        return True
+
+    def spend(self, nodes, prunes=0):
+        """
+        Count explored (and pruned) search nodes and return True when the
+        search should stop.
+        """
+        self.nodes += nodes
+        self.prunes += prunes
+        return self.exhausted()
+
+    def walk(self, subsets, sum_val, max_sum=None, descending=False, fraction=None):
+        """
+        Count subsets walked while enumerating pairs, report how far their
+        sums have got (or the given fraction of the walk done), and return
+        True (marking the enumeration truncated) when the walk should stop.
+        """
+        self.subsets += subsets
+        if self.pairs_exhausted():
+            return True
+        if max_sum and self.report_due():
+            if fraction is None:
+                fraction = min(max(sum_val / max_sum, 0.0), 1.0)
+                fraction = 1.0 - fraction if descending else fraction
+            self.report('pairs', fraction, self.base_cents, self.base_cents + max_sum)
+        return False
+
+    def report_due(self):
+        if self.progress is None:
+            return False
+        return self.last_report is None or time.monotonic() - self.last_report >= REPORT_INTERVAL
+
+    def report(self, stage, fraction, matched_cents, bound_cents, force=False):
+        """
+        Send a Progress to the callback, at most once per REPORT_INTERVAL unless forced.
+        """
+        if self.progress is None or not (force or self.report_due()):
+            return
+        self.last_report = time.monotonic()
+        self.progress(Progress(stage, min(max(fraction, 0.0), 1.0), self.nodes, matched_cents, bound_cents,
+                               self.last_report - self.started))
+
+    def report_search(self, matched_cents, bound_cents, fraction):
+        """
+        Report progress of the part being searched, in figures for the whole run.
+        """
+        self.report('search', self.fraction_start + self.fraction_span * fraction,
+                    self.base_cents + matched_cents, self.base_cents + bound_cents + self.pending_cents)
+
+
+def iter_within_budget(matching_subset_pairs, budget, max_sum, descending=False):
+    """
+    Pass pairs through until the budget runs out, reporting enumeration progress.
+
+    Stopping early leaves a shorter stream of valid pairs, so whatever is
+    built from it is still a valid (if smaller) matching.
+    """
+    count = 0
+    try:
+        for count, pair in enumerate(matching_subset_pairs, 1):
+            if count % PAIR_CHECK_INTERVAL == 0:
+                if budget.pairs_exhausted():
+                    count -= 1
+                    return
+                if budget.report_due():
+                    fraction = pair[2] / max_sum if max_sum > 0 else 1.0
+                    budget.report('pairs', 1.0 - fraction if descending else fraction,
+                                  budget.base_cents, budget.base_cents + max_sum)
+            yield pair
+    finally:
+        budget.pairs += count
+
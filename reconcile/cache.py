@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+
+from .subsets import iter_bits, remap_mask
+
+
+# On-disk cache of solved matchings. Entries live in an SQLite file keyed by a
+# SHA-256 hash of the normalized problem: amounts in cents (sorted, so the same
+# lists in another order hit too), day numbers when dates matter, and every
+# setting that changes the answer. Only complete results are stored, and the
+# least recently used entries are evicted once the file outgrows its budget.
+
+# Part of every key; bump it when the stored format or the solver's answers change
+CACHE_VERSION = 1
+
+# Default size budget for stored results
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Seconds to wait for another process holding the database lock
+LOCK_TIMEOUT = 30
+
+
+def default_cache_path():
+    """
+    Return the cache file in the user's data directory: %LOCALAPPDATA% on
+    Windows, ~/Library/Caches on macOS, otherwise $XDG_CACHE_HOME or ~/.cache.
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "DepositsMatcher", "results.sqlite3")
+
+
+class ResultCache:
+    """
+    SQLite store of solved matchings with size-based LRU eviction.
+
+    Each call opens its own connection, so one cache can be shared by the
+    GUI thread and a JobRunner thread, and several processes may use the
+    same file. A cache that cannot be read or written behaves as empty
+    rather than failing the reconciliation.
+
+    Usage:
+        cache = ResultCache()
+        result = Reconciler(deposits_a, deposits_b, cache=cache).solve()
+    """
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        if not max_bytes > 0:
+            raise ValueError(f"max_bytes must be a positive number of bytes, got {max_bytes!r}.")
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        self._ready = False
+
+    def get(self, key):
+        """
+        Return the value stored under key, or None.
+        """
+        try:
+            with closing(self._connect()) as connection, connection:
+                row = connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+        except (sqlite3.Error, OSError, ValueError):
+            return None
+
+    def put(self, key, value):
+        """
+        Store a JSON-serializable value under key, then evict the least
+        recently used entries beyond max_bytes.
+        """
+        data = json.dumps(value, separators=(",", ":"))
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute("INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                                   (key, data, len(data), time.time()))
+                total = 0
+                stale = []
+                for old_key, size in connection.execute("SELECT key, size FROM results ORDER BY last_used DESC"):
+                    total += size
+                    if total > self.max_bytes:
+                        stale.append((old_key,))
+                connection.executemany("DELETE FROM results WHERE key = ?", stale)
+        except (sqlite3.Error, OSError):
+            pass
+
+    def clear(self):
+        """
+        Remove every stored result.
+        """
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute("DELETE FROM results")
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT)
+        if not self._ready:
+            with connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                   "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                                   "last_used REAL NOT NULL)")
+            self._ready = True
+        return connection
+
+
+def content_key(kind, *parts):
+    """
+    Hash a problem description made of JSON-serializable parts.
+    """
+    data = json.dumps([CACHE_VERSION, kind, *parts], separators=(",", ":"))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def canonical_order(values, days=None):
+    """
+    Return the positions of values sorted by (value, day), the order in
+    which cached masks are stored.
+    """
+    if days is None:
+        return sorted(range(len(values)), key=values.__getitem__)
+    return sorted(range(len(values)), key=lambda i: (values[i], days[i]))
+
+
+def to_canonical(pairs, order_a, order_b):
+    """
+    Translate (mask_a, mask_b, cents) pairs from list positions to positions
+    in the canonical order, for storing.
+    """
+    rank_a = {i: k for k, i in enumerate(order_a)}
+    rank_b = {j: k for k, j in enumerate(order_b)}
+    return [[sum(1 << rank_a[i] for i in iter_bits(mask_a)), sum(1 << rank_b[j] for j in iter_bits(mask_b)), cents]
+            for mask_a, mask_b, cents in pairs]
+
+
+def from_canonical(pairs, order_a, order_b):
+    """
+    Translate stored pairs back to list positions.
+    """
+    return [(remap_mask(mask_a, order_a), remap_mask(mask_b, order_b), cents) for mask_a, mask_b, cents in pairs]
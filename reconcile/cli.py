@@ -0,0 +1,318 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .amounts import format_cents
+from .cache import ResultCache, default_cache_path
+from .engine import ONE_TO_ONE_MODES, SOLVERS, Reconciler, total_cents
+from .files import read_deposits, read_result, write_result
+
+
+# Command line for reconciling deposit files without the GUI:
+#
+#   python -m reconcile match list_a.csv list_b.csv -o result.xlsx
+#   python -m reconcile batch inputs/ -o results/ --jobs 4
+#
+# A batch reconciles many A/B file pairs, each in its own process, and writes
+# one result file per pair plus summary.csv. With --previous, the result of an
+# earlier run is re-matched incrementally, so a daily reconciliation only
+# searches the deposits that changed or arrived since. --diagnostics writes the
+# time spent in each stage and the engine's counters as JSON (and --trace as
+# trace events) to see where a slow reconciliation spends its time.
+
+# File types read as deposit lists
+INPUT_EXTENSIONS = (".csv", ".xlsx")
+
+# Columns of a batch summary
+SUMMARY_HEADERS = ("name", "file_a", "file_b", "matched", "unmatched_a", "unmatched_b", "related_sets",
+                   "optimal", "gap", "cache_hits", "cache_misses", "reused_sets", "seconds", "error")
+
+
+def main(argv=None):
+    """
+    Run the command line and return the exit status: 0 on success, 1 when
+    a file could not be reconciled, 2 for invalid arguments.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        settings = reconciler_settings(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.command == "match":
+        return run_match(args, settings)
+    return run_batch(args, settings)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="depositsmatcher", description="Match deposits in List A against deposits in List B.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    match_parser = commands.add_parser("match", help="reconcile one pair of files")
+    match_parser.add_argument("file_a", help="List A deposits (.csv or .xlsx)")
+    match_parser.add_argument("file_b", help="List B deposits (.csv or .xlsx)")
+    match_parser.add_argument("-o", "--output", help="result file (.xlsx or .csv); prints a summary only if omitted")
+    match_parser.add_argument("--workers", type=positive_int, default=1,
+                              help="processes for the search (default: 1)")
+    match_parser.add_argument("--previous", help="result file of an earlier run on these lists; only the "
+                                                 "deposits around changes and additions are searched again")
+    match_parser.add_argument("--diagnostics", help="write stage timings and counters to this JSON file")
+    match_parser.add_argument("--trace", help="write the stages as trace events (for chrome://tracing or Perfetto) "
+                                              "to this JSON file")
+    add_matching_options(match_parser)
+
+    batch_parser = commands.add_parser("batch", help="reconcile many pairs of files")
+    batch_parser.add_argument("source", help="directory of NAME_a/NAME_b file pairs, or a manifest CSV "
+                                             "with columns a, b and optionally name")
+    batch_parser.add_argument("-o", "--output", required=True, help="directory for the results and summary.csv")
+    batch_parser.add_argument("--jobs", type=positive_int, default=None,
+                              help="pairs reconciled at once (default: every CPU)")
+    batch_parser.add_argument("--format", choices=("xlsx", "csv"), default="xlsx", help="result file type")
+    batch_parser.add_argument("--previous", help="results directory of an earlier batch; each pair with a "
+                                                 "result there is re-matched incrementally")
+    batch_parser.add_argument("--diagnostics", action="store_true",
+                              help="also write NAME.diagnostics.json with stage timings and counters for each pair")
+    add_matching_options(batch_parser)
+    return parser
+
+
+def add_matching_options(parser):
+    parser.add_argument("--amount-column",
+                        help="amount column, by header name or number (default: 'Amount' or the first)")
+    parser.add_argument("--date-column", help="date column, by header name or number")
+    parser.add_argument("--reference-column", help="reference column, by header name or number")
+    parser.add_argument("--time-limit", type=float, default=30, help="seconds per reconciliation (default: 30)")
+    parser.add_argument("--tolerance", default="0", help="allowed difference, e.g. 0.05 or 0.5%%")
+    parser.add_argument("--date-window", type=int, default=None, help="days a related set may span")
+    parser.add_argument("--max-group-size-a", type=int, default=None, help="most List A deposits per related set")
+    parser.add_argument("--max-group-size-b", type=int, default=None, help="most List B deposits per related set")
+    parser.add_argument("--solver", choices=SOLVERS, default="exact")
+    parser.add_argument("--one-to-one", choices=ONE_TO_ONE_MODES, default="fixed")
+    parser.add_argument("--cache", default=default_cache_path(), help="result cache file (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="always solve from scratch")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="trace the peak memory of each stage in the diagnostics (slower)")
+
+
+def reconciler_settings(args):
+    """
+    Collect the settings shared by every file pair: the read_deposits
+    column arguments and the Reconciler keyword arguments.
+    """
+    if not args.time_limit > 0:
+        raise ValueError(f"--time-limit must be a positive number of seconds, got {args.time_limit!r}.")
+    if args.date_window is not None and args.date_window < 0:
+        raise ValueError(f"--date-window must not be negative, got {args.date_window!r}.")
+    tolerance, tolerance_percent = parse_tolerance(args.tolerance)
+    columns = dict(amount_column=parse_column(args.amount_column), date_column=parse_column(args.date_column),
+                   reference_column=parse_column(args.reference_column))
+    return dict(columns=columns, cache_path=None if args.no_cache else args.cache, solver=args.solver,
+                one_to_one=args.one_to_one, time_limit=args.time_limit, tolerance=tolerance,
+                tolerance_percent=tolerance_percent, date_window=args.date_window,
+                max_group_size_a=args.max_group_size_a, max_group_size_b=args.max_group_size_b,
+                profile_memory=args.profile_memory)
+
+
+def positive_int(text):
+    """
+    Parse a count of processes, rejecting anything below 1 as a usage error.
+    """
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {text!r}")
+    return value
+
+
+def parse_tolerance(text):
+    """
+    Split a tolerance such as '0.05' or '0.5%' into (tolerance, tolerance_percent).
+    """
+    text = text.strip() or "0"
+    if text.endswith("%"):
+        return 0, text[:-1].strip()
+    return text, 0
+
+
+def parse_column(text):
+    """
+    Turn a column given on the command line as a 1-based number or a header
+    name into what read_deposits expects.
+    """
+    if text is None or not text.strip().isdigit():
+        return text
+    if int(text) < 1:
+        raise ValueError(f"Column numbers start at 1, got {text!r}.")
+    return int(text) - 1
+
+
+def reconcile_files(file_a, file_b, output=None, workers=1, columns=None, cache_path=None, previous=None,
+                    diagnostics=None, trace=None, **settings):
+    """
+    Reconcile two deposit files, optionally write the result, and return it.
+    columns holds the read_deposits column arguments for both files,
+    cache_path the ResultCache file to use, if any, and previous the result
+    file of an earlier run to re-match incrementally, if any. diagnostics
+    and trace are optional files for the run's diagnostics as JSON and as
+    trace events.
+    """
+    deposits_a = read_deposits(file_a, **columns or {})
+    deposits_b = read_deposits(file_b, **columns or {})
+    reconciler = Reconciler(deposits_a.amounts, deposits_b.amounts, workers=workers,
+                            dates_a=deposits_a.dates, dates_b=deposits_b.dates,
+                            references_a=deposits_a.references, references_b=deposits_b.references,
+                            cache=ResultCache(cache_path) if cache_path else None,
+                            previous=read_result(previous) if previous else None, **settings)
+    result = reconciler.solve()
+    if output:
+        write_result(result, output)
+    if diagnostics:
+        result.diagnostics.write_json(diagnostics)
+    if trace:
+        result.diagnostics.write_trace(trace)
+    return result
+
+
+def run_match(args, settings):
+    try:
+        result = reconcile_files(args.file_a, args.file_b, args.output, workers=args.workers,
+                                 previous=args.previous, diagnostics=args.diagnostics, trace=args.trace, **settings)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Matched total: {format_cents(total_cents(result.table_a, 'Matched'))}")
+    print(f"Unmatched in List A: {format_cents(total_cents(result.table_a, 'Unmatched'))}")
+    print(f"Unmatched in List B: {format_cents(total_cents(result.table_b, 'Unmatched'))}")
+    print(f"Related sets: {len(result.related_sets)}")
+    if result.reused_sets:
+        print(f"Kept {result.reused_sets} related sets from {args.previous}")
+    if result.cache_hits or result.cache_misses:
+        print(f"Result cache: {result.cache_hits} hits, {result.cache_misses} misses")
+    if not result.optimal:
+        # A greedy or incremental run can finish without being proven optimal
+        status = f"Stopped early ({result.stop_reason})" if result.stop_reason else "Not proven optimal"
+        print(f"{status}; up to {format_cents(result.gap_cents)} more may be matchable.")
+    if args.output:
+        print(f"Result saved as {args.output}")
+    for path in (args.diagnostics, args.trace):
+        if path:
+            print(f"Diagnostics saved as {path}")
+    return 0
+
+
+def run_batch(args, settings):
+    try:
+        pairs = find_pairs(args.source)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not pairs:
+        print(f"Error: no file pairs found in {args.source}", file=sys.stderr)
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    rows = {}
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(reconcile_pair, name, file_a, file_b,
+                                   os.path.join(args.output, f"{name}.{args.format}"),
+                                   dict(settings, previous=previous_result(args.previous, name),
+                                        diagnostics=os.path.join(args.output, f"{name}.diagnostics.json")
+                                        if args.diagnostics else None))
+                   for name, file_a, file_b in pairs]
+        for future in as_completed(futures):
+            row = future.result()
+            rows[row["name"]] = row
+            status = f"error: {row['error']}" if row["error"] else f"matched {row['matched']}"
+            print(f"{row['name']}: {status} ({row['seconds']}s)")
+
+    summary_path = os.path.join(args.output, "summary.csv")
+    with open(summary_path, "w", newline="", encoding="utf-8") as summary_file:
+        writer = csv.DictWriter(summary_file, SUMMARY_HEADERS)
+        writer.writeheader()
+        writer.writerows(rows[name] for name, _, _ in pairs)
+    failed = sum(1 for row in rows.values() if row["error"])
+    print(f"Reconciled {len(pairs) - failed} of {len(pairs)} pairs; summary saved as {summary_path}")
+    return 1 if failed else 0
+
+
+def reconcile_pair(name, file_a, file_b, output, settings):
+    """
+    Reconcile one batch pair in a worker process and return its summary row.
+    Errors are reported in the row rather than raised, so one bad file does
+    not stop the batch.
+    """
+    row = dict.fromkeys(SUMMARY_HEADERS, "")
+    row.update(name=name, file_a=file_a, file_b=file_b)
+    start = time.monotonic()
+    try:
+        result = reconcile_files(file_a, file_b, output, **settings)
+    except Exception as e:  # Any failure belongs in the summary
+        row["error"] = str(e) or type(e).__name__
+    else:
+        row.update(matched=format_cents(total_cents(result.table_a, 'Matched')),
+                   unmatched_a=format_cents(total_cents(result.table_a, 'Unmatched')),
+                   unmatched_b=format_cents(total_cents(result.table_b, 'Unmatched')),
+                   related_sets=len(result.related_sets), optimal=result.optimal,
+                   cache_hits=result.cache_hits, cache_misses=result.cache_misses, reused_sets=result.reused_sets,
+                   gap=format_cents(result.gap_cents))
+    row["seconds"] = round(time.monotonic() - start, 2)
+    return row
+
+
+def previous_result(directory, name):
+    """
+    Return the result file for a pair in an earlier batch's results
+    directory, or None when there is none.
+    """
+    if directory is None:
+        return None
+    for extension in INPUT_EXTENSIONS:
+        path = os.path.join(directory, name + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def find_pairs(source):
+    """
+    Return the (name, file_a, file_b) pairs of a batch source, sorted by name.
+
+    A directory pairs NAME_a.csv with NAME_b.csv (or .xlsx); a file is read
+    as a manifest CSV with columns a and b, relative to the manifest, and
+    optionally name.
+    """
+    if os.path.isdir(source):
+        sides = {}
+        for file_name in os.listdir(source):
+            stem, extension = os.path.splitext(file_name)
+            if extension.lower() not in INPUT_EXTENSIONS or stem[-2:].lower() not in ("_a", "_b"):
+                continue
+            sides.setdefault(stem[:-2], {})[stem[-1].lower()] = os.path.join(source, file_name)
+        unpaired = sorted(name for name, files in sides.items() if len(files) != 2)
+        if unpaired:
+            raise ValueError(f"No matching List A or List B file for {', '.join(unpaired)} in {source}.")
+        return sorted((name, files["a"], files["b"]) for name, files in sides.items())
+
+    base = os.path.dirname(source)
+    pairs = []
+    with open(source, newline="", encoding="utf-8-sig") as manifest:
+        reader = csv.DictReader(manifest)
+        if not reader.fieldnames or not {"a", "b"} <= set(reader.fieldnames):
+            raise ValueError(f"Manifest {source} needs columns a and b.")
+        for row_number, row in enumerate(reader, 2):
+            if not row["a"] or not row["b"]:
+                raise ValueError(f"{source}, row {row_number}: both a and b are required.")
+            name = (row.get("name") or "").strip() or os.path.splitext(os.path.basename(row["a"]))[0]
+            pairs.append((name, os.path.join(base, row["a"].strip()), os.path.join(base, row["b"].strip())))
+    names = [name for name, _, _ in pairs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Manifest {source} repeats the name {', '.join(duplicates)}.")
+    return sorted(pairs)
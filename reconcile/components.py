@@ -0,0 +1,43 @@
+# Decomposition of a matching problem into independent components. Two
+# deposits are connected when some subset pair contains both of them; pairs in
+# different components never share a deposit, so each can be solved alone.
+
+
+def split_components(matching_subset_pairs):
+    """
+    Group (mask_a, mask_b, sum) pairs into connected components.
+
+    Returns a list of (mask_a, mask_b, pairs) tuples, where the masks cover
+    every deposit in the component, ordered by the component's first List A
+    deposit. Callers should pass irreducible pairs only (see
+    solver.drop_redundant_pairs): unions of smaller pairs would join otherwise
+    independent groups.
+    """
+    # Union-find over pair indices, linked through the deposits they share
+    parent = list(range(len(matching_subset_pairs)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    owner_a = {}  # List A bit -> a pair index containing it
+    owner_b = {}
+    for index, (mask_a, mask_b, _) in enumerate(matching_subset_pairs):
+        for owner, mask in ((owner_a, mask_a), (owner_b, mask_b)):
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                other = owner.setdefault(bit, index)
+                root, other_root = find(index), find(other)
+                if root != other_root:
+                    parent[max(root, other_root)] = min(root, other_root)
+
+    components = {}
+    for index, pair in enumerate(matching_subset_pairs):
+        root = find(index)
+        mask_a, mask_b, pairs = components.get(root, (0, 0, []))
+        pairs.append(pair)
+        components[root] = (mask_a | pair[0], mask_b | pair[1], pairs)
+    return sorted(components.values(), key=lambda component: component[0] & -component[0])
@@ -0,0 +1,78 @@
+import datetime
+
+from .subsets import remap_mask
+
+
+# Posting dates for date-windowed matching. A related set may only contain
+# deposits dated within date_window days of each other, so the deposits are
+# swept in date order and subsets are only formed inside each window.
+
+# Text formats accepted for dates, besides ISO 8601
+DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y", "%d.%m.%Y")
+
+
+def to_date(value):
+    """
+    Convert a date, datetime or text such as '2024-03-31' or '03/31/2024' to
+    a datetime.date. Raises ValueError for anything that is not a date.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    text = str(value).strip()
+    try:
+        return datetime.datetime.fromisoformat(text).date()
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {value!r}")
+
+
+def date_blocks(days_a, days_b, window):
+    """
+    Sweep the deposits in date order and yield one block per posting date.
+
+    days_a and days_b hold each deposit's date as a day number. Each block is
+    (positions_a, positions_b, first_a, first_b): the positions of the
+    deposits dated from that day to window days later, and masks over those
+    positions marking the deposits on the starting day. Every set of deposits
+    spanning at most window days lies in the block of its earliest day, so
+    a set only needs to be formed in the block where it touches first_a or
+    first_b. Blocks without deposits on both sides are skipped.
+    """
+    order_a = sorted(range(len(days_a)), key=days_a.__getitem__)
+    order_b = sorted(range(len(days_b)), key=days_b.__getitem__)
+    start_a = end_a = start_b = end_b = 0
+    for day in sorted(set(days_a) | set(days_b)):
+        # Move both windows to [day, day + window]
+        while start_a < len(order_a) and days_a[order_a[start_a]] < day:
+            start_a += 1
+        while end_a < len(order_a) and days_a[order_a[end_a]] <= day + window:
+            end_a += 1
+        while start_b < len(order_b) and days_b[order_b[start_b]] < day:
+            start_b += 1
+        while end_b < len(order_b) and days_b[order_b[end_b]] <= day + window:
+            end_b += 1
+        if start_a == end_a or start_b == end_b:
+            continue
+
+        positions_a = order_a[start_a:end_a]
+        positions_b = order_b[start_b:end_b]
+        first_a = sum(1 << k for k, i in enumerate(positions_a) if days_a[i] == day)
+        first_b = sum(1 << k for k, j in enumerate(positions_b) if days_b[j] == day)
+        yield positions_a, positions_b, first_a, first_b
+
+
+def iter_block_pairs(matching_subset_pairs, positions_a, positions_b, first_a, first_b):
+    """
+    Keep the pairs found inside a date block that touch its starting day and
+    translate their masks back to the positions the block was taken from.
+    """
+    for mask_a, mask_b, sum_val in matching_subset_pairs:
+        if mask_a & first_a or mask_b & first_b:
+            yield remap_mask(mask_a, positions_a), remap_mask(mask_b, positions_b), sum_val
@@ -0,0 +1,205 @@
+import json
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+# Per-stage profiling for the matching engine. Every reconciliation records
+# the wall time of its stages and counters such as the subsets enumerated and
+# search nodes explored; with memory profiling on, the peak allocation of each
+# stage is traced as well. The figures travel with the result and can be
+# written as JSON or as trace events for chrome://tracing or Perfetto.
+
+# Pipeline stages in the order they run. Pairs are enumerated lazily while
+# they are reduced (or taken by the greedy search), so enumerate time is
+# counted separately inside those stages.
+STAGES = ("prepass", "cache", "prune", "enumerate", "reduce", "search", "assemble")
+
+# Counters in the order they are shown
+COUNTERS = ("subsets", "pairs", "irreducible_pairs", "components", "largest_component", "nodes", "prunes",
+            "cache_hits", "cache_misses")
+
+# Version of the JSON written by Diagnostics.write_json
+DIAGNOSTICS_FORMAT = 1
+
+
+class Diagnostics:
+    """
+    Stage timings and counters of one reconciliation.
+
+    seconds maps each stage to the time spent in it, not counting the
+    stages nested inside it, and peak_bytes to the most memory allocated
+    above what was held when it started (only with memory=True). Memory
+    taken by lazily enumerated pairs counts towards the stage consuming
+    them, and allocations in worker processes are not traced. counts holds
+    the counters:
+
+        subsets             subset sums walked while enumerating pairs
+        pairs               candidate subset pairs with matching totals
+        irreducible_pairs   pairs left after dropping redundant ones
+        components          independent components searched
+        largest_component   deposits in the largest component
+        nodes, prunes       search nodes explored, and of those cut off by
+                            the bound or an already visited state
+        cache_hits, cache_misses
+    """
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.seconds = Counter()
+        self.peak_bytes = {}
+        self.counts = Counter(dict.fromkeys(COUNTERS, 0))
+        self.spans = []  # (stage, start offset, seconds, args) of each stage entered, for trace events
+        self.started = time.perf_counter()
+        self._inner = 0.0  # Seconds spent in stages so far, to tell them apart from their enclosing stage
+        self._memory_stack = []  # [held bytes, peak so far] for each open stage when tracing memory
+        self._tracing = False
+
+    @property
+    def total_seconds(self):
+        return sum(self.seconds.values())
+
+    def start(self):
+        """
+        Start tracing memory allocations if memory profiling is on.
+        """
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    def stop(self):
+        """
+        Stop tracing memory allocations, if start() began tracing them.
+        """
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block as the named stage. A stage entered more than
+        once (e.g. the reachability filter of each date block) accumulates.
+        """
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            if self._memory_stack:
+                # Keep the enclosing stage's peak before resetting it for this one
+                self._memory_stack[-1][1] = max(self._memory_stack[-1][1], tracemalloc.get_traced_memory()[1])
+            held = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            self._memory_stack.append([held, held])
+        inner = self._inner
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] += elapsed - (self._inner - inner)
+            self._inner = inner + elapsed
+            self.spans.append((name, start - self.started, elapsed, None))
+            if tracing:
+                held, peak = self._memory_stack.pop()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak - held)
+                if self._memory_stack:
+                    self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+
+    def timed(self, items, name):
+        """
+        Pass the items of a lazy stream through, counting the time spent
+        producing them as the named stage and not as the stage consuming them.
+        """
+        iterator = iter(items)
+        clock = time.perf_counter
+        first = clock()
+        busy = 0.0
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    busy += clock() - start
+                yield item
+        finally:
+            self.seconds[name] += busy
+            self._inner += busy
+            self.spans.append((name, first - self.started, clock() - first, {"busy_seconds": round(busy, 6)}))
+
+    def count(self, **counts):
+        """
+        Add to the named counters.
+        """
+        self.counts.update(counts)
+
+    def record_max(self, name, value):
+        """
+        Raise the named counter to value if it is lower.
+        """
+        self.counts[name] = max(self.counts[name], value)
+
+    def to_dict(self):
+        """
+        Return the figures as plain JSON-ready data, stages in pipeline order.
+        """
+        names = [name for name in STAGES if name in self.seconds] + sorted(set(self.seconds) - set(STAGES))
+        stages = []
+        for name in names:
+            entry = {"stage": name, "seconds": round(self.seconds[name], 6)}
+            if name in self.peak_bytes:
+                entry["peak_bytes"] = self.peak_bytes[name]
+            stages.append(entry)
+        return {"format": DIAGNOSTICS_FORMAT, "seconds": round(self.total_seconds, 6), "stages": stages,
+                "counts": dict(self.counts)}
+
+    def trace_events(self):
+        """
+        Return the stages as trace events in the Chrome trace event format:
+        one complete event per stage entered, and the counters at the end.
+        A lazily consumed stage spans from its first item to its last, with
+        the time actually spent producing items given in args.
+        """
+        events = []
+        for name, start, seconds, args in self.spans:
+            event = {"name": name, "cat": "reconcile", "ph": "X", "pid": 1, "tid": 1,
+                     "ts": round(start * 1e6, 3), "dur": round(seconds * 1e6, 3)}
+            if args:
+                event["args"] = args
+            events.append(event)
+        end = max((start + seconds for _, start, seconds, _ in self.spans), default=0.0)
+        events.append({"name": "counts", "cat": "reconcile", "ph": "C", "pid": 1, "tid": 1,
+                       "ts": round(end * 1e6, 3), "args": dict(self.counts)})
+        return events
+
+    def write_json(self, path):
+        """
+        Write to_dict() to a JSON file.
+        """
+        with open(path, "w", encoding="utf-8") as json_file:
+            json.dump(self.to_dict(), json_file, indent=2)
+
+    def write_trace(self, path):
+        """
+        Write the trace events to a JSON file that chrome://tracing and
+        Perfetto open.
+        """
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, trace_file)
+
+    def summary_lines(self):
+        """
+        Return the figures as short lines of text for display.
+        """
+        lines = []
+        for entry in self.to_dict()["stages"]:
+            line = f"{entry['stage']:<10} {entry['seconds'] * 1000:>10.1f} ms"
+            if "peak_bytes" in entry:
+                line += f"  {entry['peak_bytes'] / 1e6:>8.1f} MB"
+            lines.append(line)
+        lines.append(f"{'total':<10} {self.total_seconds * 1000:>10.1f} ms")
+        lines.append("")
+        lines.extend(f"{name.replace('_', ' '):<18} {value:,}" for name, value in self.counts.items())
+        return lines
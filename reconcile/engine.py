@@ -0,0 +1,639 @@
+import heapq
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from operator import itemgetter
+
+from .amounts import from_cents, to_cents
+from .budget import SearchBudget, iter_within_budget
+from .cache import canonical_order, content_key, from_canonical, to_canonical
+from .components import split_components
+from .dates import date_blocks, iter_block_pairs, to_date
+from .diagnostics import Diagnostics
+from .incremental import MAX_REMATCH_SHARE, carry_over_sets
+from .parallel import solve_components
+from .prepass import match_identical_amounts
+from .reachable import prune_unreachable
+from .solver import drop_redundant_pairs, drop_redundant_pairs_within, find_greedy_matching
+from .subsets import (duplicate_runs, get_all_subsets, iter_bits, iter_matching_subset_pairs,
+                      iter_matching_subset_pairs_mitm, mask_to_deposit_ids, remap_mask, restrict_mask,
+                      run_masks)
+from .tolerance import Tolerance
+
+
+# Headless matching engine for DepositsMatcher. Nothing in this package
+# imports tkinter or PIL, so it can run on machines without a display; openpyxl
+# is only needed by reconcile.files, for .xlsx files.
+
+
+@dataclass
+class RelatedSet:
+    """
+    A group of List A deposits matched against a group of List B deposits
+    with the same total, or totals within the tolerance.
+    """
+    related_set: str  # e.g., 'R1'
+    a_deposits: list  # e.g., ['A1', 'A3']
+    b_deposits: list  # e.g., ['B2']
+    cents: int  # Matched List A total in integer cents
+    difference_cents: int = 0  # List A total minus List B total; only non-zero with a tolerance
+
+    @property
+    def total(self):
+        return from_cents(self.cents)
+
+    @property
+    def difference(self):
+        return from_cents(self.difference_cents)
+
+
+@dataclass
+class ReconcileResult:
+    """
+    Outcome of a reconciliation: per-deposit tables and the chosen related sets.
+    """
+    table_a: dict  # e.g., {'A1': {'value': 3.0, 'cents': 300, 'date': None, 'reference': None, 'status': 'Matched', 'related_set': 'R1'}}
+    table_b: dict  # e.g., {'B1': {'value': 6.0, 'cents': 600, 'date': None, 'reference': None, 'status': 'Matched', 'related_set': 'R1'}}
+    related_sets: list = field(default_factory=list)
+    optimal: bool = True  # False unless the matched total is proven to be the maximum
+    gap_cents: int = 0  # How much more could at most be matched than was found
+    stop_reason: str = None  # 'cancelled', 'time' or 'nodes' when the budget cut the search short
+    cache_hits: int = 0  # Lookups answered by the result cache: the whole run or independent components
+    cache_misses: int = 0
+    reused_sets: int = 0  # Related sets carried over unchanged from the previous result of an incremental solve
+    diagnostics: Diagnostics = None  # Stage timings and counters of the run that produced this result
+
+    @property
+    def matched_total(self):
+        return from_cents(total_cents(self.table_a, 'Matched'))
+
+    @property
+    def unmatched_total_a(self):
+        return from_cents(total_cents(self.table_a, 'Unmatched'))
+
+    @property
+    def unmatched_total_b(self):
+        return from_cents(total_cents(self.table_b, 'Unmatched'))
+
+    @property
+    def gap(self):
+        return from_cents(self.gap_cents)
+
+    def set_index_by_deposit(self):
+        """
+        Return (by_a, by_b), dicts from each matched deposit ID to the index
+        of its related set in related_sets, so a deposit's set and the other
+        members are found without searching.
+        """
+        by_a, by_b = {}, {}
+        for index, related_set in enumerate(self.related_sets):
+            by_a.update(dict.fromkeys(related_set.a_deposits, index))
+            by_b.update(dict.fromkeys(related_set.b_deposits, index))
+        return by_a, by_b
+
+
+# Available strategies for choosing non-overlapping subset pairs
+SOLVERS = ("exact", "greedy")
+
+# Available strategies for enumerating subset sums
+ENUMERATIONS = ("meet", "full")
+
+# How identical amounts are paired before the search
+ONE_TO_ONE_MODES = ("fixed", "revisit", "off")
+
+
+class Reconciler:
+    """
+    Match deposits in List A against deposits in List B.
+
+    solver selects how subset pairs are combined: "exact" runs a
+    branch-and-bound search for the true maximum matched total, "greedy"
+    takes the largest non-overlapping pairs first, which is faster but may
+    group deposits more coarsely or miss the maximum.
+
+    enumeration selects how matching subset pairs are found: "meet" splits
+    both lists in half and joins the half-sum differences (work and memory
+    grow as 2^(n/2) for n deposits in the two lists together, plus the
+    pairs found), "full" builds every subset of both lists up front.
+
+    one_to_one controls the pre-pass that pairs identical amounts: "fixed"
+    keeps those pairs and only searches the remaining deposits, "revisit"
+    uses them as a starting point the search may improve on (identical
+    amounts are occasionally worth more inside a larger related set), and
+    "off" skips the pre-pass.
+
+    workers sets how many processes the exact search may use; None uses every
+    CPU. The result is the same for any number of workers.
+
+    tolerance (an amount) and tolerance_percent (of the List A total) let
+    the two totals of a related set differ by fees or rounding; the larger
+    allowance applies. Each related set then reports its difference, and the
+    search maximizes the smaller of each set's two totals.
+
+    dates_a/dates_b and references_a/references_b are optional per-deposit
+    columns (None or blank for a missing entry) carried into the result
+    tables. Dates may be datetime.date objects or text such as '2024-03-31'.
+    With date_window set (in days), a related set may only contain deposits
+    dated at most that many days apart; subsets are then only formed inside
+    each window of a date sweep, which splits large month-end lists into
+    many small problems. Every deposit needs a date in that case.
+
+    max_group_size_a and max_group_size_b cap how many deposits from each
+    list one related set may contain (None for no limit). A bank deposit
+    rarely bundles more than a handful of items. With "meet", the limited
+    subsets of one list are built and the other list is searched for their
+    totals from subsets of about k / 2 deposits, so e.g. with
+    max_group_size_a=5, max_group_size_b=1 a hundred deposits per list are
+    enumerated in well under a second.
+
+    Before enumerating, deposits that cannot be part of any positive total
+    reachable in both lists (within the tolerance) are left out, using
+    bitsets of the reachable subset totals; they stay unmatched.
+
+    Repeated amounts are grouped before enumerating: a run of n identical
+    deposits contributes n + 1 choices (how many copies to use) rather than
+    2^n subsets with the same sums, and concrete deposits are only assigned
+    to the related sets finally chosen. Lists that are largely duplicates,
+    such as dozens of identical subscription payments, solve far faster.
+
+    time_limit (seconds) and node_limit (search nodes) cap the run. When
+    either runs out, or solve() is cancelled, the best matching found so far
+    is returned with optimal=False and gap_cents giving the most it could be
+    short of the maximum. The gap is measured against the deposits that were
+    searched, so with one_to_one="fixed" the locked pairs are taken as given.
+
+    cache is an optional ResultCache. A run whose amounts (and days, with a
+    date window) and settings were solved before is answered from it, in
+    any deposit order; otherwise each independent component of the exact
+    search is looked up on its own. Only complete results are stored, and
+    result.cache_hits and cache_misses count the lookups.
+
+    previous is an optional ReconcileResult for an earlier version of these
+    lists, e.g. before an amount was corrected or late deposits were
+    appended. Its related sets whose deposits are all unchanged, and that
+    are still valid under the current settings, are kept as they were, like
+    the locked pairs of the one-to-one pre-pass; only the changed and new
+    deposits, the deposits of the related sets they broke up and the
+    unmatched deposits are searched again. Kept sets are not reconsidered:
+    the upper bound is their value plus the bound of the search over the
+    rest, so an optimal result is the best matching that keeps them, and a
+    better one that breaks one of them up can be missed. When the edits
+    leave less than half of the deposits in related sets that can be kept,
+    the whole lists are solved. result.reused_sets counts the related sets
+    carried over.
+
+    result.diagnostics holds the wall time of each stage of the run and
+    counters such as the subsets enumerated, candidate pairs, search nodes
+    and prunes and the size of the largest component. With profile_memory,
+    the peak memory of each stage is traced too, which slows the run down.
+
+    Amounts may be numbers or numeric text and are converted to integer
+    cents; a ValueError is raised for anything that is not a number.
+
+    Usage:
+        result = Reconciler([3, 4, 5], [7, 5], time_limit=30).solve()
+    """
+    def __init__(self, deposits_a, deposits_b, solver="exact", enumeration="meet", one_to_one="fixed",
+                 workers=1, time_limit=None, node_limit=None, tolerance=0, tolerance_percent=0,
+                 dates_a=None, dates_b=None, references_a=None, references_b=None, date_window=None,
+                 max_group_size_a=None, max_group_size_b=None, cache=None, previous=None, profile_memory=False):
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver {solver!r}; expected one of {', '.join(SOLVERS)}.")
+        if enumeration not in ENUMERATIONS:
+            raise ValueError(f"Unknown enumeration {enumeration!r}; expected one of {', '.join(ENUMERATIONS)}.")
+        if one_to_one not in ONE_TO_ONE_MODES:
+            raise ValueError(f"Unknown one_to_one mode {one_to_one!r}; expected one of {', '.join(ONE_TO_ONE_MODES)}.")
+        if time_limit is not None and not time_limit > 0:
+            raise ValueError(f"time_limit must be a positive number of seconds, got {time_limit!r}.")
+        if node_limit is not None and not node_limit > 0:
+            raise ValueError(f"node_limit must be a positive number of nodes, got {node_limit!r}.")
+        for name, size in (("max_group_size_a", max_group_size_a), ("max_group_size_b", max_group_size_b)):
+            if size is not None and not (isinstance(size, int) and size > 0):
+                raise ValueError(f"{name} must be a positive number of deposits, got {size!r}.")
+        self.deposits_a = [to_cents(value) for value in deposits_a]
+        self.deposits_b = [to_cents(value) for value in deposits_b]
+        self.solver = solver
+        self.enumeration = enumeration
+        self.one_to_one = one_to_one
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.tolerance = Tolerance.from_settings(to_cents(tolerance), tolerance_percent)
+        self.max_group_size_a = max_group_size_a
+        self.max_group_size_b = max_group_size_b
+        self.cache = cache
+        self.previous = previous
+        self.profile_memory = profile_memory
+
+        self.dates_a = optional_column(dates_a, len(self.deposits_a), to_date, "dates_a")
+        self.dates_b = optional_column(dates_b, len(self.deposits_b), to_date, "dates_b")
+        self.references_a = optional_column(references_a, len(self.deposits_a), clean_text, "references_a")
+        self.references_b = optional_column(references_b, len(self.deposits_b), clean_text, "references_b")
+        self.date_window = None
+        if date_window is not None:
+            if not date_window >= 0:
+                raise ValueError(f"date_window must be a number of days of at least 0, got {date_window!r}.")
+            if None in self.dates_a or None in self.dates_b:
+                raise ValueError("date_window needs a date for every deposit.")
+            self.date_window = int(date_window)
+
+    def solve(self, progress=None, cancel_token=None):
+        """
+        Run the matching pipeline and return a ReconcileResult.
+
+        progress is an optional callable receiving a Progress snapshot about
+        ten times a second; cancel_token is an optional CancelToken that stops
+        the run early, like running out of time.
+        """
+        diagnostics = Diagnostics(self.profile_memory)
+        budget = SearchBudget(self.time_limit, self.node_limit, cancel_token, progress, diagnostics)
+        diagnostics.start()
+        try:
+            table_a = build_table(self.deposits_a, 'A', self.dates_a, self.references_a)
+            table_b = build_table(self.deposits_b, 'B', self.dates_b, self.references_b)
+
+            cache_stats = Counter()
+            with diagnostics.stage("prepass"):
+                kept = self._carried_over_sets() if self.previous is not None else []
+            with diagnostics.stage("cache"):
+                cache_key = self._cache_key() if self.cache is not None and not kept else None
+                cached = self.cache.get(cache_key) if cache_key else None
+            if kept:
+                # Keep the related sets no edit touched and search only the rest; the
+                # kept sets are taken as given, so the gap is that of the rest
+                optimal_matching, gap_cents = self._solve_all(budget, cache_stats, kept)
+            elif cached is not None:
+                cache_stats['hits'] += 1
+                optimal_matching = from_canonical(cached['matching'], *self._canonical_orders())
+                gap_cents = cached['gap_cents']
+            else:
+                if cache_key:
+                    cache_stats['misses'] += 1
+                optimal_matching, gap_cents = self._solve_all(budget, cache_stats)
+                if cache_key and budget.stop_reason is None and budget.pairs_stop_reason is None:
+                    # A run cut short depends on its budget, so only complete ones are kept
+                    with diagnostics.stage("cache"):
+                        self.cache.put(cache_key, {'matching': to_canonical(optimal_matching,
+                                                                            *self._canonical_orders()),
+                                                   'gap_cents': gap_cents})
+
+            with diagnostics.stage("assemble"):
+                # Number related sets in order of their first List A deposit
+                optimal_matching.sort(key=lambda pair: pair[0] & -pair[0])
+
+                # Deposit ID strings are only produced here, for presentation
+                result = ReconcileResult(table_a, table_b, optimal=gap_cents == 0, gap_cents=gap_cents,
+                                         stop_reason=budget.stop_reason or budget.pairs_stop_reason,
+                                         cache_hits=cache_stats['hits'], cache_misses=cache_stats['misses'],
+                                         reused_sets=len(kept), diagnostics=diagnostics)
+                for related_set_id, (mask_a, mask_b, _) in enumerate(optimal_matching, 1):
+                    cents_a = sum(self.deposits_a[i] for i in iter_bits(mask_a))
+                    cents_b = sum(self.deposits_b[j] for j in iter_bits(mask_b))
+                    result.related_sets.append(assign_related_set(
+                        result, f"R{related_set_id}", mask_to_deposit_ids(mask_a, 'A'),
+                        mask_to_deposit_ids(mask_b, 'B'), cents_a, cents_a - cents_b))
+        finally:
+            diagnostics.stop()
+        diagnostics.count(subsets=budget.subsets, pairs=budget.pairs, nodes=budget.nodes, prunes=budget.prunes,
+                          cache_hits=cache_stats['hits'], cache_misses=cache_stats['misses'])
+
+        matched_cents = total_cents(table_a, 'Matched')
+        budget.report('done', 1.0, matched_cents, matched_cents + gap_cents, force=True)
+        return result
+
+    def _solve_all(self, budget, cache_stats, kept=()):
+        """
+        Match both lists and return (pairs, gap_cents). kept pairs are taken
+        as given and only the other deposits are matched.
+        """
+        used_a = sum(mask_a for mask_a, _, _ in kept)
+        used_b = sum(mask_b for _, mask_b, _ in kept)
+        positions_a = [i for i in range(len(self.deposits_a)) if not used_a >> i & 1]
+        positions_b = [j for j in range(len(self.deposits_b)) if not used_b >> j & 1]
+        optimal_matching = list(kept)
+        incumbent = []
+
+        # Pair identical amounts first; in a typical feed this leaves only a handful of deposits
+        if self.one_to_one != "off":
+            days_a, days_b = self._day_numbers()
+            if days_a is not None:
+                days_a = [days_a[i] for i in positions_a]
+                days_b = [days_b[j] for j in positions_b]
+            with budget.diagnostics.stage("prepass"):
+                identical = [(1 << positions_a[i], 1 << positions_b[j], cents)
+                             for i, j, cents in match_identical_amounts([self.deposits_a[i] for i in positions_a],
+                                                                        [self.deposits_b[j] for j in positions_b],
+                                                                        days_a, days_b, self.date_window)]
+            if self.one_to_one == "fixed":
+                optimal_matching.extend(identical)
+                used_a = sum(mask_a for mask_a, _, _ in identical)
+                used_b = sum(mask_b for _, mask_b, _ in identical)
+                positions_a = [i for i in positions_a if not used_a >> i & 1]
+                positions_b = [j for j in positions_b if not used_b >> j & 1]
+            else:
+                incumbent = identical
+
+        budget.base_cents = sum(pair[2] for pair in optimal_matching)
+        matching, upper_bound = self._solve_positions(positions_a, positions_b, incumbent, budget, cache_stats)
+        optimal_matching.extend(matching)
+        return optimal_matching, upper_bound - sum(pair[2] for pair in matching)
+
+    def _solve_positions(self, positions_a, positions_b, incumbent=(), budget=None, cache_stats=None):
+        """
+        Match the deposits at the given positions of each list and return
+        (pairs, upper_bound): (mask_a, mask_b, cents) pairs with masks over
+        the original lists, and the most any matching of these deposits can
+        be worth. incumbent pairs must already use original positions.
+        cache_stats counts the component lookups in self.cache.
+        """
+        diagnostics = budget.diagnostics if budget is not None else Diagnostics()
+
+        # Leave out deposits that cannot be part of any total reachable on both sides
+        with diagnostics.stage("prune"):
+            kept_a, kept_b = prune_unreachable([self.deposits_a[i] for i in positions_a],
+                                               [self.deposits_b[j] for j in positions_b], self.tolerance, budget)
+        positions_a = [positions_a[k] for k in kept_a]
+        positions_b = [positions_b[k] for k in kept_b]
+        deposits_a = [self.deposits_a[i] for i in positions_a]
+        deposits_b = [self.deposits_b[j] for j in positions_b]
+        if not deposits_a or not deposits_b:
+            return list(incumbent), sum(pair[2] for pair in incumbent)
+
+        # Stream matching subset pairs (same sum) bucket by bucket. No pair can
+        # be worth more than the smaller of the two lists' positive totals.
+        descending = self.solver == "greedy"
+        max_sum = min(sum(value for value in deposits_a if value > 0),
+                      sum(value for value in deposits_b if value > 0))
+
+        # Deposits with the same amount (and day, when dates matter) are interchangeable
+        days_a, days_b = self._day_numbers()
+        if days_a is not None:
+            days_a = [days_a[i] for i in positions_a]
+            days_b = [days_b[j] for j in positions_b]
+        copies_a = run_masks(duplicate_runs(deposits_a, days_a))
+        copies_b = run_masks(duplicate_runs(deposits_b, days_b))
+
+        if self.date_window is None:
+            with diagnostics.stage("enumerate"):
+                pair_stream = self._pair_stream(deposits_a, deposits_b, descending, max_sum, budget=budget)
+        else:
+            # Form subsets only inside each date window and merge the block streams by sum
+            block_streams = []
+            for block_a, block_b, first_a, first_b in date_blocks(days_a, days_b, self.date_window):
+                # A block is far smaller than the whole list, so the pre-filter drops more here
+                with diagnostics.stage("prune"):
+                    kept_a, kept_b = prune_unreachable([deposits_a[i] for i in block_a],
+                                                       [deposits_b[j] for j in block_b], self.tolerance, budget)
+                first_a = restrict_mask(first_a, kept_a)
+                first_b = restrict_mask(first_b, kept_b)
+                if not first_a and not first_b:
+                    continue  # Nothing left on the block's first day
+                block_a = [block_a[k] for k in kept_a]
+                block_b = [block_b[k] for k in kept_b]
+                block_deposits_a = [deposits_a[i] for i in block_a]
+                block_deposits_b = [deposits_b[j] for j in block_b]
+                block_max_sum = min(sum(value for value in block_deposits_a if value > 0),
+                                    sum(value for value in block_deposits_b if value > 0))
+                with diagnostics.stage("enumerate"):
+                    block_streams.append(iter_block_pairs(
+                        self._pair_stream(block_deposits_a, block_deposits_b, descending, block_max_sum,
+                                          [days_a[i] for i in block_a], [days_b[j] for j in block_b], budget),
+                        block_a, block_b, first_a, first_b))
+            pair_stream = heapq.merge(*block_streams, key=itemgetter(2), reverse=descending)
+        if budget is not None:
+            pair_stream = iter_within_budget(pair_stream, budget, max_sum, descending)
+        # Pairs are produced as they are consumed; time spent producing them counts as enumerating
+        pair_stream = diagnostics.timed(pair_stream, "enumerate")
+
+        if self.solver == "greedy":
+            # The greedy pass proves nothing, so only max_sum bounds the result
+            with diagnostics.stage("search"):
+                optimal_matching = remap_pairs(find_greedy_matching(pair_stream, deposits_a, deposits_b,
+                                                                    copies_a, copies_b),
+                                               positions_a, positions_b)
+                pair_stream.close()
+            if sum(pair[2] for pair in incumbent) > sum(pair[2] for pair in optimal_matching):
+                return list(incumbent), max_sum
+            return optimal_matching, max_sum
+
+        # Find the best combination of subset pairs. The exact search runs on
+        # each independent component separately, so its cost depends on the
+        # largest component rather than on the whole list.
+        with diagnostics.stage("reduce"):
+            if self.tolerance is None:
+                irreducible_pairs = drop_redundant_pairs(pair_stream, budget)
+            else:
+                irreducible_pairs = drop_redundant_pairs_within(pair_stream, self.tolerance, deposits_a, deposits_b,
+                                                                budget)
+            pair_stream.close()
+            matching_subset_pairs = remap_pairs(irreducible_pairs, positions_a, positions_b)
+            copies_a = [remap_mask(run, positions_a) for run in copies_a]
+            copies_b = [remap_mask(run, positions_b) for run in copies_b]
+            components = split_components(matching_subset_pairs)
+            incumbents = [[pair for pair in incumbent if pair[0] & with_copies(mask_a, copies_a)]
+                          for mask_a, _, _ in components]
+        diagnostics.count(irreducible_pairs=len(irreducible_pairs), components=len(components))
+        diagnostics.record_max("largest_component", max(
+            (bin(with_copies(mask_a, copies_a)).count("1") + bin(with_copies(mask_b, copies_b)).count("1")
+             for mask_a, mask_b, _ in components), default=0))
+
+        # Components solved before are taken from the cache; the rest are searched
+        matchings = [None] * len(components)
+        upper_bounds = [None] * len(components)
+        keys = [None] * len(components)
+        if self.cache is not None:
+            with diagnostics.stage("cache"):
+                for index, (mask_a, mask_b, pairs) in enumerate(components):
+                    keys[index] = self._component_key(mask_a, mask_b, pairs, incumbents[index], copies_a, copies_b)
+                    cached = self.cache.get(keys[index][0])
+                    cache_stats['hits' if cached is not None else 'misses'] += 1
+                    if cached is not None:
+                        matchings[index] = from_canonical(cached['matching'], *keys[index][1:])
+                        upper_bounds[index] = cached['bound']
+        missing = [index for index, matching in enumerate(matchings) if matching is None]
+        if missing:
+            with diagnostics.stage("search"):
+                solved, bounds = solve_components([components[index][2] for index in missing], self.deposits_a,
+                                                  self.deposits_b, [incumbents[index] for index in missing],
+                                                  self.workers, budget, copies_a, copies_b)
+            for index, matching, bound in zip(missing, solved, bounds):
+                matchings[index], upper_bounds[index] = matching, bound
+                if keys[index] and bound == sum(pair[2] for pair in matching):
+                    # Proven optimal for exactly these pairs, whatever the budget
+                    with diagnostics.stage("cache"):
+                        self.cache.put(keys[index][0], {'matching': to_canonical(matching, *keys[index][1:]),
+                                                        'bound': bound})
+        optimal_matching = [pair for matching in matchings for pair in matching]
+        # Pairs cut off by an interrupted enumeration are unknown, so only max_sum bounds the result then
+        return optimal_matching, max_sum if budget is not None and budget.truncated else sum(upper_bounds)
+
+
+    def _pair_stream(self, deposits_a, deposits_b, descending, max_sum, days_a=None, days_b=None, budget=None):
+        """
+        Stream the matching subset pairs of two sub-lists with the configured
+        enumeration, tolerance and group sizes. The subsets enumerated are
+        counted in budget, whose limits also end the walk early.
+
+        Identical amounts (on the same day, when days are given) are grouped
+        in runs and enumerated by multiplicity, so each pair takes the first
+        copies of a run; the search treats those copies as interchangeable.
+        """
+        runs_a = duplicate_runs(deposits_a, days_a)
+        runs_b = duplicate_runs(deposits_b, days_b)
+        if len(runs_a) == len(deposits_a):
+            runs_a = None  # No duplicates to group
+        if len(runs_b) == len(deposits_b):
+            runs_b = None
+
+        if self.enumeration == "meet":
+            return iter_matching_subset_pairs_mitm(deposits_a, deposits_b, descending, max_sum, self.tolerance,
+                                                   self.max_group_size_a, self.max_group_size_b, runs_a, runs_b,
+                                                   budget)
+        subsets_a = get_all_subsets(deposits_a, self.max_group_size_a, runs_a, budget)
+        subsets_b = get_all_subsets(deposits_b, self.max_group_size_b, runs_b, budget)
+        if budget is not None:
+            budget.subsets += len(subsets_a) + len(subsets_b)
+        return iter_matching_subset_pairs(subsets_a, subsets_b, descending, max_sum, self.tolerance)
+
+    def _carried_over_sets(self):
+        """
+        Return the related sets of self.previous that survive the edits as
+        (mask_a, mask_b, cents) pairs over the current lists, leaving out any
+        that no longer satisfy the tolerance, date window or group sizes.
+        Returns no pairs when too few deposits would be carried over.
+        """
+        days_a, days_b = self._day_numbers()
+        keys_a = self.deposits_a if days_a is None else list(zip(self.deposits_a, days_a))
+        keys_b = self.deposits_b if days_b is None else list(zip(self.deposits_b, days_b))
+        kept = []
+        for mask_a, mask_b in carry_over_sets(self.previous, keys_a, keys_b, days_a is not None):
+            positions_a, positions_b = list(iter_bits(mask_a)), list(iter_bits(mask_b))
+            if not positions_a or not positions_b:
+                continue
+            if (self.max_group_size_a is not None and len(positions_a) > self.max_group_size_a
+                    or self.max_group_size_b is not None and len(positions_b) > self.max_group_size_b):
+                continue
+            if days_a is not None:
+                days = [days_a[i] for i in positions_a] + [days_b[j] for j in positions_b]
+                if max(days) - min(days) > self.date_window:
+                    continue
+            sum_a = sum(self.deposits_a[i] for i in positions_a)
+            sum_b = sum(self.deposits_b[j] for j in positions_b)
+            if sum_a != sum_b and (self.tolerance is None or not self.tolerance.within(sum_a, sum_b)):
+                continue
+            if min(sum_a, sum_b) > 0:
+                kept.append((mask_a, mask_b, min(sum_a, sum_b)))
+
+        deposits = len(self.deposits_a) + len(self.deposits_b)
+        carried = sum(bin(mask_a).count("1") + bin(mask_b).count("1") for mask_a, mask_b, _ in kept)
+        if deposits - carried > MAX_REMATCH_SHARE * deposits:
+            return []  # Most deposits need searching anyway
+        return kept
+
+    def _cache_key(self):
+        """
+        Hash the amounts (and days, when dates matter) in canonical order
+        with every setting that changes the answer.
+        """
+        order_a, order_b = self._canonical_orders()
+        days_a, days_b = self._day_numbers()
+        tolerance = (self.tolerance.cents, self.tolerance.ppm) if self.tolerance is not None else None
+        return content_key("run", [self.deposits_a[i] for i in order_a], [self.deposits_b[j] for j in order_b],
+                           [days_a[i] for i in order_a] if days_a is not None else None,
+                           [days_b[j] for j in order_b] if days_b is not None else None,
+                           self.solver, self.enumeration, self.one_to_one, tolerance, self.date_window,
+                           self.max_group_size_a, self.max_group_size_b)
+
+    def _canonical_orders(self):
+        days_a, days_b = self._day_numbers()
+        return canonical_order(self.deposits_a, days_a), canonical_order(self.deposits_b, days_b)
+
+    def _component_key(self, mask_a, mask_b, pairs, incumbent, copies_a, copies_b):
+        """
+        Return (key, order_a, order_b) for one component of the exact search:
+        the key hashes its amounts, pairs, incumbent and interchangeable
+        copies over the component's deposits in canonical order.
+        """
+        mask_a = with_copies(mask_a, copies_a)
+        mask_b = with_copies(mask_b, copies_b)
+        order_a = sorted(iter_bits(mask_a), key=self.deposits_a.__getitem__)
+        order_b = sorted(iter_bits(mask_b), key=self.deposits_b.__getitem__)
+        runs = ([(run_a, 0, 0) for run_a in copies_a if run_a & mask_a]
+                + [(0, run_b, 0) for run_b in copies_b if run_b & mask_b])
+        key = content_key("component", [self.deposits_a[i] for i in order_a], [self.deposits_b[j] for j in order_b],
+                          to_canonical(pairs, order_a, order_b), to_canonical(incumbent, order_a, order_b),
+                          to_canonical(runs, order_a, order_b))
+        return key, order_a, order_b
+
+    def _day_numbers(self):
+        """
+        Return the deposit dates of both lists as day numbers, or (None, None)
+        when matching is not limited by date.
+        """
+        if self.date_window is None:
+            return None, None
+        return [day.toordinal() for day in self.dates_a], [day.toordinal() for day in self.dates_b]
+
+
+def remap_pairs(matching_subset_pairs, positions_a, positions_b):
+    """
+    Translate pairs found on sub-lists back to positions in the original lists.
+    """
+    return [(remap_mask(mask_a, positions_a), remap_mask(mask_b, positions_b), cents)
+            for mask_a, mask_b, cents in matching_subset_pairs]
+
+
+def with_copies(mask, copies):
+    """
+    Extend mask with every run of interchangeable deposits it touches.
+    """
+    for run in copies:
+        if run & mask:
+            mask |= run
+    return mask
+
+
+def build_table(deposits, prefix, dates, references):
+    """
+    Build the internal deposit table for one list, with every deposit unmatched.
+    """
+    return {f"{prefix}{i+1}": {'value': from_cents(cents), 'cents': cents, 'date': date, 'reference': reference,
+                               'status': 'Unmatched', 'related_set': None}
+            for i, (cents, date, reference) in enumerate(zip(deposits, dates, references))}
+
+
+def optional_column(values, count, convert, name):
+    """
+    Convert an optional per-deposit column, using None for missing or blank
+    entries (and for the whole column when values is None).
+    """
+    if values is None:
+        return [None] * count
+    values = list(values)
+    if len(values) != count:
+        raise ValueError(f"{name} has {len(values)} entries for {count} deposits.")
+    return [convert(value) if value is not None and str(value).strip() else None for value in values]
+
+
+def total_cents(table, status):
+    """
+    Sum the amounts in cents of the deposits in a table with the given status.
+    """
+    return sum(row['cents'] for row in table.values() if row['status'] == status)
+
+
+def assign_related_set(result, name, a_deposits, b_deposits, cents, difference_cents=0):
+    """
+    Mark the given deposits as matched under a related set and return it.
+    """
+    for deposit_id in a_deposits:
+        result.table_a[deposit_id]['status'] = 'Matched'
+        result.table_a[deposit_id]['related_set'] = name
+    for deposit_id in b_deposits:
+        result.table_b[deposit_id]['status'] = 'Matched'
+        result.table_b[deposit_id]['related_set'] = name
+    return RelatedSet(name, list(a_deposits), list(b_deposits), cents, difference_cents)
+
+
+def clean_text(value):
+    return str(value).strip()
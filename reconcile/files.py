@@ -0,0 +1,344 @@
+import csv
+import os
+from array import array
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+except ImportError:  # openpyxl is only needed for .xlsx files
+    openpyxl = None
+
+from .amounts import CENTS_PER_UNIT, format_cents, from_cents, to_cents
+from .dates import to_date
+from .engine import ReconcileResult, RelatedSet
+
+
+# Deposit lists read from and results written to CSV and Excel files, for the
+# command line, batch runs and the GUI's Import and Export actions. Rows are
+# streamed both ways (CSV with the csv module, .xlsx in openpyxl's read-only
+# and write-only modes), so large bank exports load into an array of cents
+# and results are written without holding a whole sheet in memory. CSV needs
+# nothing beyond the standard library; .xlsx files need openpyxl.
+
+# Header names recognised for each column, in lower case
+AMOUNT_HEADERS = ("amount", "deposit", "value")
+DATE_HEADERS = ("date", "posting date", "posted")
+REFERENCE_HEADERS = ("reference", "ref", "description", "memo")
+
+# Columns of the per-deposit result table
+RESULT_HEADERS = ("List", "Deposit", "Amount", "Date", "Reference", "Status", "Related Set", "Set Total")
+
+
+@dataclass
+class DepositList:
+    """
+    Deposits read from a file. Amounts are kept as integer cents in a
+    compact array; dates and references are None when the file has no such
+    column, and hold None for a row without one.
+    """
+    cents: array = field(default_factory=lambda: array('q'))
+    dates: list = None
+    references: list = None
+
+    def __len__(self):
+        return len(self.cents)
+
+    @property
+    def amounts(self):
+        """
+        The amounts as exact Decimals, ready to pass to a Reconciler.
+        """
+        return [Decimal(cents) / CENTS_PER_UNIT for cents in self.cents]
+
+
+def read_deposits(path, amount_column=None, date_column=None, reference_column=None, header=None, guess_missing=True):
+    """
+    Stream a deposit list from a .csv or .xlsx file (the first worksheet).
+
+    Columns are given by 0-based index or by header name. Each one not
+    given is looked for in a header row naming the amount, date and
+    reference columns, e.g. 'Amount,Date,Reference'; without one the
+    columns are taken to be amount, date and reference in that order. With
+    guess_missing=False the columns not given are not read instead. header
+    says whether the first row is a header; by default it is when none of
+    its cells is a number. Rows without an amount are skipped. Raises
+    ValueError naming the row for a bad amount or date.
+    """
+    deposits = DepositList()
+    rows = iter_rows(path)
+    first = next(rows, None)
+    if first is None:
+        return deposits
+    if header is None:
+        header = is_header(first)
+    names = [clean_name(value) for value in first] if header else []
+    columns = [column_index(column, names, path) for column in (amount_column, date_column, reference_column)]
+    if guess_missing:
+        columns = default_columns(names, path, columns)
+    elif columns[0] is None:
+        raise ValueError(f"No amount column chosen for {path}.")
+    amount_column, date_column, reference_column = columns
+    if not header:
+        rows = _chain(first, rows)
+    if date_column is not None:
+        deposits.dates = []
+    if reference_column is not None:
+        deposits.references = []
+
+    append_cents = deposits.cents.append
+    for row_number, row in enumerate(rows, 2 if header else 1):
+        amount = cell(row, amount_column)
+        if amount is None:
+            continue
+        try:
+            append_cents(to_cents(amount))
+            if date_column is not None:
+                date = cell(row, date_column)
+                deposits.dates.append(to_date(date) if date is not None else None)
+        except ValueError as e:
+            raise ValueError(f"{path}, row {row_number}: {e}") from None
+        if reference_column is not None:
+            reference = cell(row, reference_column)
+            deposits.references.append(str(reference).strip() if reference is not None else None)
+    return deposits
+
+
+def preview_columns(path):
+    """
+    Return (names, header) for a file: a label for each column of its first
+    row, the header names when that row is a header and 'Column 1',
+    'Column 2', ... otherwise.
+    """
+    first = next(iter_rows(path), None) or ()
+    if is_header(first):
+        return [str(value).strip() if value is not None else f"Column {k + 1}" for k, value in enumerate(first)], True
+    return [f"Column {k + 1}" for k in range(len(first))], False
+
+
+def iter_rows(path, sheet=None):
+    """
+    Yield the rows of a .csv or .xlsx file as sequences of cell values, from
+    the named worksheet or the first one.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as csv_file:
+            yield from csv.reader(csv_file)
+    elif extension in (".xlsx", ".xlsm"):
+        if openpyxl is None:
+            raise ValueError(f"Reading {path} needs openpyxl (pip install openpyxl).")
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook.worksheets[0] if sheet is None else workbook[sheet]
+            yield from worksheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported file type {extension!r} for {path}; expected .csv or .xlsx.")
+
+
+def is_header(row):
+    """
+    Return whether a first row is a header: it has text and no numbers.
+    """
+    values = [value for value in row if value is not None and str(value).strip()]
+    if not values:
+        return False
+    for value in values:
+        try:
+            to_cents(value)
+        except ValueError:
+            continue
+        return False
+    return True
+
+
+def default_columns(names, path, columns=(None, None, None)):
+    """
+    Return the (amount, date, reference) column indices, keeping those given
+    in columns and filling in each other one from the header names, or from
+    the positions (0, 1, 2) when there is no header. A default that is
+    already taken by a given column is left out.
+    """
+    defaults = guess_columns(names) if names else (0, 1, 2)
+    columns = tuple(column if column is not None or default in columns else default
+                    for column, default in zip(columns, defaults))
+    if columns[0] is None:
+        if names:
+            raise ValueError(f"{path} has no column named {', '.join(AMOUNT_HEADERS)}; choose the amount column.")
+        raise ValueError(f"No amount column chosen for {path}.")
+    return columns
+
+
+def guess_columns(names):
+    """
+    Return the (amount, date, reference) column indices named by lower-case
+    header names, with None for a column they do not name.
+    """
+    return tuple(next((k for k, name in enumerate(names) if name in headers), None)
+                 for headers in (AMOUNT_HEADERS, DATE_HEADERS, REFERENCE_HEADERS))
+
+
+def column_index(column, names, path):
+    """
+    Resolve a column given by 0-based index or header name to its index.
+    """
+    if column is None or isinstance(column, int):
+        return column
+    name = clean_name(column)
+    if name not in names:
+        raise ValueError(f"{path} has no column named {column!r}.")
+    return names.index(name)
+
+
+def clean_name(value):
+    return str(value).strip().lower() if value is not None else ""
+
+
+def cell(row, column):
+    """
+    Return a cell of a row, or None when the column is missing or the cell is blank.
+    """
+    if column is None or column >= len(row):
+        return None
+    value = row[column]
+    if value is None or isinstance(value, str) and not value.strip():
+        return None
+    return value
+
+
+def write_result(result, path):
+    """
+    Write a ReconcileResult to a .csv or .xlsx file with one row per deposit,
+    giving its status, related set and that set's total.
+
+    Rows are streamed, so memory stays flat however long the lists are. The
+    Excel version is written in openpyxl's write-only mode and adds a
+    summary sheet and a sheet listing each related set with both totals.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, "w", newline="", encoding="utf-8") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(RESULT_HEADERS)
+            # Exact decimal text rather than floats
+            writer.writerows((list_name, deposit_id, format_cents(cents), date, reference, status, related_set,
+                              format_cents(set_cents) if set_cents is not None else None)
+                             for list_name, deposit_id, cents, date, reference, status, related_set, set_cents
+                             in result_rows(result))
+        return
+    if extension != ".xlsx":
+        raise ValueError(f"Unsupported file type {extension!r} for {path}; expected .csv or .xlsx.")
+    if openpyxl is None:
+        raise ValueError(f"Writing {path} needs openpyxl (pip install openpyxl).")
+
+    workbook = openpyxl.Workbook(write_only=True)
+    summary_sheet = workbook.create_sheet("Summary")
+    for row in summary_rows(result):
+        summary_sheet.append(row)
+
+    deposits_sheet = workbook.create_sheet("Deposits")
+    deposits_sheet.append(RESULT_HEADERS)
+    matched_font = Font(color="00FF00")  # Green text
+    unmatched_font = Font(color="FF0000")  # Red text
+    for list_name, deposit_id, cents, date, reference, status, related_set, set_cents in result_rows(result):
+        amount = WriteOnlyCell(deposits_sheet, from_cents(cents))
+        amount.font = matched_font if status == "Matched" else unmatched_font
+        deposits_sheet.append((list_name, deposit_id, amount, date, reference, status, related_set,
+                               from_cents(set_cents) if set_cents is not None else None))
+
+    sets_sheet = workbook.create_sheet("Related Sets")
+    sets_sheet.append(("Related Set", "List A Deposits", "List B Deposits", "List A Total", "List B Total",
+                       "Difference"))
+    for related_set in result.related_sets:
+        sets_sheet.append((related_set.related_set, ", ".join(related_set.a_deposits),
+                           ", ".join(related_set.b_deposits), related_set.total,
+                           from_cents(related_set.cents - related_set.difference_cents), related_set.difference))
+    workbook.save(path)
+
+
+def read_result(path):
+    """
+    Read a result file written by write_result back into a ReconcileResult,
+    e.g. to re-match an updated version of its lists incrementally. The
+    file does not record whether its search was complete, so the result
+    is taken to be optimal.
+    """
+    sheet = "Deposits" if os.path.splitext(path)[1].lower() == ".xlsx" else None
+    try:
+        rows = iter_rows(path, sheet)
+        first = next(rows, None)
+    except KeyError:
+        first = None  # No Deposits sheet
+    if first is None or tuple(clean_name(value) for value in first[:len(RESULT_HEADERS)]) != tuple(
+            header.lower() for header in RESULT_HEADERS):
+        raise ValueError(f"{path} is not a result file; expected the columns {', '.join(RESULT_HEADERS)}.")
+
+    result = ReconcileResult({}, {})
+    related_sets = {}
+    for row_number, row in enumerate(rows, 2):
+        list_name, deposit_id, amount, date, reference, status, related_set = (cell(row, k) for k in range(7))
+        if deposit_id is None:
+            continue
+        try:
+            cents = to_cents(amount)
+            date = to_date(date) if date is not None else None
+        except ValueError as e:
+            raise ValueError(f"{path}, row {row_number}: {e}") from None
+        if list_name not in ("A", "B") or status not in ("Matched", "Unmatched"):
+            raise ValueError(f"{path}, row {row_number}: unknown list {list_name!r} or status {status!r}.")
+        table = result.table_a if list_name == "A" else result.table_b
+        table[str(deposit_id)] = {'value': from_cents(cents), 'cents': cents, 'date': date,
+                                  'reference': str(reference) if reference is not None else None,
+                                  'status': status, 'related_set': related_set}
+        if status == "Matched" and related_set is not None:
+            entry = related_sets.setdefault(related_set, RelatedSet(str(related_set), [], [], 0))
+            if list_name == "A":
+                entry.a_deposits.append(str(deposit_id))
+                entry.cents += cents
+                entry.difference_cents += cents
+            else:
+                entry.b_deposits.append(str(deposit_id))
+                entry.difference_cents -= cents
+    result.related_sets = list(related_sets.values())
+    return result
+
+
+def result_rows(result):
+    """
+    Yield (list, deposit ID, cents, date, reference, status, related set,
+    set total in cents) for every deposit of both lists; the set fields are
+    None for an unmatched deposit.
+    """
+    set_cents = {related_set.related_set: related_set.cents for related_set in result.related_sets}
+    for list_name, table in (("A", result.table_a), ("B", result.table_b)):
+        for deposit_id, deposit in table.items():
+            yield (list_name, deposit_id, deposit['cents'], deposit['date'], deposit['reference'],
+                   deposit['status'], deposit['related_set'], set_cents.get(deposit['related_set']))
+
+
+def summary_rows(result):
+    """
+    Yield (label, value) rows summarizing a ReconcileResult.
+    """
+    matched_a = sum(1 for deposit in result.table_a.values() if deposit['status'] == "Matched")
+    matched_b = sum(1 for deposit in result.table_b.values() if deposit['status'] == "Matched")
+    yield "Matched Total", result.matched_total
+    yield "Unmatched Total (List A)", result.unmatched_total_a
+    yield "Unmatched Total (List B)", result.unmatched_total_b
+    yield "Related Sets", len(result.related_sets)
+    yield "Matched Deposits (List A)", f"{matched_a} of {len(result.table_a)}"
+    yield "Matched Deposits (List B)", f"{matched_b} of {len(result.table_b)}"
+    if result.optimal:
+        yield "Optimal", "Yes"
+    else:
+        status = f"stopped early: {result.stop_reason}" if result.stop_reason else "not proven optimal"
+        yield "Optimal", f"No ({status}); up to {result.gap} more may be matchable"
+
+
+def _chain(first, rows):
+    yield first
+    yield from rows
@@ -0,0 +1,66 @@
+# Incremental re-matching after a correction or a few new deposits. The
+# previous lists are aligned with the current ones, related sets whose
+# deposits are all unchanged are carried over as they were, and only the other
+# deposits (changed and new ones, those of the related sets they broke up, and
+# everything left unmatched) are searched again.
+
+# Solve the whole lists instead when more than this share of the deposits
+# would be searched again; carrying the rest over then saves little
+MAX_REMATCH_SHARE = 0.5
+
+
+def align_positions(old, new):
+    """
+    Map positions in old to positions in new for the entries an edit left
+    in place: the common prefix, the common suffix and, when the part in
+    between has the same length in both, its unchanged entries. Entries
+    shifted by an insertion or deletion in the middle count as changed.
+    """
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    moved = {i: i for i in range(prefix)}
+    shift = len(new) - len(old)
+    moved.update((i, i + shift) for i in range(len(old) - suffix, len(old)))
+    if shift == 0:
+        moved.update((i, i) for i in range(prefix, len(old) - suffix) if old[i] == new[i])
+    return moved
+
+
+def deposit_keys(table, with_days):
+    """
+    Return what identifies each deposit of a result table for matching: its
+    amount in cents, with its day number when dates matter.
+    """
+    if not with_days:
+        return [row['cents'] for row in table.values()]
+    return [(row['cents'], row['date'].toordinal() if row['date'] is not None else None) for row in table.values()]
+
+
+def carry_over_sets(previous, keys_a, keys_b, with_days=False):
+    """
+    Yield (mask_a, mask_b) over the current lists for each related set of a
+    previous ReconcileResult whose deposits are all unchanged. keys_a and
+    keys_b identify the current deposits as deposit_keys does.
+    """
+    moved_a = align_positions(deposit_keys(previous.table_a, with_days), keys_a)
+    moved_b = align_positions(deposit_keys(previous.table_b, with_days), keys_b)
+    for related_set in previous.related_sets:
+        positions_a = [moved_a.get(deposit_position(deposit_id)) for deposit_id in related_set.a_deposits]
+        positions_b = [moved_b.get(deposit_position(deposit_id)) for deposit_id in related_set.b_deposits]
+        if None in positions_a or None in positions_b:
+            continue  # The set lost a deposit to an edit
+        yield sum(1 << i for i in positions_a), sum(1 << j for j in positions_b)
+
+
+def deposit_position(deposit_id):
+    """
+    Return the list position of a deposit ID such as 'A3' (2).
+    """
+    return int(deposit_id[1:]) - 1
+
@@ -0,0 +1,106 @@
+import itertools
+import queue
+import threading
+from dataclasses import dataclass, field
+
+from .budget import CancelToken
+
+
+# Background execution of reconciliations. Jobs run one at a time on a worker
+# thread in the order they were submitted and report back through a queue, so
+# a GUI only has to poll that queue from its own event loop and never touches
+# widgets from another thread.
+
+
+@dataclass
+class Job:
+    """
+    A reconciliation waiting for or running on a JobRunner.
+    """
+    job_id: int
+    reconciler: object  # The Reconciler to solve
+    label: str = ""
+    cancel_token: CancelToken = field(default_factory=CancelToken)
+
+
+class JobRunner:
+    """
+    Run Reconciler jobs one at a time on a background thread.
+
+    Each job posts (kind, job, payload) tuples to the events queue:
+    ('started', job, None), ('progress', job, Progress) while it runs, then
+    ('done', job, ReconcileResult), ('failed', job, exception), or
+    ('cancelled', job, None) when it was cancelled before it started. A job
+    cancelled while running still ends with 'done' and the best matching
+    found so far.
+
+    Usage:
+        runner = JobRunner()
+        job = runner.submit(Reconciler(deposits_a, deposits_b, time_limit=30))
+        kind, job, payload = runner.events.get()
+    """
+    def __init__(self):
+        self.events = queue.Queue()
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active = []  # Submitted jobs that have not finished, in order
+        self._thread = None
+
+    def submit(self, reconciler, label=""):
+        """
+        Queue a Reconciler to be solved and return its Job.
+        """
+        job = Job(next(self._ids), reconciler, label)
+        with self._lock:
+            self._active.append(job)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="reconcile-jobs", daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        return job
+
+    def cancel(self, job=None):
+        """
+        Cancel one job, or every unfinished job when job is None.
+        """
+        with self._lock:
+            jobs = list(self._active) if job is None else [job]
+        for cancelled in jobs:
+            cancelled.cancel_token.cancel()
+
+    def active_jobs(self):
+        """
+        Return the jobs that are queued or running, oldest first.
+        """
+        with self._lock:
+            return list(self._active)
+
+    def shutdown(self):
+        """
+        Cancel every unfinished job and let the worker thread exit.
+        """
+        self.cancel()
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                if job.cancel_token.cancelled():
+                    self.events.put(('cancelled', job, None))
+                    continue
+                self.events.put(('started', job, None))
+                try:
+                    result = job.reconciler.solve(
+                        progress=lambda progress, job=job: self.events.put(('progress', job, progress)),
+                        cancel_token=job.cancel_token)
+                except Exception as e:
+                    self.events.put(('failed', job, e))
+                else:
+                    self.events.put(('done', job, result))
+            finally:
+                with self._lock:
+                    self._active.remove(job)
@@ -0,0 +1,228 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import Lock, RawArray
+
+from .solver import chosen_matching, node_bound, prepare_exact_search, run_exact_search
+
+
+# Process-pool execution of the exact search. Independent components and, for
+# large components, the branches below the root are solved in separate worker
+# processes. Workers share the best total found so far for each component, and
+# which branch found it, so they can prune each other's branches.
+
+# Components with at least this many List A deposits to branch on are split
+# into several tasks
+SPLIT_DEPOSITS = 12
+
+# Below this many branching deposits in total, starting a pool costs more than it saves
+PARALLEL_MIN_DEPOSITS = 16
+
+# Nodes a large component is searched for before the rest of it is shared out
+WARMUP_NODES = 4096
+
+# The unexplored nodes of a component are shared out in about this many tasks per worker
+TASKS_PER_WORKER = 4
+
+# Seconds between budget checks while waiting for worker processes
+POLL_INTERVAL = 0.05
+
+_bounds = None  # Best total per component and the rank of the branch that found it, shared by all workers
+_bounds_lock = None
+_control = None  # [stop flag, search nodes explored by all workers, nodes of those pruned]
+_searches = None  # Prepared search per component, sent once to each worker
+
+
+class SharedBound:
+    """
+    Best total for one component, read and raised by every worker process.
+
+    rank is the position of the worker's branch in the order a single search
+    explores them; the incumbent ranks before every branch. On a tie the
+    earlier branch keeps the bound, so get() can tell a branch whether
+    matchings that only equal the best total are still worth finding.
+    """
+    def __init__(self, slot, rank):
+        self.slot = slot
+        self.rank = rank
+
+    def get(self):
+        total, rank = _bounds[2 * self.slot], _bounds[2 * self.slot + 1]
+        return total, rank <= self.rank
+
+    def offer(self, total):
+        with _bounds_lock:
+            best = _bounds[2 * self.slot]
+            if total > best or total == best and self.rank < _bounds[2 * self.slot + 1]:
+                _bounds[2 * self.slot] = total
+                _bounds[2 * self.slot + 1] = self.rank
+
+
+class WorkerBudget:
+    """
+    Budget seen by worker processes: explored and pruned nodes are added to
+    shared counters, and the search stops once the parent process raises the
+    stop flag.
+    """
+    def spend(self, nodes, prunes=0):
+        with _bounds_lock:
+            _control[1] += nodes
+            _control[2] += prunes
+        return _control[0] != 0
+
+    def report_due(self):
+        return False  # Progress is reported by the parent process
+
+    def report_search(self, matched_cents, bound_cents, fraction):
+        pass
+
+
+def _init_worker(bounds, control, lock, searches):
+    global _bounds, _bounds_lock, _control, _searches
+    _bounds = bounds
+    _bounds_lock = lock
+    _control = control
+    _searches = searches
+
+
+def _run_branch(slot, rank, starts, best_total, visited):
+    search = _searches[slot]
+    return run_exact_search(search, starts, best_total, SharedBound(slot, rank), WorkerBudget(), visited)[:3]
+
+
+def solve_components(components, values_a, values_b, incumbents, workers=1, budget=None, copies_a=(), copies_b=()):
+    """
+    Run the exact search on each component and return one matching per component.
+
+    components is a list of pair lists and incumbents holds the known-valid
+    matching for each. With several workers, a component with at least
+    SPLIT_DEPOSITS deposits to branch on is first searched here for
+    WARMUP_NODES nodes, which settles most of them; the nodes it left
+    unexplored are then shared out among the workers in runs, each seeded
+    with the best total and the states visited so far. Smaller components
+    go to the workers whole.
+
+    The result does not depend on the number of workers: tasks are merged
+    in the order a single search would explore them, so ties go to the same
+    matching, and a task only cuts nodes that tie with the shared best total
+    when an earlier one found it.
+
+    copies_a and copies_b are masks of runs of interchangeable deposits, as
+    in prepare_exact_search. budget is an optional SearchBudget shared by
+    every component. Returns
+    (matchings, upper_bounds); an upper bound above its matching's total
+    means the budget ran out before that component was fully searched.
+    """
+    searches = [prepare_exact_search(pairs, values_a, values_b, copies_a, copies_b) for pairs in components]
+    incumbent_totals = [sum(sum_val for _, _, sum_val in incumbent) for incumbent in incumbents]
+    # Components are weighted by their number of pairs when estimating progress
+    weights = [len(search[0]) for search in searches]
+    total_weight = sum(weights) or 1
+
+    branching = sum(len(search[2]) for search in searches)
+    parallel = workers > 1 and branching >= PARALLEL_MIN_DEPOSITS
+    results = []  # (best_total, chosen, upper_bound) of the search done here, per component
+    tasks = []  # (slot, rank, start nodes, visited states) left for the workers, in search order
+    base_cents = budget.base_cents if budget is not None else 0
+    reached_cents = base_cents
+    root_bounds = [max(total, node_bound(search[4])) for total, search in zip(incumbent_totals, searches)]
+    for slot, search in enumerate(searches):
+        if parallel and len(search[2]) < SPLIT_DEPOSITS:
+            results.append((incumbent_totals[slot], [], incumbent_totals[slot]))
+            tasks.append((slot, 0, [search[4]], None))
+            continue
+        if budget is not None:
+            budget.base_cents = reached_cents
+            budget.pending_cents = sum(root_bounds[slot + 1:])
+            budget.fraction_start = sum(weights[:slot]) / total_weight
+            budget.fraction_span = weights[slot] / total_weight
+        visited = {}
+        best_total, chosen, upper_bound, unexplored = run_exact_search(
+            search, [search[4]], incumbent_totals[slot], budget=budget, visited=visited,
+            max_nodes=WARMUP_NODES if parallel else None)
+        results.append((best_total, chosen, upper_bound))
+        reached_cents += best_total
+        if unexplored and not (budget is not None and budget.exhausted()):
+            for rank, starts in enumerate(_split_nodes(unexplored, workers * TASKS_PER_WORKER)):
+                tasks.append((slot, rank, starts, visited))
+
+    if tasks:
+        # The search done here ranks first: tasks only record totals above it
+        bounds = RawArray('q', [value for best_total, _, _ in results for value in (best_total, -1)])
+        control = RawArray('q', 3)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(bounds, control, Lock(), searches)) as pool:
+            branches = [(slot, starts, pool.submit(_run_branch, slot, rank, starts, results[slot][0], visited))
+                        for slot, rank, starts, visited in tasks]
+            if budget is not None:
+                budget.base_cents = base_cents
+                _watch_branches(branches, bounds, control, weights, budget)
+            merged = []
+            for slot, (best_total, best_chosen, upper_bound) in enumerate(results):
+                # Earlier tasks win ties, as they would in a single search
+                upper_bound = best_total if any(task[0] == slot for task in tasks) else upper_bound
+                for branch_slot, _, future in branches:
+                    if branch_slot != slot:
+                        continue
+                    total, chosen, branch_upper_bound = future.result()
+                    upper_bound = max(upper_bound, branch_upper_bound)
+                    if chosen and total > best_total:
+                        best_total, best_chosen = total, chosen
+                merged.append((best_total, best_chosen, upper_bound))
+        results = merged
+        reached_cents = base_cents + sum(best_total for best_total, _, _ in results)
+
+    if budget is not None:
+        budget.base_cents = reached_cents
+    matchings = [chosen_matching(search, best_total, chosen, incumbent)
+                 for search, (best_total, chosen, _), incumbent in zip(searches, results, incumbents)]
+    return matchings, [upper_bound for _, _, upper_bound in results]
+
+
+def _split_nodes(nodes, count):
+    """
+    Split search nodes into at most count runs of consecutive nodes, each
+    holding about as large a share of the search tree.
+    """
+    total = sum(node[7] for node in nodes)
+    runs, run, share = [], [], 0.0
+    for node in nodes:
+        run.append(node)
+        share += node[7]
+        if share >= total * (len(runs) + 1) / count:
+            runs.append(run)
+            run = []
+    if run:
+        runs.append(run)
+    return runs
+
+
+def _watch_branches(branches, bounds, control, weights, budget):
+    """
+    Wait for the worker tasks, reporting progress and raising the shared stop
+    flag once the budget runs out.
+    """
+    total_weight = sum(weights) or 1
+    budget.pending_cents = 0
+    budget.fraction_start = 0.0
+    budget.fraction_span = 1.0
+    # Whatever the tasks were not given was settled before they started
+    settled_before = sum(weights) - sum(weights[slot] * node[7] for slot, starts, _ in branches for node in starts)
+
+    pending = {future for _, _, future in branches}
+    counted = counted_prunes = 0
+    while pending:
+        _, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+        nodes, prunes = control[1], control[2]
+        if budget.spend(nodes - counted, prunes - counted_prunes):
+            control[0] = 1
+        counted, counted_prunes = nodes, prunes
+
+        if budget.report_due():
+            settled = settled_before
+            upper_bounds = list(bounds[0::2])
+            for slot, starts, future in branches:
+                if future.done() and future.exception() is None:
+                    settled += weights[slot] * sum(node[7] for node in starts)
+                    upper_bounds[slot] = max(upper_bounds[slot], future.result()[2])
+                else:
+                    upper_bounds[slot] = max([upper_bounds[slot]] + [node_bound(node) for node in starts])
+            budget.report_search(sum(bounds[0::2]), sum(upper_bounds), settled / total_weight)
@@ -0,0 +1,31 @@
+# Exact 1:1 pre-pass: pair deposits with identical amounts before any
+# combinatorial search.
+
+
+def match_identical_amounts(deposits_a, deposits_b, days_a=None, days_b=None, window=None):
+    """
+    Pair List A and List B deposits that have exactly the same amount.
+
+    Returns (index_a, index_b, cents) tuples. Pairing is deterministic and
+    respects multiplicity: List A deposits are taken in order and each one
+    takes the first unused List B deposit with the same amount. With a date
+    window, only deposits dated at most window days apart are paired.
+    """
+    positions_b = {}  # Amount -> List B positions still available, in order
+    for j in reversed(range(len(deposits_b))):
+        positions_b.setdefault(deposits_b[j], []).append(j)
+
+    matches = []
+    for i, cents in enumerate(deposits_a):
+        available = positions_b.get(cents)
+        if not available or cents <= 0:
+            continue
+        if window is None:
+            matches.append((i, available.pop(), cents))
+            continue
+        # Positions are stored last-first, so scan from the back to find the first one in the window
+        for k in reversed(range(len(available))):
+            if abs(days_a[i] - days_b[available[k]]) <= window:
+                matches.append((i, available.pop(k), cents))
+                break
+    return matches
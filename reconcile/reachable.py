@@ -0,0 +1,148 @@
+# Reachable-sum pre-filter for the matching engine. The subset totals of each
+# list are tracked as a bitset in a Python int, built by shift-OR over the
+# amounts in cents, so a deposit that cannot be part of any positive total
+# reachable on both sides is dropped before subsets are enumerated. When the
+# totals span too many cents for that, they are tracked in buckets of several
+# cents instead, which drops fewer deposits but never a matchable one.
+
+# Track totals cent by cent while the bitsets need at most this many bits
+MAX_REACH_BITS = 1 << 25
+
+# Check the budget after this many bitset shifts
+REACH_CHECK_INTERVAL = 64
+
+
+def reachable_sums(deposits, low, width=1, budget=None):
+    """
+    Return the totals of every subset of deposits (including the empty one)
+    as a bitset where bit s - low is set when total s is reachable. low must
+    not be above the sum of the negative amounts.
+
+    With a bucket width above 1, bit b - low stands for the totals in
+    [b * width, (b + 1) * width) and a set bit only means that such a total
+    may be reachable (see bucket_steps). Returns None once the optional
+    SearchBudget runs out.
+    """
+    reach = 1 << -low
+    for k, value in enumerate(deposits, 1):
+        shifted = 0
+        for step in bucket_steps(value, width):
+            shifted |= shift(reach, step)
+        reach |= shifted
+        if budget is not None and k % REACH_CHECK_INTERVAL == 0 and budget.exhausted():
+            return None
+    return reach
+
+
+def bucket_steps(value, width):
+    """
+    Return the bucket shifts a deposit may move a total by.
+
+    A total s lies in bucket s // width. Adding a deposit v moves it by
+    v // width or one more, so summing those shifts over a subset always
+    reaches the bucket of the subset's total.
+    """
+    return (value,) if width == 1 else (value // width, value // width + 1)
+
+
+def shift(bits, value):
+    """
+    Return the bitset of totals in bits raised by value.
+    """
+    return bits << value if value >= 0 else bits >> -value
+
+
+def spread(bits, radius):
+    """
+    Return the bitset of totals within radius of a total in bits.
+    """
+    # Widen the window by doubling: after each step bits covers `width` shifts
+    width, target = 1, 2 * radius + 1
+    while width < target:
+        step = min(width, target - width)
+        bits |= bits << step
+        width += step
+    return bits >> radius
+
+
+def bucket_width(deposits_a, deposits_b):
+    """
+    Return the smallest bucket width, in cents, at which the bitsets of both
+    lists fit in MAX_REACH_BITS bits, with the lowest bucket they reach; or
+    (None, None) when even one bucket per deposit would not fit.
+    """
+    count = max(len(deposits_a), len(deposits_b))
+    if count + 2 > MAX_REACH_BITS:
+        return None, None
+    span = max(sum(value for value in deposits if value > 0) for deposits in (deposits_a, deposits_b)) - min(
+        sum(value for value in deposits if value < 0) for deposits in (deposits_a, deposits_b))
+    width = 1
+    if span + 1 > MAX_REACH_BITS:
+        width = -(-span // (MAX_REACH_BITS - count - 2))
+    while True:
+        low = min(sum(min(bucket_steps(value, width)) for value in deposits if value < 0)
+                  for deposits in (deposits_a, deposits_b))
+        high = max(sum(max(bucket_steps(value, width)) for value in deposits if value > 0)
+                   for deposits in (deposits_a, deposits_b))
+        if high - low + 1 <= MAX_REACH_BITS:
+            return width, low
+        width *= 2
+
+
+def prune_unreachable(deposits_a, deposits_b, tolerance=None, budget=None):
+    """
+    Return (positions_a, positions_b), the positions of the deposits that
+    may still be part of a related set.
+
+    A List A deposit of amount v is dropped when no positive total s that is
+    reachable in List A (and within the tolerance of a List B total) has
+    s - v reachable as well, and likewise for List B. Dropping deposits
+    shrinks the reachable sets, so this repeats until nothing changes. The
+    test is necessary but not sufficient: every deposit of every matching
+    is kept, some deposits that can never be matched may be kept too. Totals
+    spanning more than MAX_REACH_BITS cents are compared by bucket.
+
+    budget is an optional SearchBudget; once it runs out, the deposits kept
+    by the rounds finished so far are returned.
+    """
+    positions_a = list(range(len(deposits_a)))
+    positions_b = list(range(len(deposits_b)))
+    width, low = bucket_width(deposits_a, deposits_b)
+    if width is None:
+        return positions_a, positions_b
+    # The widest allowance any total can get, in buckets
+    largest = max(max(sum(value for value in deposits if value > 0), -sum(value for value in deposits if value < 0))
+                  for deposits in (deposits_a, deposits_b))
+    radius = -(-tolerance.allowance(largest) // width) if tolerance is not None else 0
+    # Bits of the totals above zero; with buckets, the bucket holding zero
+    # also holds positive totals
+    positive = ~0 << (-low + (width == 1))
+
+    while True:
+        reach_a = reachable_sums([deposits_a[i] for i in positions_a], low, width, budget)
+        reach_b = reachable_sums([deposits_b[j] for j in positions_b], low, width, budget)
+        if reach_a is None or reach_b is None:
+            return positions_a, positions_b
+        kept_a = kept_positions(deposits_a, positions_a, reach_a & spread(reach_b, radius) & positive, reach_a,
+                                width, budget)
+        kept_b = kept_positions(deposits_b, positions_b, reach_b & spread(reach_a, radius) & positive, reach_b,
+                                width, budget)
+        if kept_a is None or kept_b is None:
+            return positions_a, positions_b
+        if len(kept_a) == len(positions_a) and len(kept_b) == len(positions_b):
+            return kept_a, kept_b
+        positions_a, positions_b = kept_a, kept_b
+
+
+def kept_positions(deposits, positions, common, reach, width, budget=None):
+    """
+    Return the positions whose deposit, added to a reachable total, can make
+    one of the common totals; or None once the optional budget runs out.
+    """
+    kept = []
+    for k, i in enumerate(positions, 1):
+        if any(common & shift(reach, step) for step in bucket_steps(deposits[i], width)):
+            kept.append(i)
+        if budget is not None and k % REACH_CHECK_INTERVAL == 0 and budget.exhausted():
+            return None
+    return kept
@@ -0,0 +1,416 @@
+from .budget import NODE_CHECK_INTERVAL, PAIR_CHECK_INTERVAL
+from .subsets import copies_by_bit, iter_bits, take_copies
+
+
+# Selection of non-overlapping subset pairs for the matching engine. Pairs are
+# (mask_a, mask_b, sum) tuples, so two pairs overlap when their masks share a
+# bit. Runs of identical amounts are the exception: a pair stands for any
+# copies of the run, and concrete copies are assigned as pairs are chosen.
+
+
+def find_greedy_matching(matching_subset_pairs, values_a, values_b, copies_a=(), copies_b=()):
+    """
+    Build a matching by taking the largest pairs first, skipping any pair that
+    overlaps deposits already used.
+
+    matching_subset_pairs must arrive in descending order of sum and may be a
+    lazy stream. Pairs worth more than the value still unused on either side
+    are skipped, and consumption stops as soon as either side is used up.
+    copies_a and copies_b are masks of runs of interchangeable deposits (see
+    prepare_exact_search); a pair then takes whichever copies are unused.
+    """
+    copies_a = copies_by_bit(copies_a)
+    copies_b = copies_by_bit(copies_b)
+    used_a = 0
+    used_b = 0
+    rem_a = sum(value for value in values_a if value > 0)
+    rem_b = sum(value for value in values_b if value > 0)
+    matching = []
+    for mask_a, mask_b, sum_val in matching_subset_pairs:
+        if sum_val <= 0 or min(rem_a, rem_b) <= 0:
+            break  # Nothing left that could raise the matched total
+        if sum_val > min(rem_a, rem_b):
+            continue
+        mask_a = take_copies(mask_a, used_a, copies_a)
+        mask_b = take_copies(mask_b, used_b, copies_b)
+        if mask_a is None or mask_b is None:
+            continue
+
+        matching.append((mask_a, mask_b, sum_val))
+        used_a |= mask_a
+        used_b |= mask_b
+        rem_a -= sum(max(values_a[i], 0) for i in iter_bits(mask_a))
+        rem_b -= sum(max(values_b[i], 0) for i in iter_bits(mask_b))
+    return matching
+
+
+def drop_redundant_pairs(matching_subset_pairs, budget=None):
+    """
+    Return the pairs with a positive sum that cannot be split into smaller pairs.
+
+    A pair is redundant when a smaller pair sits inside it and either the
+    remainder is also a pair (both sides of the smaller pair are proper
+    subsets, so the remainders have equal sums) or the smaller pair is worth
+    at least as much. Replacing it by its parts never lowers the matched
+    total, and keeping only the irreducible pairs stops unions of 1:1 matches
+    from multiplying the search space.
+
+    Pairs are consumed lazily and should arrive in ascending order of sum,
+    so the smaller pairs inside each one have already been kept; only the
+    irreducible pairs are held in memory.
+
+    budget is an optional SearchBudget checked every PAIR_CHECK_INTERVAL
+    pairs; once enumeration has to stop (see SearchBudget.pairs_exhausted),
+    the pairs kept so far are returned, the later ones never looked at.
+    """
+    kept = []
+    kept_by_low_a = {}  # Lowest List A bit -> irreducible pairs starting there
+    for count, (mask_a, mask_b, sum_val) in enumerate(matching_subset_pairs, 1):
+        if count % PAIR_CHECK_INTERVAL == 0 and budget is not None and budget.pairs_exhausted():
+            break
+        if sum_val <= 0:
+            continue  # Cannot increase the matched total
+        low_a = mask_a & -mask_a
+        redundant = False
+        for inner_a, inner_b, inner_sum in kept_by_low_a.get(low_a, ()):
+            if inner_a & ~mask_a or inner_b & ~mask_b or (inner_a, inner_b) == (mask_a, mask_b):
+                continue
+            if inner_sum >= sum_val or (inner_a != mask_a and inner_b != mask_b):
+                redundant = True
+                break
+        if not redundant:
+            kept.append((mask_a, mask_b, sum_val))
+            kept_by_low_a.setdefault(low_a, []).append((mask_a, mask_b, sum_val))
+    return kept
+
+
+def drop_redundant_pairs_within(matching_subset_pairs, tolerance, values_a, values_b, budget=None):
+    """
+    Tolerance-mode counterpart of drop_redundant_pairs, for pairs whose value
+    is the smaller of their two sums.
+
+    The two sides no longer need equal sums, so the remainder of a pair
+    around a smaller pair is not automatically a pair. A smaller pair inside
+    a pair makes it redundant when it is worth at least as much, or when the
+    remainder is also within the tolerance and the two together are worth at
+    least as much. Pairs should arrive in ascending order of the List A sum.
+    budget is checked as in drop_redundant_pairs.
+    """
+    kept = []
+    kept_by_low_a = {}  # Lowest List A bit -> (mask_a, mask_b, value, sum_a, sum_b) of irreducible pairs
+    for count, (mask_a, mask_b, value) in enumerate(matching_subset_pairs, 1):
+        if count % PAIR_CHECK_INTERVAL == 0 and budget is not None and budget.pairs_exhausted():
+            break
+        if value <= 0:
+            continue  # Cannot increase the matched total
+        sum_a = sum(values_a[i] for i in iter_bits(mask_a))
+        sum_b = sum(values_b[i] for i in iter_bits(mask_b))
+        low_a = mask_a & -mask_a
+        redundant = False
+        for inner_a, inner_b, inner_value, inner_sum_a, inner_sum_b in kept_by_low_a.get(low_a, ()):
+            if inner_a & ~mask_a or inner_b & ~mask_b or (inner_a, inner_b) == (mask_a, mask_b):
+                continue
+            if inner_value >= value:
+                redundant = True
+                break
+            if inner_a != mask_a and inner_b != mask_b:
+                rest_a, rest_b = sum_a - inner_sum_a, sum_b - inner_sum_b
+                if tolerance.within(rest_a, rest_b) and inner_value + min(rest_a, rest_b) >= value:
+                    redundant = True
+                    break
+        if not redundant:
+            kept.append((mask_a, mask_b, value))
+            kept_by_low_a.setdefault(low_a, []).append((mask_a, mask_b, value, sum_a, sum_b))
+    return kept
+
+
+def find_exact_matching(matching_subset_pairs, values_a, values_b, incumbent=(), budget=None,
+                        copies_a=(), copies_b=()):
+    """
+    Find the combination of non-overlapping subset pairs with the largest
+    total sum, using a depth-first branch-and-bound search.
+
+    values_a and values_b hold the deposit amounts by position and are used
+    to bound how much value can still be matched on each side. incumbent is
+    an optional known-valid matching; it is returned unless the search finds
+    a strictly better one. With a budget the search may stop early and
+    return the best matching found so far. copies_a and copies_b are
+    described in prepare_exact_search.
+    """
+    search = prepare_exact_search(drop_redundant_pairs(matching_subset_pairs, budget), values_a, values_b,
+                                  copies_a, copies_b)
+    incumbent_total = sum(sum_val for _, _, sum_val in incumbent)
+    best_total, chosen, _, _ = run_exact_search(search, [search[4]], incumbent_total, budget=budget)
+    return chosen_matching(search, best_total, chosen, incumbent)
+
+
+def chosen_matching(search, best_total, chosen, incumbent):
+    """
+    Turn the pair indices picked by a search into a matching, falling back to
+    the incumbent when the search did not beat it. Pairs are given concrete
+    copies of any runs of identical amounts in the order they were picked.
+    """
+    if not chosen or best_total <= sum(sum_val for _, _, sum_val in incumbent):
+        return list(incumbent)
+    pairs = search[0]
+    _, _, copies_a, copies_b = search[5]
+    matching = []
+    used_a = used_b = 0
+    for index in chosen:
+        mask_a = take_copies(pairs[index][6], used_a, copies_a)
+        mask_b = take_copies(pairs[index][7], used_b, copies_b)
+        matching.append((mask_a, mask_b, pairs[index][2]))
+        used_a |= mask_a
+        used_b |= mask_b
+    return matching
+
+
+def counter_layout(mask, copies):
+    """
+    Lay out one counter per run of interchangeable deposits in mask, each
+    followed by a guard bit, for the search state.
+
+    Returns (runs, guards): runs maps each deposit bit to (unit, field) of
+    its run's counter, where unit is the counter's lowest bit and field
+    masks the whole counter, and guards has every guard bit set. Deposits
+    that are not in any of the copies masks get a counter of their own.
+    """
+    groups = [run for run in copies if run & mask]
+    covered = 0
+    for run in groups:
+        covered |= run
+    groups.extend(1 << i for i in iter_bits(mask & ~covered))
+    groups.sort(key=lambda run: run & -run)
+
+    runs = {}
+    guards = 0
+    offset = 0
+    for run in groups:
+        width = bin(run).count('1').bit_length()
+        unit = 1 << offset
+        field = ((1 << width) - 1) << offset
+        for i in iter_bits(run):
+            runs[1 << i] = (unit, field)
+        guards |= 1 << (offset + width)
+        offset += width + 1
+    return runs, guards
+
+
+def prepare_exact_search(matching_subset_pairs, values_a, values_b, copies_a=(), copies_b=()):
+    """
+    Precompute the branch-and-bound search over the given pairs, which must
+    already be irreducible (see drop_redundant_pairs).
+
+    copies_a and copies_b are masks of runs of interchangeable deposits
+    (identical amounts). The search state holds one counter per run with
+    the number of its deposits still available, so pairs differing only in
+    which copies they use are a single option and chosen_matching assigns
+    the concrete copies. Without copies every deposit is a run of its own.
+
+    Returns (pairs, pairs_by_a, order, value_by_run_a, root, layout);
+    everything in it is plain data so it can be sent to worker processes.
+    """
+    matching_subset_pairs = list(matching_subset_pairs)
+    bits_a = bits_b = 0
+    for mask_a, mask_b, _ in matching_subset_pairs:
+        bits_a |= mask_a
+        bits_b |= mask_b
+    runs_a, guards_a = counter_layout(bits_a, copies_a)
+    runs_b, guards_b = counter_layout(bits_b, copies_b)
+
+    pairs = []
+    pairs_by_a = {}  # List A run counter -> indices of the pairs it can be matched through
+    differences = []  # Gap between the two sides of each pair; zero unless matching within a tolerance
+    seen = set()
+    for mask_a, mask_b, sum_val in matching_subset_pairs:
+        bits_in_a = list(iter_bits(mask_a))
+        bits_in_b = list(iter_bits(mask_b))
+        # Counters taken off each side when the pair is chosen
+        need_a = sum(runs_a[1 << i][0] for i in bits_in_a)
+        need_b = sum(runs_b[1 << j][0] for j in bits_in_b)
+        if (need_a, need_b) in seen:
+            continue  # The same amounts as an earlier pair, using other copies
+        seen.add((need_a, need_b))
+        # Positive value removed from each side when the pair is chosen
+        rem_a = sum(max(values_a[i], 0) for i in bits_in_a)
+        rem_b = sum(max(values_b[j], 0) for j in bits_in_b)
+        for field in dict.fromkeys(runs_a[1 << i][1] for i in bits_in_a):
+            pairs_by_a.setdefault(field, []).append(len(pairs))
+        pairs.append((need_a, need_b, sum_val, rem_a, rem_b, len(bits_in_a) + len(bits_in_b), mask_a, mask_b))
+        differences.append(abs(sum(values_a[i] for i in bits_in_a) - sum(values_b[j] for j in bits_in_b)))
+
+    # Smaller pairs come first so the finest related sets are preferred on
+    # ties, then the closest ones
+    for options in pairs_by_a.values():
+        options.sort(key=lambda index: (pairs[index][5], -pairs[index][2], differences[index]))
+
+    # Branch on the runs with the fewest options first
+    order = sorted(pairs_by_a, key=lambda field: len(pairs_by_a[field]))
+
+    # Every deposit of a run starts out available
+    avail_a = avail_b = start_rem_a = start_rem_b = 0
+    value_by_run_a = {}
+    for bit, (unit, field) in runs_a.items():
+        avail_a += unit
+        value_by_run_a[field] = max(values_a[bit.bit_length() - 1], 0)
+        start_rem_a += value_by_run_a[field]
+    for bit, (unit, _) in runs_b.items():
+        avail_b += unit
+        start_rem_b += max(values_b[bit.bit_length() - 1], 0)
+
+    # Search node: (position in order, avail_a, avail_b, total, rem_a, rem_b, chosen, weight)
+    # where weight is the node's estimated share of the whole search tree
+    root = (0, avail_a, avail_b, 0, start_rem_a, start_rem_b, None, 1.0)
+    layout = (guards_a, guards_b, copies_by_bit(copies_a), copies_by_bit(copies_b))
+    return pairs, pairs_by_a, order, value_by_run_a, root, layout
+
+
+def expand_node(search, node):
+    """
+    Return the children of a search node in the order they are explored:
+    each pair that can match a deposit of the next undecided List A run,
+    then leaving what is left of that run unmatched. Returns an empty list
+    for a leaf.
+    """
+    pairs, pairs_by_a, order, value_by_run_a, _, layout = search
+    guards_a, guards_b = layout[:2]
+    k, avail_a, avail_b, total, rem_a, rem_b, chosen, weight = node
+
+    # Skip runs that were already used up
+    while k < len(order) and not avail_a & order[k]:
+        k += 1
+    if k == len(order):
+        return []
+
+    field = order[k]
+    children = []
+    for index in pairs_by_a[field]:
+        need_a, need_b, sum_val, pair_rem_a, pair_rem_b = pairs[index][:5]
+        # A counter short of copies borrows from its guard bit
+        if ((avail_a | guards_a) - need_a) & guards_a != guards_a:
+            continue
+        if ((avail_b | guards_b) - need_b) & guards_b != guards_b:
+            continue
+        children.append((k, avail_a - need_a, avail_b - need_b, total + sum_val,
+                         rem_a - pair_rem_a, rem_b - pair_rem_b, (index, chosen)))
+    # Option of last resort: leave the rest of this run unmatched
+    left = avail_a & field
+    children.append((k + 1, avail_a - left, avail_b, total,
+                     rem_a - left // (field & -field) * value_by_run_a[field], rem_b, chosen))
+
+    # Split the node's share of the tree evenly between its children
+    share = weight / len(children)
+    return [child + (share,) for child in children]
+
+
+def node_bound(node):
+    """
+    Return the most a matching below the node can be worth.
+    """
+    return node[3] + min(node[4], node[5])
+
+
+def run_exact_search(search, starts, best_total, shared_bound=None, budget=None, visited=None, max_nodes=None):
+    """
+    Depth-first branch-and-bound from the given start nodes, explored in order.
+
+    Only matchings worth more than best_total are recorded. shared_bound is an
+    optional object with get() and offer(total) methods used to exchange the
+    best total with searches running elsewhere. get() returns that total and
+    whether a single search would have found it before reaching these start
+    nodes; nodes are only cut by it when they cannot reach that total at all,
+    or merely tie with it in that case, so ties are still resolved the same
+    way as in a single search.
+
+    budget is an optional SearchBudget (or an object with spend(),
+    report_due() and report_search() methods) consulted every
+    NODE_CHECK_INTERVAL nodes; the nodes explored and those pruned are
+    counted in it. The search only stops for it once a complete matching has been reached
+    here or elsewhere, so an interrupted search still has an answer.
+
+    visited is an optional memo of the states already explored, as left by
+    an earlier search of the same tree; it is extended in place. With
+    max_nodes the search pauses after exploring that many nodes.
+
+    Returns (best_total, chosen pair indices in the order they were picked,
+    upper_bound, unexplored). unexplored lists the nodes left when the search
+    stopped or paused, in the order it would have explored them, so they can
+    be searched later as start nodes. upper_bound equals best_total when the
+    search ran to the end; otherwise it is the most any unexplored node could
+    still reach.
+    """
+    order = search[2]
+    best_chosen = None
+    external_best, external_first = shared_bound.get() if shared_bound is not None else (0, False)
+    if visited is None:
+        visited = {}  # (avail_a, avail_b) -> best running total seen in that state
+
+    stack = list(reversed(starts))
+    nodes = 0
+    pruned = 0  # Nodes cut off since the budget was last told
+    start_weight = sum(node[7] for node in starts)
+    settled = 0.0  # Share of the search tree fully explored or pruned
+    reached_leaf = False
+    stopping = budget is not None and budget.spend(0)
+    while stack:
+        # Out of budget: stop as soon as there is an answer here or elsewhere
+        if stopping and (reached_leaf or best_total > 0 or external_best > 0):
+            break
+        if nodes == max_nodes:
+            break
+
+        nodes += 1
+        if nodes % NODE_CHECK_INTERVAL == 0:
+            if shared_bound is not None:
+                external_best, external_first = shared_bound.get()
+            if budget is not None:
+                stopping = budget.spend(NODE_CHECK_INTERVAL, pruned)
+                pruned = 0
+                if budget.report_due():
+                    budget.report_search(best_total, max([best_total] + [node_bound(node) for node in stack]),
+                                         settled / start_weight)
+
+        node = stack.pop()
+        k, avail_a, avail_b, total, rem_a, rem_b, chosen, weight = node
+
+        # Skip runs that were already used up
+        while k < len(order) and not avail_a & order[k]:
+            k += 1
+
+        if k == len(order):
+            reached_leaf = True
+            settled += weight
+            if total > best_total:
+                best_total = total
+                best_chosen = chosen
+                if shared_bound is not None:
+                    shared_bound.offer(total)
+            continue
+
+        # Prune when even matching everything left cannot beat the best
+        bound = total + min(rem_a, rem_b)
+        if bound <= best_total or bound < external_best or bound == external_best and external_first:
+            settled += weight
+            pruned += 1
+            continue
+
+        state = (avail_a, avail_b)
+        if visited.get(state, -1) >= total:
+            settled += weight
+            pruned += 1
+            continue
+        visited[state] = total
+
+        stack.extend(reversed(expand_node(search, (k,) + node[1:])))
+
+    if budget is not None:
+        budget.spend(nodes % NODE_CHECK_INTERVAL, pruned)
+    upper_bound = max([best_total] + [node_bound(node) for node in stack])
+
+    # Walk the chosen chain back into pair indices
+    chosen_indices = []
+    while best_chosen is not None:
+        index, best_chosen = best_chosen
+        chosen_indices.append(index)
+    chosen_indices.reverse()
+    return best_total, chosen_indices, upper_bound, stack[::-1]
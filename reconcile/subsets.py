@@ -0,0 +1,897 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from heapq import heappop, heappush
+from itertools import accumulate, groupby
+from operator import itemgetter
+
+from .budget import SUBSET_CHECK_INTERVAL
+from .tolerance import PARTS_PER_MILLION
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the array module is used instead
+    np = None
+
+
+# Subset enumeration and pair building for the matching engine. Amounts are
+# integer cents, so sums are exact and can be compared for equality directly.
+# Identical amounts can be grouped in runs, enumerated by multiplicity with
+# each subset taking the first copies of a run; take_copies later assigns the
+# concrete copies a chosen pair uses.
+
+# Extend this many subsets by another run between two budget checks
+GROW_CHECK_INTERVAL = 1024
+
+# Join about this many subset combinations at a time when enumerating pairs
+JOIN_CHUNK = 1 << 16
+
+# Build at most about this many subsets per table without group-size limits;
+# longer lists are only searched for groups of as many deposits as fit
+MAX_TABLE_SUBSETS = 1 << 18
+
+
+class SubsetTable:
+    """
+    Column-oriented collection of subsets. masks[i] is a bitmask of deposit
+    positions (bit 0 is the first deposit) and sums[i] is their total.
+
+    When masks is None the table holds every subset of the list and sums is
+    indexed by the mask itself, with sums[0] being the empty subset.
+    """
+    def __init__(self, sums, masks=None):
+        self.sums = sums
+        self.masks = masks
+
+    def __len__(self):
+        return len(self.sums) - 1 if self.masks is None else len(self.sums)
+
+    def __iter__(self):
+        sums = self.sums.tolist() if np is not None and isinstance(self.sums, np.ndarray) else self.sums
+        if self.masks is None:
+            return zip(range(1, len(sums)), sums[1:])
+        return zip(self.masks, sums)
+
+    def sorted_columns(self):
+        """
+        Return (sums, masks) of the non-empty subsets as NumPy arrays sorted by sum.
+        """
+        sums = np.asarray(self.sums, dtype=np.int64)
+        order = np.argsort(sums, kind='stable')
+        if self.masks is None:
+            order = order[order != 0]
+            return sums[order], order
+        return sums[order], np.asarray(self.masks, dtype=object)[order]
+
+
+def subset_sums(deposits):
+    """
+    Return the sum of every subset of deposits, indexed by mask.
+
+    Sums are built by doubling: after adding deposit i, the second half of
+    the array is the first half plus deposits[i]. With NumPy each doubling is
+    a single vectorized add over an int64 array.
+    """
+    if np is not None:
+        sums = np.zeros(1, dtype=np.int64)
+        for value in deposits:
+            sums = np.concatenate((sums, sums + value))
+        return sums
+    sums = array('q', [0])
+    for value in deposits:
+        sums.extend([subset_sum + value for subset_sum in sums])
+    return sums
+
+
+def duplicate_runs(deposits, keys=None):
+    """
+    Group deposit positions into runs of identical amounts.
+
+    Returns a list of runs, each the ascending positions of one amount, in
+    order of their first deposit. With keys (e.g. posting days), deposits
+    only count as identical when their keys are equal too.
+    """
+    runs = {}
+    for i, value in enumerate(deposits):
+        runs.setdefault((value, keys[i] if keys is not None else None), []).append(i)
+    return list(runs.values())
+
+
+def run_masks(runs):
+    """
+    Return a mask of positions for each run that holds more than one deposit.
+    """
+    return [sum(1 << i for i in run) for run in runs if len(run) > 1]
+
+
+def grouped_subset_sums(deposits, runs=None, max_size=None, budget=None):
+    """
+    Return (sums, masks) for every non-empty subset of the deposits in runs,
+    or only those of at most max_size deposits.
+
+    runs lists the positions of each run of identical amounts (see
+    duplicate_runs); without it every deposit is a run of its own. A subset
+    always takes the first copies of each run it uses, so a run of n copies
+    contributes n + 1 choices instead of 2^n subsets with the same sums.
+    Subsets are grown a run at a time, each extended only by runs after its
+    last one so every subset is built exactly once.
+
+    budget is an optional SearchBudget checked every GROW_CHECK_INTERVAL
+    subsets extended; once it runs out, only the subsets built so far are
+    returned and budget.truncated is set.
+    """
+    if runs is None:
+        runs = [[i] for i in range(len(deposits))]
+    limit = sum(len(run) for run in runs) if max_size is None else max_size
+    subsets = grow_subsets(run_prefixes(deposits, runs), [(0, 0, 0, 0, None)], limit, budget)
+    sums = [sum_val for sum_val, _, _, _, _ in subsets]
+    masks = [mask for _, mask, _, _, _ in subsets]
+    if np is not None:
+        return np.array(sums, dtype=np.int64), masks
+    return array('q', sums), masks
+
+
+def run_prefixes(deposits, runs):
+    """
+    Return the amount of each run and the masks of its first 1, 2, ... copies.
+    """
+    prefixes = []
+    for run in runs:
+        masks = []
+        mask = 0
+        for i in run:
+            mask |= 1 << i
+            masks.append(mask)
+        prefixes.append((deposits[run[0]], masks))
+    return prefixes
+
+
+def grow_subsets(prefixes, frontier, limit, budget=None):
+    """
+    Return every extension of the frontier subsets by later runs holding at
+    most limit deposits, not counting the frontier subsets themselves.
+
+    prefixes is the run_prefixes of the list. Frontier entries are (sum,
+    mask, size, first run that may still be added, head), head being any
+    value passed on unchanged to the subsets grown from them. Subsets are
+    extended only by runs after their last one, so each is built exactly
+    once. budget is checked as in grouped_subset_sums.
+    """
+    subsets = []
+    stopped = False
+    while frontier and not stopped:
+        grown = []
+        for start in range(0, len(frontier), GROW_CHECK_INTERVAL):
+            if budget is not None and budget.pairs_exhausted():
+                stopped = True
+                break
+            grown += [(sum_val + copies * value, mask | prefix, size + copies, run + 1, head)
+                      for sum_val, mask, size, first, head in frontier[start:start + GROW_CHECK_INTERVAL]
+                      for run, (value, copy_masks) in enumerate(prefixes[first:], first)
+                      for copies, prefix in enumerate(copy_masks[:limit - size], 1)]
+        subsets += grown
+        frontier = [entry for entry in grown if entry[2] < limit]  # Full subsets cannot grow further
+    return subsets
+
+
+def get_all_subsets(deposits, max_size=None, runs=None, budget=None):
+    """
+    Generate all possible non-empty subsets for a list of deposits in cents,
+    or only those of at most max_size deposits. With runs, identical
+    amounts are grouped as in grouped_subset_sums, which also stops early
+    once the optional budget runs out.
+    """
+    if runs is not None or max_size is not None and max_size < len(deposits):
+        return SubsetTable(*grouped_subset_sums(deposits, runs, max_size, budget))
+    return SubsetTable(subset_sums(deposits))
+
+
+def iter_matching_subset_pairs(subsets_a, subsets_b, descending=False, max_sum=None, tolerance=None):
+    """
+    Yield every (mask_a, mask_b, sum) pair of subsets from A and B that have
+    the same sum, one sum bucket at a time in ascending (or descending) order
+    of sum. Buckets above max_sum are never produced.
+
+    With a Tolerance, pairs whose sums are within it are yielded instead,
+    in order of the List A sum, with the smaller of the two sums as value.
+    """
+    if tolerance is not None:
+        if np is not None:
+            sorted_a = zip(*(column.tolist() for column in subsets_a.sorted_columns()))
+            sorted_b = zip(*(column.tolist() for column in subsets_b.sorted_columns()))
+            if descending:
+                sorted_a, sorted_b = reversed(list(sorted_a)), reversed(list(sorted_b))
+        else:
+            sorted_a = sorted(((sum_val, mask) for mask, sum_val in subsets_a), reverse=descending)
+            sorted_b = sorted(((sum_val, mask) for mask, sum_val in subsets_b), reverse=descending)
+        yield from iter_pairs_within_tolerance(sorted_a, sorted_b, tolerance, descending, max_sum)
+        return
+
+    if np is not None:
+        # Join the two tables on sum with sorted arrays instead of a dict
+        sums_a, masks_a = subsets_a.sorted_columns()
+        sums_b, masks_b = subsets_b.sorted_columns()
+        common = np.intersect1d(sums_a, sums_b)
+        if max_sum is not None:
+            common = common[common <= max_sum]
+        if descending:
+            common = common[::-1]
+        starts_a = np.searchsorted(sums_a, common, side='left').tolist()
+        ends_a = np.searchsorted(sums_a, common, side='right').tolist()
+        starts_b = np.searchsorted(sums_b, common, side='left').tolist()
+        ends_b = np.searchsorted(sums_b, common, side='right').tolist()
+        for sum_val, start_a, end_a, start_b, end_b in zip(common.tolist(), starts_a, ends_a, starts_b, ends_b):
+            group_a = masks_a[start_a:end_a].tolist()
+            for mask_b in masks_b[start_b:end_b].tolist():
+                for mask_a in group_a:
+                    yield mask_a, mask_b, sum_val
+        return
+
+    sum_to_masks_a = {}
+    for mask, sum_val in subsets_a:
+        sum_to_masks_a.setdefault(sum_val, []).append(mask)
+    sum_to_masks_b = {}
+    for mask, sum_val in subsets_b:
+        if sum_val in sum_to_masks_a:
+            sum_to_masks_b.setdefault(sum_val, []).append(mask)
+
+    # Walk the matching sums in order
+    for sum_val in sorted(sum_to_masks_b, reverse=descending):
+        if max_sum is not None and sum_val > max_sum:
+            continue
+        for mask_b in sum_to_masks_b[sum_val]:
+            for mask_a in sum_to_masks_a[sum_val]:
+                yield mask_a, mask_b, sum_val
+
+
+def half_subset_sums(deposits, runs=None):
+    """
+    Return (sum, mask) for every subset of deposits, including the empty one,
+    sorted by sum. Bit i of mask is set when deposits[i] is in the subset.
+    With runs, only the deposits in them are used, grouped as in
+    grouped_subset_sums.
+    """
+    if runs is not None:
+        sums, masks = grouped_subset_sums(deposits, runs)
+        if np is not None:
+            sums = sums.tolist()
+        return sorted([(0, 0)] + list(zip(sums, masks)))
+    sums = subset_sums(deposits)
+    if np is not None:
+        order = np.argsort(sums, kind='stable')
+        return list(zip(sums[order].tolist(), order.tolist()))
+    return sorted(zip(sums, range(len(sums))))
+
+
+def split_halves(deposits, runs=None):
+    """
+    Return (low, high), the half_subset_sums of the two halves of deposits,
+    with masks over the whole list. With runs, the list is halved between
+    runs so both halves have about as many grouped subsets.
+    """
+    if runs is None:
+        shift = len(deposits) // 2
+        high = [(sum_val, mask << shift) for sum_val, mask in half_subset_sums(deposits[shift:])]
+        return half_subset_sums(deposits[:shift]), high
+    # Split where both halves have about as many subsets; their masks
+    # already use positions in the whole list
+    choices = [math.log(len(run) + 1) for run in runs]
+    split, low_choices = 0, 0.0
+    while split < len(runs) and low_choices + choices[split] <= sum(choices) / 2:
+        low_choices += choices[split]
+        split += 1
+    return half_subset_sums(deposits, runs[:split]), half_subset_sums(deposits, runs[split:])
+
+
+def iter_bits(mask):
+    """
+    Yield the positions of the set bits in mask, lowest first.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def remap_mask(mask, positions):
+    """
+    Translate a mask over a sub-list into a mask over the original list, where
+    positions[i] is the original position of the sub-list's i-th deposit.
+    """
+    remapped = 0
+    for i in iter_bits(mask):
+        remapped |= 1 << positions[i]
+    return remapped
+
+
+def restrict_mask(mask, positions):
+    """
+    Translate a mask over a list into a mask over the sub-list holding the
+    given positions of it, dropping any bits outside the sub-list.
+    """
+    return sum(1 << k for k, i in enumerate(positions) if mask >> i & 1)
+
+
+def take_copies(mask, used, copies):
+    """
+    Swap each deposit in mask for the lowest unused deposit of its run and
+    return the resulting mask, or None when a run has too few unused copies.
+
+    copies maps a deposit's bit to the mask of its run of identical amounts;
+    deposits without an entry stand alone, so without copies this returns
+    mask exactly when none of it is used.
+    """
+    if not copies:
+        return None if mask & used else mask
+    taken = 0
+    for i in iter_bits(mask):
+        free = copies.get(1 << i, 1 << i) & ~(used | taken)
+        if not free:
+            return None
+        taken |= free & -free
+    return taken
+
+
+def copies_by_bit(runs):
+    """
+    Map every deposit bit in the given run masks to the mask of its run.
+    """
+    return {1 << i: run for run in runs for i in iter_bits(run)}
+
+
+def mask_to_deposit_ids(mask, prefix):
+    """
+    Convert a bitmask into deposit IDs such as ['A1', 'A3'] for presentation.
+    """
+    return [f"{prefix}{i+1}" for i in iter_bits(mask)]
+
+
+def iter_matching_subset_pairs_mitm(deposits_a, deposits_b, descending=False, max_sum=None, tolerance=None,
+                                    max_size_a=None, max_size_b=None, runs_a=None, runs_b=None, budget=None):
+    """
+    Yield every (mask_a, mask_b, sum) pair of subsets from A and B that have
+    the same sum, using a meet-in-the-middle enumeration.
+
+    Each list is split in half and the pairs are found by
+    iter_pairs_of_halves, so memory grows with the subsets of the halves
+    rather than of the whole lists. Pairs worth nothing (a value of zero or
+    less) are left out, as are pairs above max_sum. Lists whose halves would
+    hold more than MAX_TABLE_SUBSETS subsets are only searched for groups of
+    as many deposits as fit in such a table, marking the walk truncated.
+
+    With max_size_a or max_size_b limiting how many deposits each side of a
+    pair may hold, the limited subsets of one list are built and the other
+    list is searched for their totals by iter_pairs_to_targets, or, when
+    both lists have few limited subsets, those are built and joined on sum.
+    Whichever plan needs the fewest subsets and lookups is taken. runs_a and
+    runs_b group identical amounts as in grouped_subset_sums.
+
+    budget is an optional SearchBudget: the subsets walked are counted in it,
+    and the walk ends early (setting budget.truncated) once it runs out.
+    """
+    whole = ((max_size_a is None or max_size_a >= len(deposits_a))
+             and (max_size_b is None or max_size_b >= len(deposits_b)))
+    if whole and halves_fit(deposits_a, runs_a) and halves_fit(deposits_b, runs_b):
+        yield from iter_pairs_of_halves(split_halves(deposits_a, runs_a), split_halves(deposits_b, runs_b),
+                                        descending, max_sum, tolerance, budget)
+        return
+
+    runs_a = runs_a if runs_a is not None else [[i] for i in range(len(deposits_a))]
+    runs_b = runs_b if runs_b is not None else [[j] for j in range(len(deposits_b))]
+    if whole:
+        # Pairs of larger groups are never looked at, so nothing is proven
+        if budget is not None:
+            budget.truncated = True
+        max_size_a, max_size_b = largest_group_size(runs_a), largest_group_size(runs_b)
+    size_a = len(deposits_a) if max_size_a is None else min(max_size_a, len(deposits_a))
+    size_b = len(deposits_b) if max_size_b is None else min(max_size_b, len(deposits_b))
+    count_a, count_b = count_grouped_subsets(runs_a, size_a), count_grouped_subsets(runs_b, size_b)
+    # Subsets built plus lookups made by each plan: building both lists'
+    # subsets, or searching List A (or List B) for the other list's totals
+    costs = {None: count_a + count_b,
+             True: count_b * (count_grouped_subsets(runs_a, size_a // 2) + 1)
+             + count_grouped_subsets(runs_a, (size_a + 1) // 2),
+             False: count_a * (count_grouped_subsets(runs_b, size_b // 2) + 1)
+             + count_grouped_subsets(runs_b, (size_b + 1) // 2)}
+    searching_a = min(costs, key=costs.get)
+
+    if searching_a is None:
+        subsets_a = SubsetTable(*grouped_subset_sums(deposits_a, runs_a, size_a, budget))
+        subsets_b = SubsetTable(*grouped_subset_sums(deposits_b, runs_b, size_b, budget))
+        if budget is not None:
+            budget.subsets += len(subsets_a) + len(subsets_b)
+        pairs = (pair for pair in iter_matching_subset_pairs(subsets_a, subsets_b, descending, max_sum, tolerance)
+                 if pair[2] > 0)
+        if tolerance is not None:
+            pairs = sorted(pairs, key=itemgetter(2), reverse=descending)  # Those come in order of the List A sum
+        yield from pairs
+    elif searching_a:
+        targets = grouped_subset_sums(deposits_b, runs_b, size_b, budget)
+        yield from iter_pairs_to_targets(deposits_a, runs_a, size_a, targets, True, descending, max_sum, tolerance,
+                                         budget)
+    else:
+        targets = grouped_subset_sums(deposits_a, runs_a, size_a, budget)
+        yield from iter_pairs_to_targets(deposits_b, runs_b, size_b, targets, False, descending, max_sum, tolerance,
+                                         budget)
+
+
+def halves_fit(deposits, runs=None):
+    """
+    Return True when each half of split_halves(deposits, runs) holds about
+    MAX_TABLE_SUBSETS subsets or fewer.
+    """
+    subsets = 1 << len(deposits) if runs is None else math.prod(len(run) + 1 for run in runs)
+    return subsets <= MAX_TABLE_SUBSETS ** 2
+
+
+def largest_group_size(runs):
+    """
+    Return the largest group size (at least 1) for which grouped_subset_sums
+    builds at most MAX_TABLE_SUBSETS subsets from the runs.
+    """
+    size = 1
+    while size < sum(len(run) for run in runs) and count_grouped_subsets(runs, size + 1) <= MAX_TABLE_SUBSETS:
+        size += 1
+    return size
+
+
+def count_grouped_subsets(runs, max_size):
+    """
+    Return how many non-empty subsets of at most max_size deposits
+    grouped_subset_sums builds from the runs.
+    """
+    ways = [1] + [0] * max_size  # ways[size] counts the subsets of that many deposits
+    for run in runs:
+        ways = [sum(ways[size - copies] for copies in range(min(len(run), size) + 1)) for size in range(max_size + 1)]
+    return sum(ways) - 1
+
+
+def size_split_tables(deposits, runs, max_size, budget=None):
+    """
+    Return (heads, blocks, rests), from which every subset of at most
+    max_size deposits (grouped by runs as in grouped_subset_sums) is put
+    together exactly once as a head, then a block, then a rest.
+
+    A subset of s deposits is split after as many of its runs as fit in
+    s // 2 deposits. Its head thus holds at most max_size // 2 deposits, and
+    the tail after it is a block of copies of one run followed by a rest of
+    fewer than (max_size + 1) // 2 deposits of later runs, so no table grows
+    anywhere near as fast as the subsets of max_size deposits. heads are
+    (sum, mask, size, last run), blocks (sum, mask, run, copies) and rests
+    (sum, mask, size, first run); the empty head has last run -1 and the
+    empty rest first run len(runs).
+    """
+    prefixes = run_prefixes(deposits, runs)
+    run_of = {i: k for k, run in enumerate(runs) for i in run}
+    grown = grow_subsets(prefixes, [(0, 0, 0, 0, None)], max_size // 2, budget)
+    heads = [(0, 0, 0, -1)] + [(sum_val, mask, size, first - 1) for sum_val, mask, size, first, _ in grown]
+    # Subsets take the first copy of each of their runs, so the lowest
+    # deposit of a subset is in its first run
+    rest_size = (max_size + 1) // 2 - 1
+    rests = [(0, 0, 0, len(runs))] + [(sum_val, mask, size, run_of[(mask & -mask).bit_length() - 1])
+                                      for sum_val, mask, size, _, _ in grown if size <= rest_size]
+    blocks = [(copies * value, copy_masks[copies - 1], run, copies) for run, (value, copy_masks) in enumerate(prefixes)
+              for copies in range(1, min(len(copy_masks), max_size) + 1)]
+    return heads, blocks, rests
+
+
+def iter_pairs_to_targets(deposits, runs, max_size, targets, searching_a, descending=False, max_sum=None,
+                          tolerance=None, budget=None):
+    """
+    Yield (mask_a, mask_b, value) for every pair of a target subset and a
+    subset of at most max_size of the deposits whose totals match, or are
+    within the tolerance, where value is the smaller of the two totals and
+    lies in (0, max_sum], in ascending (or descending) order of value.
+
+    targets is the (sums, masks) of the subsets of the other list, and
+    searching_a tells whether deposits is List A. The subsets of deposits
+    are never all built: each head of size_split_tables is combined with
+    each target, and the tails completing it are found by binary search
+    among the tails sorted by (sum, first run). Targets are walked in order
+    of their total, and pairs are yielded as soon as no later target can
+    give a pair that sorts before them, so only those pairs are held.
+
+    budget is an optional SearchBudget checked every JOIN_CHUNK head and
+    target combinations, or sooner once they complete JOIN_CHUNK tails;
+    once it runs out, the pairs found so far are yielded and
+    budget.truncated is set.
+    """
+    heads, blocks, rests = size_split_tables(deposits, runs, max_size, budget)
+    if budget is not None and budget.walk(len(heads) + len(rests), 0, max_sum, fraction=0.0):
+        return
+    target_sums, target_masks = targets
+    if np is not None:
+        target_sums = target_sums.tolist()
+    # Totals of deposits that can match each target; searching List A, the
+    # allowance depends on the total found, so take the widest it can get
+    if tolerance is None:
+        windows = [(sum_val, sum_val) for sum_val in target_sums]
+    elif searching_a:
+        radius = tolerance.allowance(max(sum(value for value in deposits if value > 0),
+                                         -sum(value for value in deposits if value < 0)))
+        windows = [(sum_val - radius, sum_val + radius) for sum_val in target_sums]
+    else:
+        windows = [tolerance.window(sum_val) for sum_val in target_sums]
+    # Pairs worth nothing or more than max_sum need not be looked up
+    kept = [t for t, (sum_val, (low, high)) in enumerate(zip(target_sums, windows))
+            if sum_val > 0 and high > 0 and (max_sum is None or low <= max_sum)]
+    if not blocks or not kept:
+        return
+    # Targets are walked in order of their total (from the largest when
+    # descending). A pair is worth between the low end of its target's
+    # window and the target total, so the pairs found are yielded once no
+    # target left can give a pair worth as little (or as much) as them.
+    kept.sort(key=target_sums.__getitem__, reverse=descending)
+    if descending:
+        bounds = [target_sums[t] for t in kept]
+    else:
+        bounds = list(accumulate(reversed([windows[t][0] for t in kept]), min))[::-1]
+    rests.sort(key=itemgetter(3))
+    # Sort key of the tails: (sum, first run) as a single integer
+    scale = len(runs) + 1
+    if np is None:
+        yield from _iter_pairs_to_targets(heads, blocks, rests, target_sums, target_masks, windows, kept, bounds,
+                                          scale, max_size, searching_a, descending, max_sum, tolerance, budget)
+        return
+
+    head_sums, head_sizes, head_lasts = (np.array([head[k] for head in heads], dtype=np.int64) for k in (0, 2, 3))
+    block_sums, block_runs, block_copies = (np.array([block[k] for block in blocks], dtype=np.int64)
+                                            for k in (0, 2, 3))
+    rest_sums, rest_sizes, rest_firsts = (np.array([rest[k] for rest in rests], dtype=np.int64) for k in (0, 2, 3))
+    # Each block takes the rests of later runs, which end the sorted rests
+    starts = np.searchsorted(rest_firsts, block_runs, side='right')
+    tail_blocks, tail_rests = expand_ranges(starts, len(rests) - starts)
+    fits = block_copies[tail_blocks] + rest_sizes[tail_rests] <= max_size
+    tail_blocks, tail_rests = tail_blocks[fits], tail_rests[fits]
+    tail_sums = block_sums[tail_blocks] + rest_sums[tail_rests]
+    tail_keys = tail_sums * scale + block_runs[tail_blocks]
+    order = np.argsort(tail_keys, kind='stable')
+    tail_blocks, tail_rests, tail_sums, tail_keys = (column[order] for column in
+                                                     (tail_blocks, tail_rests, tail_sums, tail_keys))
+    tail_sizes = block_copies[tail_blocks] + rest_sizes[tail_rests]
+    tail_firsts, tail_copies = block_runs[tail_blocks], block_copies[tail_blocks]
+    kept = np.array(kept, dtype=np.int64)
+    sums = np.array(target_sums, dtype=np.int64)[kept]
+    lows = np.array([windows[t][0] for t in kept.tolist()], dtype=np.int64)
+    highs = np.array([windows[t][1] for t in kept.tolist()], dtype=np.int64)
+
+    found = []  # (value, List A sum, head, block, rest, target) index arrays of the pairs not yielded yet
+    combinations = len(kept) * len(heads)
+    start, size = 0, JOIN_CHUNK
+    while start < combinations:
+        stop = min(start + size, combinations)
+        t, h = np.divmod(np.arange(start, stop), len(heads))
+        firsts = np.searchsorted(tail_keys, (lows[t] - head_sums[h]) * scale + head_lasts[h] + 1, side='left')
+        counts = np.searchsorted(tail_keys, (highs[t] - head_sums[h]) * scale + scale - 1, side='right') - firsts
+        # A head can complete many tails, so a chunk ends after about
+        # JOIN_CHUNK of them, or after its first head and target
+        ends = np.cumsum(counts)
+        cut = max(1, int(np.searchsorted(ends, JOIN_CHUNK, side='right')))
+        size = min(2 * cut, JOIN_CHUNK)
+        if cut < len(ends):
+            stop = start + cut
+            t, h, firsts, counts = t[:cut], h[:cut], firsts[:cut], counts[:cut]
+        if budget is not None and budget.walk(stop - start, 0, max_sum, fraction=start / combinations):
+            break
+        start = stop
+
+        c, u = expand_ranges(firsts, counts)
+        h, t = h[c], t[c]
+        # Keep each subset only in its own split (see size_split_tables)
+        size_found = head_sizes[h] + tail_sizes[u]
+        half = size_found // 2
+        keep = ((tail_firsts[u] > head_lasts[h]) & (size_found <= max_size) & (head_sizes[h] <= half)
+                & (head_sizes[h] + tail_copies[u] > half))
+        found_sums = head_sums[h] + tail_sums[u]
+        sum_a, sum_b = (found_sums, sums[t]) if searching_a else (sums[t], found_sums)
+        value = np.minimum(sum_a, sum_b)
+        keep &= value > 0
+        if max_sum is not None:
+            keep &= value <= max_sum
+        if tolerance is not None:
+            allowance = np.maximum(tolerance.cents, np.abs(sum_a) * tolerance.ppm // PARTS_PER_MILLION)
+            keep &= np.abs(sum_a - sum_b) <= allowance
+        found.append((value[keep], sum_a[keep], h[keep], tail_blocks[u[keep]], tail_rests[u[keep]], kept[t[keep]]))
+        if start < combinations and bounds[start // len(heads)] == bounds[(start - 1) // len(heads)]:
+            continue  # Nothing more is final until the bound moves
+
+        value, sum_a, h, b, r, t = (np.concatenate(column) for column in zip(*found))
+        if start < combinations:
+            bound = bounds[start // len(heads)]
+            final = value > bound if descending else value < bound
+        else:
+            final = np.ones(len(value), dtype=bool)
+        found = [tuple(column[~final] for column in (value, sum_a, h, b, r, t))]
+        yield from _yield_target_pairs(heads, blocks, rests, target_masks, searching_a, descending,
+                                       *(column[final] for column in (value, sum_a, h, b, r, t)))
+    else:
+        return
+    # The budget ran out: yield the pairs found so far
+    if found:
+        yield from _yield_target_pairs(heads, blocks, rests, target_masks, searching_a, descending,
+                                       *(np.concatenate(column) for column in zip(*found)))
+
+
+def _yield_target_pairs(heads, blocks, rests, target_masks, searching_a, descending, value, sum_a, h, b, r, t):
+    """
+    Yield the pairs of iter_pairs_to_targets given by index arrays, in order of value.
+    """
+    ranked = np.lexsort((sum_a, value))  # Equal values in order of the List A sum, as in full enumeration
+    if descending:
+        ranked = ranked[::-1]
+    for start in range(0, len(ranked), JOIN_CHUNK):
+        chunk = ranked[start:start + JOIN_CHUNK]
+        for value_k, h_k, b_k, r_k, t_k in zip(*(column[chunk].tolist() for column in (value, h, b, r, t))):
+            mask = heads[h_k][1] | blocks[b_k][1] | rests[r_k][1]
+            yield (mask, target_masks[t_k], value_k) if searching_a else (target_masks[t_k], mask, value_k)
+
+
+def _iter_pairs_to_targets(heads, blocks, rests, target_sums, target_masks, windows, kept, bounds, scale, max_size,
+                           searching_a, descending=False, max_sum=None, tolerance=None, budget=None):
+    """
+    iter_pairs_to_targets without NumPy, once the tables are built and the
+    targets sorted.
+    """
+    # (sum, mask, size, first run, copies of the first run) of every tail
+    tails = sorted(((block_sum + rest_sum, block_mask | rest_mask, copies + rest_size, run, copies)
+                    for block_sum, block_mask, run, copies in blocks
+                    for rest_sum, rest_mask, rest_size, rest_first in rests
+                    if rest_first > run and copies + rest_size <= max_size), key=itemgetter(0, 3))
+    tail_keys = [sum_val * scale + first for sum_val, _, _, first, _ in tails]
+    sign = -1 if descending else 1
+    found = []  # Heap of (sign * value, sign * List A sum, mask_a, mask_b) of the pairs not yielded yet
+    count = 0  # Combinations walked since the budget was last told
+    for k, t in enumerate(kept):
+        low, high = windows[t]
+        for head_sum, head_mask, head_size, head_last in heads:
+            # Heads are checked one at a time, as each can complete many tails
+            count += 1
+            if count >= SUBSET_CHECK_INTERVAL:
+                if budget is not None and budget.walk(count, 0, max_sum, fraction=k / len(kept)):
+                    break
+                count = 0
+            for position in range(bisect_left(tail_keys, (low - head_sum) * scale + head_last + 1),
+                                  bisect_right(tail_keys, (high - head_sum) * scale + scale - 1)):
+                tail_sum, tail_mask, tail_size, tail_first, tail_copies = tails[position]
+                size = head_size + tail_size
+                if (tail_first <= head_last or size > max_size or head_size > size // 2
+                        or head_size + tail_copies <= size // 2):
+                    continue
+                sum_a, sum_b = (head_sum + tail_sum, target_sums[t])
+                if not searching_a:
+                    sum_a, sum_b = sum_b, sum_a
+                value = min(sum_a, sum_b)
+                if value <= 0 or max_sum is not None and value > max_sum:
+                    continue
+                if tolerance is None or tolerance.within(sum_a, sum_b):
+                    mask = head_mask | tail_mask
+                    heappush(found, (sign * value, sign * sum_a) + ((mask, target_masks[t]) if searching_a
+                                                                     else (target_masks[t], mask)))
+        else:
+            # Pairs no later target can undercut (or top, when descending) are final
+            bound = sign * bounds[k + 1] if k + 1 < len(kept) else None
+            while found and (bound is None or found[0][0] < bound):
+                value, _, mask_a, mask_b = heappop(found)
+                yield mask_a, mask_b, sign * value
+            continue
+        break
+    else:
+        if budget is not None:
+            budget.subsets += count
+        return
+    # The budget ran out: yield the pairs found so far
+    while found:
+        value, _, mask_a, mask_b = heappop(found)
+        yield mask_a, mask_b, sign * value
+
+
+def iter_pairs_of_halves(halves_a, halves_b, descending=False, max_sum=None, tolerance=None, budget=None):
+    """
+    Yield (mask_a, mask_b, value) for every pair of subsets whose sums match,
+    or are within the tolerance, where value is the smaller of the two sums
+    and lies in (0, max_sum], in ascending (or descending) order of value.
+
+    halves_a and halves_b are the (low, high) half-sum arrays of each list
+    (see split_halves); a subset of a list combines one subset of each of
+    its halves. The values are walked in windows: for each low-half subset,
+    the high-half subsets completing a total in the window are a range of
+    the sorted high half, so only the combinations inside the window are
+    built, joined on their totals and yielded before the next window. Work
+    grows with the combinations of each list, but memory only with the
+    halves and one window, and pairs come out as the windows are walked.
+    Windows are sized to hold about JOIN_CHUNK combinations.
+
+    budget is an optional SearchBudget checked before each window; once it
+    runs out, the walk ends and budget.truncated is set.
+    """
+    (low_a, high_a), (low_b, high_b) = halves_a, halves_b
+    radius = 0
+    if tolerance is not None:
+        # The widest allowance any List A total can get
+        radius = tolerance.allowance(max(abs(low_a[0][0] + high_a[0][0]), abs(low_a[-1][0] + high_a[-1][0])))
+    # A pair is worth the smaller of its two totals, and the larger one lies
+    # at most radius above it
+    bottom = max(1, max(low_a[0][0] + high_a[0][0], low_b[0][0] + high_b[0][0]) - radius)
+    top = min(low_a[-1][0] + high_a[-1][0], low_b[-1][0] + high_b[-1][0])
+    if max_sum is not None:
+        top = min(top, max_sum)
+    if bottom > top:
+        return
+    if np is None:
+        yield from _iter_pairs_of_halves(halves_a, halves_b, radius, bottom, top, descending, max_sum, tolerance,
+                                         budget)
+        return
+
+    sums_low_a, sums_high_a, sums_low_b, sums_high_b = (np.array([sum_val for sum_val, _ in half], dtype=np.int64)
+                                                        for half in (low_a, high_a, low_b, high_b))
+    # Every window looks up each low-half subset, so it should hold at least as many combinations
+    limit = max(JOIN_CHUNK, len(low_a) + len(low_b))
+    span = top - bottom + 1
+    width = max(1, span * limit // max(len(low_a) * len(high_a), len(low_b) * len(high_b)))
+    done = 0  # Values covered by the windows walked so far
+    while done < span:
+        width = min(width, span - done)
+        start = top - done - width + 1 if descending else bottom + done
+        stop = start + width - 1
+        ranges_a = half_ranges(sums_low_a, sums_high_a, start, stop + radius)
+        ranges_b = half_ranges(sums_low_b, sums_high_b, start, stop + radius)
+        combinations = int(ranges_a[1].sum()) + int(ranges_b[1].sum())
+        if combinations > limit and width > 1:
+            width //= 2
+            continue
+        i, l = expand_ranges(*ranges_a)
+        sums_a = sums_low_a[i] + sums_high_a[l]
+        order = np.argsort(sums_a, kind='stable')
+        if descending:
+            order = order[::-1]
+        i, l, sums_a = i[order], l[order], sums_a[order]
+        j, k = expand_ranges(*ranges_b)
+        sums_b = sums_low_b[j] + sums_high_b[k]
+        order = np.argsort(sums_b, kind='stable')
+        j, k, sums_b = j[order], k[order], sums_b[order]
+        firsts = np.searchsorted(sums_b, sums_a - radius, side='left')
+        ends = np.cumsum(np.searchsorted(sums_b, sums_a + radius, side='right') - firsts)
+        # Within a window of several values, pairs within the tolerance only
+        # come out in order once all of them are sorted, so such a window
+        # must not match too many
+        whole = tolerance is not None and width > 1
+        if whole and len(ends) and ends[-1] > limit:
+            width //= 2
+            continue
+        if budget is not None and budget.walk(combinations, 0, max_sum, fraction=done / span):
+            return
+        done += width
+        if combinations <= limit // 2:
+            width *= 2
+
+        # Otherwise the value of a pair is its List A total (or the window's
+        # single value), so the List A subsets are matched a chunk at a time
+        first = 0
+        while first < len(ends):
+            matched = int(ends[first - 1]) if first else 0
+            last = len(ends) if whole else max(first + 1, int(np.searchsorted(ends, matched + limit, side='right')))
+            a, b = expand_ranges(firsts[first:last], np.diff(ends[first:last], prepend=matched))
+            a += first
+            sum_a, sum_b = sums_a[a], sums_b[b]
+            value = np.minimum(sum_a, sum_b)
+            keep = (value >= start) & (value <= stop)
+            if tolerance is not None:
+                allowance = np.maximum(tolerance.cents, np.abs(sum_a) * tolerance.ppm // PARTS_PER_MILLION)
+                keep &= np.abs(sum_a - sum_b) <= allowance
+            a, b, value, sum_a = a[keep], b[keep], value[keep], sum_a[keep]
+            ranked = np.lexsort((sum_a, value))  # Equal values in order of the List A sum, as in full enumeration
+            if descending:
+                ranked = ranked[::-1]
+            for value_k, i_k, l_k, j_k, k_k in zip(value[ranked].tolist(), i[a[ranked]].tolist(),
+                                                   l[a[ranked]].tolist(), j[b[ranked]].tolist(),
+                                                   k[b[ranked]].tolist()):
+                yield low_a[i_k][1] | high_a[l_k][1], low_b[j_k][1] | high_b[k_k][1], value_k
+            first = last
+
+
+def half_ranges(low_sums, high_sums, start, stop):
+    """
+    Return (firsts, counts): for each low-half sum, the first position and
+    the number of the sorted high-half sums completing a total in [start, stop].
+    """
+    firsts = np.searchsorted(high_sums, start - low_sums, side='left')
+    return firsts, np.searchsorted(high_sums, stop - low_sums, side='right') - firsts
+
+
+def expand_ranges(firsts, counts):
+    """
+    Return (owners, positions) listing every position of the ranges starting
+    at firsts with the given counts, each with the index of its range.
+    """
+    total = int(counts.sum())
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(np.arange(len(counts)), counts), np.repeat(firsts, counts) + offsets
+
+
+def _iter_pairs_of_halves(halves_a, halves_b, radius, bottom, top, descending=False, max_sum=None, tolerance=None,
+                          budget=None):
+    """
+    iter_pairs_of_halves without NumPy, with radius the widest allowance and
+    the values in [bottom, top].
+    """
+    (low_a, high_a), (low_b, high_b) = halves_a, halves_b
+    keys_a, keys_b = [sum_val for sum_val, _ in high_a], [sum_val for sum_val, _ in high_b]
+    limit = max(SUBSET_CHECK_INTERVAL, len(low_a) + len(low_b))
+    span = top - bottom + 1
+    width = max(1, span * limit // max(len(low_a) * len(high_a), len(low_b) * len(high_b)))
+    done = 0
+    while done < span:
+        width = min(width, span - done)
+        start = top - done - width + 1 if descending else bottom + done
+        stop = start + width - 1
+        combinations = [[(low_sum + half[position][0], low_mask | half[position][1])
+                         for low_sum, low_mask in low
+                         for position in range(bisect_left(keys, start - low_sum),
+                                               bisect_right(keys, stop + radius - low_sum))]
+                        for low, half, keys in ((low_a, high_a, keys_a), (low_b, high_b, keys_b))]
+        if len(combinations[0]) + len(combinations[1]) > limit and width > 1:
+            width //= 2
+            continue
+        if budget is not None and budget.walk(len(combinations[0]) + len(combinations[1]), 0, max_sum,
+                                              fraction=done / span):
+            return
+        done += width
+        if len(combinations[0]) + len(combinations[1]) <= limit // 2:
+            width *= 2
+
+        subsets_a, subsets_b = combinations
+        subsets_b.sort(key=itemgetter(0))
+        sums_b = [sum_val for sum_val, _ in subsets_b]
+        found = []
+        for sum_a, mask_a in subsets_a:
+            for position in range(bisect_left(sums_b, sum_a - radius), bisect_right(sums_b, sum_a + radius)):
+                sum_b, mask_b = subsets_b[position]
+                value = min(sum_a, sum_b)
+                if start <= value <= stop and (tolerance is None or tolerance.within(sum_a, sum_b)):
+                    found.append((value, sum_a, mask_a, mask_b))
+        found.sort(key=itemgetter(0, 1), reverse=descending)
+        for value, _, mask_a, mask_b in found:
+            yield mask_a, mask_b, value
+
+
+def iter_pairs_within_tolerance(sorted_a, sorted_b, tolerance, descending=False, max_sum=None):
+    """
+    Yield (mask_a, mask_b, value) for every pair of subsets whose sums are
+    within the tolerance, where value is the smaller of the two sums.
+
+    sorted_a and sorted_b are (sum, mask) streams sorted in the same
+    direction. The window of List B sums that match a List A sum only moves
+    forward as the List A sums do, so the two streams are walked with two
+    pointers: each List B sum bucket is read once and only the buckets inside
+    the current window are held. Pairs come out in order of the List A sum;
+    in ascending order the walk stops once no later pair can be worth
+    max_sum or less.
+    """
+    sign = -1 if descending else 1
+    groups_b = groupby(sorted_b, key=itemgetter(0))
+    window_b = deque()  # (sum, masks) of the List B buckets inside the current window
+    next_b = next(groups_b, None)
+    for sum_a, group_a in groupby(sorted_a, key=itemgetter(0)):
+        low, high = tolerance.window(sum_a)
+        if max_sum is not None and low > max_sum:
+            if not descending:
+                return  # Every later window starts higher still
+            continue
+        # The edge the walk comes from, and the one it is heading towards
+        near, far = (high, low) if descending else (low, high)
+        while window_b and sign * window_b[0][0] < sign * near:
+            window_b.popleft()
+        while next_b is not None and sign * next_b[0] <= sign * far:
+            if sign * next_b[0] >= sign * near:
+                window_b.append((next_b[0], [mask for _, mask in next_b[1]]))
+            next_b = next(groups_b, None)
+
+        masks_a = [mask for _, mask in group_a]
+        for sum_b, masks_b in window_b:
+            value = min(sum_a, sum_b)
+            if max_sum is not None and value > max_sum:
+                continue
+            for mask_b in masks_b:
+                for mask_a in masks_a:
+                    yield mask_a, mask_b, value
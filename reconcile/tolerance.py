@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+
+
+# Tolerance windows for matching totals that differ by fees or rounding. The
+# allowance is computed in integer cents, so a List A total s matches any
+# List B total in [s - allowance(s), s + allowance(s)].
+
+PARTS_PER_MILLION = 1_000_000
+
+
+@dataclass(frozen=True)
+class Tolerance:
+    """
+    How far the List B total of a related set may be from its List A total.
+
+    cents is an absolute allowance and ppm an allowance relative to the
+    List A total, in parts per million; the larger of the two applies.
+    """
+    cents: int = 0
+    ppm: int = 0
+
+    @classmethod
+    def from_settings(cls, cents=0, percent=0):
+        """
+        Build a Tolerance from an allowance in cents and a percentage, or
+        return None when both are zero and totals must match exactly.
+        """
+        try:
+            ppm = Decimal(str(percent)) * (PARTS_PER_MILLION // 100)
+        except InvalidOperation:
+            raise ValueError(f"Invalid tolerance percentage: {percent!r}") from None
+        if not 0 <= ppm < PARTS_PER_MILLION:
+            raise ValueError(f"Tolerance percentage must be at least 0 and below 100, got {percent!r}.")
+        if cents < 0:
+            raise ValueError(f"Tolerance must not be negative, got {cents!r} cents.")
+        if not cents and not ppm:
+            return None
+        return cls(cents, int(ppm))
+
+    def allowance(self, sum_a):
+        """
+        Return the largest difference in cents allowed for a List A total.
+        """
+        return max(self.cents, abs(sum_a) * self.ppm // PARTS_PER_MILLION)
+
+    def window(self, sum_a):
+        """
+        Return the (lowest, highest) List B totals that match a List A total.
+
+        Both ends never decrease as sum_a grows, so a sorted stream of List B
+        totals can be matched against a sorted stream of List A totals with a
+        sliding window.
+        """
+        allowance = self.allowance(sum_a)
+        return sum_a - allowance, sum_a + allowance
+
+    def within(self, sum_a, sum_b):
+        return abs(sum_a - sum_b) <= self.allowance(sum_a)
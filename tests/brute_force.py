@@ -0,0 +1,110 @@
+import datetime
+from functools import lru_cache
+
+from reconcile.amounts import to_cents
+
+
+# Brute-force reference for the engine tests: the most any set of disjoint
+# related sets can match, found by trying every subset pair. The lists are
+# kept small enough (at most 7 deposits each) for it to finish instantly,
+# and amounts are drawn from a few values so that many subsets share a
+# total. The default one_to_one="fixed" keeps identical amounts paired even
+# when a larger related set would match more, so the tests comparing with
+# it let the search revisit those pairs.
+
+# Random cases per test
+CASES = 40
+
+# First posting date of the dated cases
+START = datetime.date(2024, 3, 1)
+
+
+def random_lists(rng, negatives=False, dated=False):
+    """
+    Return (amounts_a, amounts_b, dates_a, dates_b) of two small lists that
+    share some totals.
+    """
+    pool = [rng.randint(1, 60) * 5 for _ in range(4)]
+    low = -100 if negatives else 1
+    amounts_a = [rng.choice(pool) if rng.random() < 0.5 else rng.randint(low, 300) for _ in range(rng.randint(1, 7))]
+    amounts_b = [rng.choice(pool) if rng.random() < 0.5 else rng.randint(low, 300) for _ in range(rng.randint(1, 6))]
+    amounts_b.append(sum(rng.sample(amounts_a, rng.randint(1, min(3, len(amounts_a))))))
+    dates_a = [START + datetime.timedelta(days=rng.randint(0, 6)) for _ in amounts_a] if dated else None
+    dates_b = [START + datetime.timedelta(days=rng.randint(0, 6)) for _ in amounts_b] if dated else None
+    return [amount / 100 for amount in amounts_a], [amount / 100 for amount in amounts_b], dates_a, dates_b
+
+
+def best_total(amounts_a, amounts_b, tolerance=None, max_size_a=None, max_size_b=None, dates_a=None, dates_b=None,
+               date_window=None):
+    """
+    Return the most cents any set of disjoint related sets can match, each
+    worth the smaller of its two totals, found by trying every subset pair.
+    """
+    cents_a = [to_cents(value) for value in amounts_a]
+    cents_b = [to_cents(value) for value in amounts_b]
+
+    def subsets(cents, max_size):
+        for mask in range(1, 1 << len(cents)):
+            if max_size is None or bin(mask).count("1") <= max_size:
+                yield mask, sum(value for i, value in enumerate(cents) if mask >> i & 1)
+
+    def dates(mask, days):
+        return [day for i, day in enumerate(days) if mask >> i & 1]
+
+    pairs = []
+    for mask_a, sum_a in subsets(cents_a, max_size_a):
+        for mask_b, sum_b in subsets(cents_b, max_size_b):
+            value = min(sum_a, sum_b)
+            if value <= 0 or (sum_a != sum_b if tolerance is None else not tolerance.within(sum_a, sum_b)):
+                continue
+            if date_window is not None:
+                days = dates(mask_a, dates_a) + dates(mask_b, dates_b)
+                if (max(days) - min(days)).days > date_window:
+                    continue
+            pairs.append((mask_a, mask_b, value))
+
+    @lru_cache(maxsize=None)
+    def best(used_a, used_b):
+        # Either leave the lowest unused List A deposit unmatched, or match it
+        free = ~used_a & ((1 << len(cents_a)) - 1)
+        if not free:
+            return 0
+        low = free & -free
+        total = best(used_a | low, used_b)
+        for mask_a, mask_b, value in pairs:
+            if mask_a & low and not mask_a & used_a and not mask_b & used_b:
+                total = max(total, value + best(used_a | mask_a, used_b | mask_b))
+        return total
+
+    return best(0, 0)
+
+
+def check_result(result, amounts_a, amounts_b, tolerance=None, max_size_a=None, max_size_b=None, dates_a=None,
+                 dates_b=None, date_window=None):
+    """
+    Assert that the related sets of a result are disjoint and allowed by the
+    settings, and return the cents they match, each worth the smaller of
+    its two totals.
+    """
+    used = set()
+    total = 0
+    for related_set in result.related_sets:
+        ids = related_set.a_deposits + related_set.b_deposits
+        assert not used & set(ids)
+        used.update(ids)
+        positions_a = [int(deposit_id[1:]) - 1 for deposit_id in related_set.a_deposits]
+        positions_b = [int(deposit_id[1:]) - 1 for deposit_id in related_set.b_deposits]
+        sum_a = sum(to_cents(amounts_a[i]) for i in positions_a)
+        sum_b = sum(to_cents(amounts_b[j]) for j in positions_b)
+        assert sum_a == sum_b if tolerance is None else tolerance.within(sum_a, sum_b)
+        assert related_set.cents == sum_a
+        assert max_size_a is None or len(positions_a) <= max_size_a
+        assert max_size_b is None or len(positions_b) <= max_size_b
+        if date_window is not None:
+            days = [dates_a[i] for i in positions_a] + [dates_b[j] for j in positions_b]
+            assert (max(days) - min(days)).days <= date_window
+        total += min(sum_a, sum_b)
+    matched = {deposit_id for deposit_id, row in {**result.table_a, **result.table_b}.items()
+               if row["status"] == "Matched"}
+    assert matched == used
+    return total
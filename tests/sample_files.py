@@ -0,0 +1,33 @@
+import csv
+
+
+# Small deposit files shared by the import, export and command line tests.
+
+LIST_A = [("Amount", "Date", "Reference"),
+          ("10.00", "2024-03-01", "INV-1"),
+          ("15.50", "2024-03-01", "INV-2"),
+          ("1,234.56", "03/04/2024", "INV-3"),
+          ("7.25", "2024-03-08", "")]
+LIST_B = [("Posted", "Deposit", "Memo"),
+          ("2024-03-02", "25.50", "BATCH 1"),
+          ("2024-03-04", "1234.56", "BATCH 2"),
+          ("2024-03-09", "99.00", "BATCH 3")]
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as csv_file:
+        csv.writer(csv_file).writerows(rows)
+    return str(path)
+
+
+def related_sets(result):
+    """
+    Return the related sets of a result in a comparable form.
+    """
+    return sorted((tuple(related_set.a_deposits), tuple(related_set.b_deposits), related_set.cents,
+                   related_set.difference_cents) for related_set in result.related_sets)
+
+
+def deposit_rows(table):
+    return {deposit_id: (row["cents"], row["date"], row["reference"], row["status"], row["related_set"])
+            for deposit_id, row in table.items()}
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from reconcile import CancelToken, Reconciler
+from reconcile.tolerance import Tolerance
+
+from .brute_force import CASES, best_total, check_result, random_lists
+
+
+# Runs cut short by their budget, checked to keep a valid matching whose
+# gap covers the brute-force optimum.
+
+
+def test_node_limit_keeps_a_valid_matching():
+    rng = random.Random(8)
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng, negatives=True)
+        result = Reconciler(amounts_a, amounts_b, one_to_one="revisit", node_limit=1).solve()
+        matched = check_result(result, amounts_a, amounts_b)
+        expected = best_total(amounts_a, amounts_b)
+        if result.optimal:
+            assert matched == expected
+        else:
+            assert result.stop_reason == "nodes"
+            assert matched + result.gap_cents >= expected
+
+
+@pytest.mark.parametrize("settings", [{}, {"tolerance": 0.02}, {"max_group_size_a": 3, "max_group_size_b": 1}])
+def test_cancelled_run_keeps_a_valid_matching(settings):
+    rng = random.Random(14)
+    token = CancelToken()
+    token.cancel()
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng)
+        result = Reconciler(amounts_a, amounts_b, one_to_one="revisit", **settings).solve(cancel_token=token)
+        tolerance = Tolerance.from_settings(2, 0) if "tolerance" in settings else None
+        sizes = {"max_size_a": settings.get("max_group_size_a"), "max_size_b": settings.get("max_group_size_b")}
+        matched = check_result(result, amounts_a, amounts_b, tolerance, **sizes)
+        assert matched + result.gap_cents >= best_total(amounts_a, amounts_b, tolerance, **sizes)
+        assert result.optimal or result.stop_reason == "cancelled"
@@ -0,0 +1,21 @@
+import random
+
+from reconcile import Reconciler, ResultCache
+
+from .brute_force import check_result, random_lists
+
+
+# The result cache checked to return the matching it stored.
+
+
+def test_cache_returns_the_same_matching(tmp_path):
+    rng = random.Random(7)
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    for _ in range(10):
+        amounts_a, amounts_b, _, _ = random_lists(rng, negatives=True)
+        first = Reconciler(amounts_a, amounts_b, one_to_one="revisit", cache=cache).solve()
+        # The same lists in another order are the same problem
+        second = Reconciler(amounts_a[::-1], amounts_b[::-1], one_to_one="revisit", cache=cache).solve()
+        assert second.diagnostics.counts["cache_hits"] > 0
+        assert second.optimal
+        assert check_result(second, amounts_a[::-1], amounts_b[::-1]) == check_result(first, amounts_a, amounts_b)
@@ -0,0 +1,61 @@
+import csv
+
+import pytest
+
+from reconcile import Reconciler
+from reconcile.cli import main
+from reconcile.files import read_result
+
+from .sample_files import LIST_A, LIST_B, related_sets, write_csv
+
+
+# The command line run on small deposit files, checked by reading back the
+# results it wrote.
+
+
+def test_cli_match_writes_the_result(tmp_path, capsys):
+    file_a = write_csv(tmp_path / "a.csv", LIST_A)
+    file_b = write_csv(tmp_path / "b.csv", LIST_B)
+    output = str(tmp_path / "result.csv")
+    assert main(["match", file_a, file_b, "-o", output, "--no-cache"]) == 0
+    assert "Matched total: 1260.06" in capsys.readouterr().out
+
+    expected = Reconciler([row[0] for row in LIST_A[1:]], [row[1] for row in LIST_B[1:]]).solve()
+    assert related_sets(read_result(output)) == related_sets(expected)
+
+    # Re-matching the written result after a List B deposit arrives
+    file_b = write_csv(tmp_path / "b.csv", LIST_B + [("2024-03-09", "7.25", "BATCH 4")])
+    rematched = str(tmp_path / "rematched.csv")
+    assert main(["match", file_a, file_b, "-o", rematched, "--previous", output, "--no-cache"]) == 0
+    assert "Matched total: 1267.31" in capsys.readouterr().out
+    assert len(read_result(rematched).related_sets) == 3
+
+
+def test_cli_match_reports_bad_files(tmp_path, capsys):
+    file_a = write_csv(tmp_path / "a.csv", LIST_A[:2] + [("ten", "2024-03-01", "")])
+    file_b = write_csv(tmp_path / "b.csv", LIST_B)
+    assert main(["match", file_a, file_b, "--no-cache"]) == 1
+    assert "row 3" in capsys.readouterr().err
+
+
+def test_cli_batch_writes_a_summary(tmp_path):
+    source = tmp_path / "inputs"
+    source.mkdir()
+    write_csv(source / "march_a.csv", LIST_A)
+    write_csv(source / "march_b.csv", LIST_B)
+    output = tmp_path / "results"
+    assert main(["batch", str(source), "-o", str(output), "--format", "csv", "--jobs", "1", "--no-cache"]) == 0
+
+    with open(output / "summary.csv", newline="", encoding="utf-8") as summary_file:
+        rows = list(csv.DictReader(summary_file))
+    assert [(row["name"], row["matched"], row["related_sets"], row["error"]) for row in rows] == [
+        ("march", "1260.06", "2", "")]
+    assert len(read_result(str(output / "march.csv")).related_sets) == 2
+
+
+@pytest.mark.parametrize("jobs", ["0", "-2", "two"])
+def test_cli_batch_rejects_bad_job_counts(tmp_path, capsys, jobs):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["batch", str(tmp_path), "-o", str(tmp_path / "results"), "--jobs", jobs])
+    assert exit_info.value.code == 2
+    assert "--jobs" in capsys.readouterr().err
@@ -0,0 +1,23 @@
+import random
+
+import pytest
+
+from reconcile import Reconciler
+
+from .brute_force import CASES, best_total, check_result, random_lists
+
+
+# Date-windowed matching checked against the brute force.
+
+
+@pytest.mark.parametrize("enumeration", ["meet", "full"])
+@pytest.mark.parametrize("date_window", [0, 2])
+def test_date_window_matches_brute_force(enumeration, date_window):
+    rng = random.Random(5)
+    for _ in range(CASES):
+        amounts_a, amounts_b, dates_a, dates_b = random_lists(rng, dated=True)
+        result = Reconciler(amounts_a, amounts_b, enumeration=enumeration, one_to_one="revisit", dates_a=dates_a,
+                            dates_b=dates_b, date_window=date_window).solve()
+        assert result.optimal
+        dated = {"dates_a": dates_a, "dates_b": dates_b, "date_window": date_window}
+        assert check_result(result, amounts_a, amounts_b, **dated) == best_total(amounts_a, amounts_b, **dated)
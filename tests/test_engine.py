@@ -0,0 +1,29 @@
+import random
+
+import pytest
+
+from reconcile import Reconciler
+
+from .brute_force import CASES, best_total, check_result, random_lists
+
+
+# Engine results checked against the brute force in brute_force.py.
+
+
+@pytest.mark.parametrize("enumeration", ["meet", "full"])
+@pytest.mark.parametrize("one_to_one", ["revisit", "off"])
+def test_exact_matches_brute_force(enumeration, one_to_one):
+    rng = random.Random(1)
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng, negatives=True)
+        result = Reconciler(amounts_a, amounts_b, enumeration=enumeration, one_to_one=one_to_one).solve()
+        assert result.optimal
+        assert check_result(result, amounts_a, amounts_b) == best_total(amounts_a, amounts_b)
+
+
+def test_greedy_is_valid():
+    rng = random.Random(6)
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng, negatives=True)
+        result = Reconciler(amounts_a, amounts_b, solver="greedy", one_to_one="revisit").solve()
+        assert check_result(result, amounts_a, amounts_b) <= best_total(amounts_a, amounts_b)
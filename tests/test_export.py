@@ -0,0 +1,33 @@
+import pytest
+
+from reconcile import Reconciler
+from reconcile.files import read_deposits, read_result, write_result
+
+from .sample_files import LIST_A, LIST_B, deposit_rows, related_sets, write_csv
+
+
+# Result files written and read back through reconcile.files.
+
+
+@pytest.mark.parametrize("extension", [".csv", ".xlsx"])
+def test_result_round_trip(tmp_path, extension):
+    if extension == ".xlsx":
+        pytest.importorskip("openpyxl")
+    deposits_a = read_deposits(write_csv(tmp_path / "a.csv", LIST_A))
+    deposits_b = read_deposits(write_csv(tmp_path / "b.csv", LIST_B))
+    result = Reconciler(deposits_a.amounts, deposits_b.amounts, dates_a=deposits_a.dates, dates_b=deposits_b.dates,
+                        references_a=deposits_a.references, references_b=deposits_b.references,
+                        tolerance=1).solve()
+    assert related_sets(result)
+
+    path = str(tmp_path / f"result{extension}")
+    write_result(result, path)
+    read_back = read_result(path)
+    assert related_sets(read_back) == related_sets(result)
+    assert deposit_rows(read_back.table_a) == deposit_rows(result.table_a)
+    assert deposit_rows(read_back.table_b) == deposit_rows(result.table_b)
+
+
+def test_read_result_rejects_other_files(tmp_path):
+    with pytest.raises(ValueError, match="not a result file"):
+        read_result(write_csv(tmp_path / "a.csv", LIST_A))
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from reconcile import Reconciler
+from reconcile.tolerance import Tolerance
+
+from .brute_force import CASES, best_total, check_result, random_lists
+
+
+# Group-size limits checked against the brute force.
+
+
+@pytest.mark.parametrize("enumeration", ["meet", "full"])
+@pytest.mark.parametrize("max_size_a, max_size_b", [(1, 1), (2, 1), (3, 2), (None, 1), (1, None)])
+def test_group_sizes_match_brute_force(enumeration, max_size_a, max_size_b):
+    rng = random.Random(3)
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng, negatives=True)
+        result = Reconciler(amounts_a, amounts_b, enumeration=enumeration, one_to_one="revisit",
+                            max_group_size_a=max_size_a, max_group_size_b=max_size_b).solve()
+        assert result.optimal
+        expected = best_total(amounts_a, amounts_b, max_size_a=max_size_a, max_size_b=max_size_b)
+        assert check_result(result, amounts_a, amounts_b, max_size_a=max_size_a, max_size_b=max_size_b) == expected
+
+
+@pytest.mark.parametrize("enumeration", ["meet", "full"])
+def test_group_sizes_with_tolerance_match_brute_force(enumeration):
+    rng = random.Random(4)
+    tolerance = Tolerance.from_settings(2, "1")
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng)
+        result = Reconciler(amounts_a, amounts_b, enumeration=enumeration, one_to_one="revisit", tolerance=0.02,
+                            tolerance_percent="1", max_group_size_a=3, max_group_size_b=1).solve()
+        assert result.optimal
+        expected = best_total(amounts_a, amounts_b, tolerance, max_size_a=3, max_size_b=1)
+        assert check_result(result, amounts_a, amounts_b, tolerance, max_size_a=3, max_size_b=1) == expected
@@ -0,0 +1,38 @@
+import datetime
+
+import pytest
+
+from reconcile.files import read_deposits
+
+from .sample_files import LIST_A, LIST_B, write_csv
+
+
+# Deposit files read through reconcile.files.read_deposits.
+
+
+def test_read_deposits_guesses_columns_from_the_header(tmp_path):
+    deposits = read_deposits(write_csv(tmp_path / "b.csv", LIST_B))
+    assert list(deposits.cents) == [2550, 123456, 9900]
+    assert deposits.dates == [datetime.date(2024, 3, 2), datetime.date(2024, 3, 4), datetime.date(2024, 3, 9)]
+    assert deposits.references == ["BATCH 1", "BATCH 2", "BATCH 3"]
+
+
+def test_read_deposits_guesses_only_the_columns_not_given(tmp_path):
+    path = write_csv(tmp_path / "b.csv", LIST_B)
+    deposits = read_deposits(path, date_column="Posted")
+    assert list(deposits.cents) == [2550, 123456, 9900]
+    deposits = read_deposits(path, amount_column=1, guess_missing=False)
+    assert list(deposits.cents) == [2550, 123456, 9900]
+    assert deposits.dates is None and deposits.references is None
+
+
+def test_read_deposits_without_a_header(tmp_path):
+    deposits = read_deposits(write_csv(tmp_path / "a.csv", LIST_A[1:]))
+    assert list(deposits.cents) == [1000, 1550, 123456, 725]
+    assert deposits.references == ["INV-1", "INV-2", "INV-3", None]
+
+
+def test_read_deposits_names_the_bad_row(tmp_path):
+    path = write_csv(tmp_path / "a.csv", LIST_A[:2] + [("ten", "2024-03-01", "")])
+    with pytest.raises(ValueError, match="row 3"):
+        read_deposits(path)
@@ -0,0 +1,35 @@
+import random
+
+from reconcile import Reconciler
+
+from .brute_force import CASES, best_total, check_result, random_lists
+
+
+# Incremental re-matching checked against the brute force of the deposits
+# it searches again.
+
+
+def test_incremental_matches_brute_force():
+    rng = random.Random(10)
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng)
+        previous = Reconciler(amounts_a, amounts_b, one_to_one="revisit").solve()
+        edited_a = amounts_a + [rng.randint(1, 300) / 100]
+        result = Reconciler(edited_a, amounts_b, one_to_one="revisit", previous=previous).solve()
+        matched = check_result(result, edited_a, amounts_b)
+        # Kept sets are taken as given, so the rest is compared with a brute force of its own
+        kept = []
+        if result.reused_sets:
+            sets = {(tuple(related_set.a_deposits), tuple(related_set.b_deposits))
+                    for related_set in result.related_sets}
+            kept = [related_set for related_set in previous.related_sets
+                    if (tuple(related_set.a_deposits), tuple(related_set.b_deposits)) in sets]
+            assert len(kept) == result.reused_sets
+        used = {deposit_id for related_set in kept for deposit_id in related_set.a_deposits + related_set.b_deposits}
+        rest_a = [amount for i, amount in enumerate(edited_a) if f"A{i + 1}" not in used]
+        rest_b = [amount for j, amount in enumerate(amounts_b) if f"B{j + 1}" not in used]
+        expected = sum(related_set.cents for related_set in kept) + best_total(rest_a, rest_b)
+        if result.optimal:
+            assert matched == expected
+        else:
+            assert matched + result.gap_cents >= expected
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from reconcile import Reconciler, subsets
+from reconcile.tolerance import Tolerance
+
+from .brute_force import CASES, best_total, check_result, random_lists
+
+
+# Meet-in-the-middle enumeration checked against the brute force, with its
+# windows and table limits shrunk so the small lists exercise them.
+
+
+@pytest.mark.parametrize("cents, percent", [(0, 0), (2, "1")])
+def test_meet_windows_match_brute_force(monkeypatch, cents, percent):
+    # Walk the pair totals in windows of a few subsets, so the lists span many
+    monkeypatch.setattr(subsets, "JOIN_CHUNK", 4)
+    rng = random.Random(12)
+    tolerance = Tolerance.from_settings(cents, percent)
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng)
+        for solver in ("exact", "greedy"):
+            result = Reconciler(amounts_a, amounts_b, solver=solver, one_to_one="revisit", tolerance=cents / 100,
+                                tolerance_percent=percent).solve()
+            matched = check_result(result, amounts_a, amounts_b, tolerance)
+            expected = best_total(amounts_a, amounts_b, tolerance)
+            assert matched == expected if solver == "exact" else matched <= expected
+
+
+def test_lists_too_long_to_split_are_searched_for_small_groups(monkeypatch):
+    monkeypatch.setattr(subsets, "MAX_TABLE_SUBSETS", 8)
+    rng = random.Random(13)
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng, negatives=True)
+        result = Reconciler(amounts_a, amounts_b, one_to_one="revisit").solve()
+        matched = check_result(result, amounts_a, amounts_b)
+        assert matched <= best_total(amounts_a, amounts_b) <= matched + result.gap_cents
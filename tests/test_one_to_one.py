@@ -0,0 +1,16 @@
+import random
+
+from reconcile import Reconciler
+
+from .brute_force import CASES, best_total, check_result, random_lists
+
+
+# The one-to-one pre-pass checked against the brute force.
+
+
+def test_fixed_one_to_one_is_valid():
+    rng = random.Random(11)
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng, negatives=True)
+        result = Reconciler(amounts_a, amounts_b).solve()
+        assert check_result(result, amounts_a, amounts_b) <= best_total(amounts_a, amounts_b)
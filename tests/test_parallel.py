@@ -0,0 +1,21 @@
+import random
+
+from reconcile import Reconciler, parallel
+
+from .brute_force import best_total, check_result, random_lists
+
+
+# Searches spread over worker processes checked against the brute force.
+
+
+def test_workers_match_brute_force(monkeypatch):
+    # Search every component in the pool, however small, so the tasks and
+    # the shared bound are exercised on these lists
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_DEPOSITS", 0)
+    monkeypatch.setattr(parallel, "WARMUP_NODES", 2)
+    rng = random.Random(9)
+    for _ in range(10):
+        amounts_a, amounts_b, _, _ = random_lists(rng, negatives=True)
+        result = Reconciler(amounts_a, amounts_b, one_to_one="revisit", workers=2).solve()
+        assert result.optimal
+        assert check_result(result, amounts_a, amounts_b) == best_total(amounts_a, amounts_b)
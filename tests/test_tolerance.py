@@ -0,0 +1,24 @@
+import random
+
+import pytest
+
+from reconcile import Reconciler
+from reconcile.tolerance import Tolerance
+
+from .brute_force import CASES, best_total, check_result, random_lists
+
+
+# Tolerance-window matching checked against the brute force.
+
+
+@pytest.mark.parametrize("enumeration", ["meet", "full"])
+@pytest.mark.parametrize("cents, percent", [(3, 0), (0, "2"), (2, "1")])
+def test_tolerance_matches_brute_force(enumeration, cents, percent):
+    rng = random.Random(2)
+    tolerance = Tolerance.from_settings(cents, percent)
+    for _ in range(CASES):
+        amounts_a, amounts_b, _, _ = random_lists(rng)
+        result = Reconciler(amounts_a, amounts_b, enumeration=enumeration, one_to_one="revisit",
+                            tolerance=cents / 100, tolerance_percent=percent).solve()
+        assert result.optimal
+        assert check_result(result, amounts_a, amounts_b, tolerance) == best_total(amounts_a, amounts_b, tolerance)